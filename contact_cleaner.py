@@ -1,15 +1,93 @@
+import argparse
+import glob
+import hashlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import queue
+import re
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
+import numpy as np
 import pandas as pd
 
+# Virtual table: rows are only materialized for the viewport plus this many rows either side
+VIRTUAL_ROW_HEIGHT = 24
+VIRTUAL_OVERSCAN = 50
+# CSVs are parsed in chunks of this many rows on a background thread
+LOAD_CHUNK_ROWS = 50_000
+LOAD_POLL_MS = 100
+# Text columns with at most this share of distinct values are stored as category
+CATEGORY_MAX_RATIO = 0.5
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+TEXT_DTYPE = pd.StringDtype("pyarrow") if HAS_PYARROW else pd.StringDtype()
+# Edits are journaled next to the CSV and folded into it after this much idle time
+JOURNAL_SUFFIX = ".journal"
+COMPACT_DELAY_MS = 5000
+# Strings longer than this are not trigram-indexed and are always scanned
+TRIGRAM_MAX_LEN = 64
+TRIGRAM_BUILD_ROWS = 100_000
+TRIGRAM_END = "\x01"
+# Live filtering waits for this pause in typing before querying
+LIVE_FILTER_DELAY_MS = 150
+# Query filters: rows sampled to estimate selectivity, and predicate masks kept cached
+FILTER_SAMPLE_ROWS = 2000
+FILTER_CACHE_SIZE = 32
+# Contact normalization and duplicate detection
+EMAIL_RE = r"[^@\s]+@[^@\s]+\.[^@\s.]+"
+DEFAULT_COUNTRY_CODE = "1"
+FUZZY_THRESHOLD = 0.8
+FUZZY_WINDOW = 4
+SIGNATURE_MAX_LEN = TRIGRAM_MAX_LEN
+POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+# Headless batch mode: recipe keys, filter types and output formats
+RECIPE_KEYS = {"keep", "filters", "dedupe", "output"}
+FILTER_TYPES = ("Contains", "Starts With", "Filled Only", "Most Filled", "Query")
+EXPORT_FORMATS = ("csv", "xlsx", "parquet", "arrow")
+# Exports are written in chunks of this many rows; an Excel sheet holds at most EXCEL_MAX_ROWS
+EXPORT_CHUNK_ROWS = 50_000
+EXCEL_MAX_ROWS = 1_048_576
+EXPORT_FILETYPES = [("Excel files", "*.xlsx"), ("CSV files", "*.csv"), ("Parquet files", "*.parquet"), ("Arrow files", "*.arrow")]
+# Columnar working files, and the Arrow copy cached next to a CSV so reopening it skips parsing
+COLUMNAR_EXTENSIONS = (".parquet", ".arrow")
+CACHE_SUFFIX = ".arrow"
+CACHE_METADATA_KEY = b"contact_cleaner.source"
+HASH_BLOCK_BYTES = 1 << 20
+OPEN_FILETYPES = [("Contact lists", "*.csv *.parquet *.arrow"), ("CSV files", "*.csv"), ("Parquet files", "*.parquet"), ("Arrow files", "*.arrow")]
+SAVE_FILETYPES = [("CSV files", "*.csv"), ("Parquet files", "*.parquet"), ("Arrow files", "*.arrow")]
+
 class ContactCleanerApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Contact CSV Cleaner & Editor")
         self.root.geometry("900x600")
-        self.csv_path = None
-        self.df = None
+        self.contacts = ContactList()
+        self.view_positions = np.arange(0)
+        self.view_columns = []
+        self.view_groups = None
+        self.selected_positions = set()
+        self.loader = None
+        self._compact_after = None
+        self._compact_thread = None
+        self._live_after = None
+        self._live_generation = 0
+        self._export_thread = None
         self.setup_gui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    @property
+    def df(self):
+        return self.contacts.df
+
+    @df.setter
+    def df(self, value):
+        self.contacts.df = value
 
     def setup_gui(self):
         # File picker frame
@@ -19,22 +97,125 @@ class ContactCleanerApp:
         self.file_entry.pack(side=tk.LEFT, padx=5)
         tk.Button(file_frame, text="Browse", command=self.browse_csv).pack(side=tk.LEFT, padx=5)
         tk.Button(file_frame, text="Clean", command=self.clean_fields_popup).pack(side=tk.LEFT, padx=5)
+        tk.Button(file_frame, text="Dedupe", command=self.dedupe_popup).pack(side=tk.LEFT, padx=5)
+        tk.Button(file_frame, text="Save", command=self.save_now).pack(side=tk.LEFT, padx=5)
+        tk.Button(file_frame, text="Save As", command=self.save_as).pack(side=tk.LEFT, padx=5)
+        # Keep an Arrow copy next to each CSV so it reopens without parsing
+        self.use_cache = tk.BooleanVar(value=HAS_PYARROW)
+        tk.Checkbutton(file_frame, text="Cache", variable=self.use_cache, state=tk.NORMAL if HAS_PYARROW else tk.DISABLED).pack(side=tk.LEFT, padx=5)
+        # Load progress (filled in while a CSV streams in)
+        self.progress_frame = tk.Frame(self.root)
+        self.progress_frame.pack(fill="x", padx=10)
+        self.load_progress_var = tk.DoubleVar(value=0)
 
     def browse_csv(self):
-        file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
+        file_path = filedialog.askopenfilename(filetypes=OPEN_FILETYPES)
         if file_path:
-            self.csv_path = file_path
+            self.cancel_load()
+            self.compact(wait=True)
+            self.contacts = ContactList(path=file_path)
             self.file_entry.delete(0, tk.END)
             self.file_entry.insert(0, file_path)
             try:
-                self.df = pd.read_csv(file_path)
-                messagebox.showinfo("Loaded", f"Loaded {file_path} with {len(self.df)} rows.")
+                self.loader = CSVChunkLoader(file_path, use_cache=self.use_cache.get())
+            except OSError as e:
+                messagebox.showerror("Error", f"Failed to load CSV: {e}")
+                return
+            self.loader.start()
+            self.show_load_progress()
+            self.root.after(LOAD_POLL_MS, self._poll_loader)
+
+    def show_load_progress(self):
+        for widget in self.progress_frame.winfo_children():
+            widget.destroy()
+        self.load_progress_var.set(0)
+        ttk.Progressbar(self.progress_frame, variable=self.load_progress_var, maximum=max(1, self.loader.total_bytes), length=350).pack(side=tk.LEFT, padx=5)
+        self.load_progress_label = tk.Label(self.progress_frame, text="Loading...")
+        self.load_progress_label.pack(side=tk.LEFT, padx=5)
+        tk.Button(self.progress_frame, text="Cancel", command=self.cancel_load).pack(side=tk.LEFT, padx=5)
+
+    def hide_load_progress(self):
+        for widget in self.progress_frame.winfo_children():
+            widget.destroy()
+
+    def cancel_load(self):
+        if self.loader is None:
+            return
+        self.loader.cancel()
+        self.loader = None
+        # A partially loaded file must never be saved back over the original
+        self.contacts = ContactList()
+        self.hide_load_progress()
+        self.add_filter_frame()
+        self.show_table()
+
+    def _poll_loader(self):
+        loader = self.loader
+        if loader is None:
+            return
+        chunks = []
+        status = None
+        bytes_read = rows = 0
+        while True:
+            try:
+                kind, payload, bytes_read, rows = loader.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "chunk":
+                chunks.append(payload)
+            else:
+                status = (kind, payload)
+                break
+        if chunks:
+            first = self.df is None
+            self.df = pd.concat(chunks if first else [self.df, *chunks], ignore_index=True)
+            if first:
+                # Show the first chunk straight away; the rest streams into the same view
                 self.add_filter_frame()
                 self.show_table()
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to load CSV: {e}")
+            else:
+                self.view_positions = np.arange(len(self.df))
+                self.refresh_table()
+        if rows:
+            self.load_progress_var.set(bytes_read)
+            self.load_progress_label.config(text=f"{bytes_read / 1e6:.1f} / {loader.total_bytes / 1e6:.1f} MB, {rows:,} rows")
+        if status is None:
+            self.root.after(LOAD_POLL_MS, self._poll_loader)
+            return
+        self.loader = None
+        self.hide_load_progress()
+        kind, payload = status
+        if kind == "error":
+            self.df = None
+            self.add_filter_frame()
+            self.show_table()
+            messagebox.showerror("Error", f"Failed to load CSV: {payload}")
+            return
+        if self.df is None:
+            # Header-only file
+            self.df = pd.read_csv(loader.path, nrows=0)
+            self.add_filter_frame()
+            self.show_table()
+        recovered = self.contacts.finish_load(self.df, cache=loader.use_cache, cached=loader.cached)
+        if recovered:
+            self.add_filter_frame()
+            self.show_table()
+            self._compact_after = self.root.after(COMPACT_DELAY_MS, self.compact)
+        else:
+            self.refresh_table()
+        self.contacts.search_index.warm(lambda: self.df)
+        recovered = f"\nRecovered {recovered} unsaved edit(s)." if recovered else ""
+        messagebox.showinfo("Loaded", f"Loaded {loader.path} with {len(self.df)} rows.{recovered}")
+
+    def loading_in_progress(self):
+        if self.loader is not None:
+            messagebox.showwarning("Loading", "Please wait for the CSV to finish loading.")
+            return True
+        return False
 
     def clean_fields_popup(self):
+        if self.loading_in_progress():
+            return
         if self.df is None:
             messagebox.showwarning("No CSV", "Please load a CSV file first.")
             return
@@ -80,8 +261,8 @@ class ContactCleanerApp:
             if not keep_fields:
                 messagebox.showwarning("No Fields", "You must keep at least one field.")
                 return
-            self.df = self.df[keep_fields]
-            self.df.to_csv(self.csv_path, index=False)
+            self.contacts.keep_columns(keep_fields)
+            self.schedule_compact()
             messagebox.showinfo("Cleaned", f"CSV updated to keep {len(keep_fields)} fields.")
             popup.destroy()
             self.add_filter_frame()
@@ -103,116 +284,389 @@ class ContactCleanerApp:
         filter_menu = ttk.Combobox(self.filter_frame, textvariable=self.filter_column, values=filter_options, state="readonly", width=12)
         filter_menu.pack(side=tk.LEFT, padx=2)
         self.filter_type = tk.StringVar(value="Contains")
-        filter_type_options = ["Contains", "Starts With", "Filled Only", "Most Filled"]
+        filter_type_options = list(FILTER_TYPES)
         filter_type_menu = ttk.Combobox(self.filter_frame, textvariable=self.filter_type, values=filter_type_options, state="readonly", width=12)
         filter_type_menu.pack(side=tk.LEFT, padx=2)
         self.filter_value = tk.StringVar()
         self.filter_entry = tk.Entry(self.filter_frame, textvariable=self.filter_value, width=15)
         self.filter_entry.pack(side=tk.LEFT, padx=2)
+        # Live mode re-filters as you type
+        self.live_filter = tk.BooleanVar(value=True)
+        tk.Checkbutton(self.filter_frame, text="Live", variable=self.live_filter).pack(side=tk.LEFT, padx=2)
+        for var in (self.filter_column, self.filter_type, self.filter_value):
+            var.trace_add('write', self.on_filter_change)
+        self._live_result = None
         tk.Button(self.filter_frame, text="Apply Filter", command=self.apply_filter, bg="#2196F3", fg="white").pack(side=tk.LEFT, padx=5)
         tk.Button(self.filter_frame, text="Clear Filter", command=self.clear_filter, bg="#f44336", fg="white").pack(side=tk.LEFT, padx=5)
         # Always show Export button on the right
+        tk.Button(self.filter_frame, text="Export Filtered", command=self.export_filtered, bg="#4CAF50", fg="white").pack(side=tk.RIGHT, padx=5)
         tk.Button(self.filter_frame, text="Export Selected", command=self.export_selected, bg="#4CAF50", fg="white").pack(side=tk.RIGHT, padx=5)
         tk.Button(self.filter_frame, text="Delete Selected", command=self.delete_selected, bg="#ff9800", fg="white").pack(side=tk.RIGHT, padx=5)
 
     def delete_selected(self):
+        if self.loading_in_progress():
+            return
         if not hasattr(self, 'tree') or self.df is None:
             messagebox.showwarning("No Data", "No data to delete.")
             return
-        selected = self.tree.selection()
-        if not selected:
+        if not self.selected_positions:
             messagebox.showwarning("No Selection", "Please select rows to delete.")
             return
-        if not messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete {len(selected)} contact(s)? This cannot be undone."):
+        if not messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete {len(self.selected_positions)} contact(s)? This cannot be undone."):
             return
-        # Get indices to drop
-        df_to_show = self.df if not hasattr(self, 'table_frame') or not hasattr(self, 'tree') else self.get_current_df()
-        indices = []
-        for i in selected:
-            item_idx = self.tree.index(i)
-            if hasattr(self, 'current_df_override') and self.current_df_override is not None:
-                orig_idx = self.current_df_override.index[item_idx]
-            else:
-                orig_idx = item_idx
-            indices.append(orig_idx)
-        self.df.drop(self.df.index[indices], inplace=True)
-        self.df.reset_index(drop=True, inplace=True)
-        if self.csv_path:
-            self.df.to_csv(self.csv_path, index=False)
-        self.show_table()
+        # Selected rows are tracked as DataFrame positions, so filtered views map back directly
+        positions = self.contacts.delete_rows(list(self.selected_positions))
+        self.schedule_compact()
+        self.remove_from_view(positions)
+        self.refresh_table()
 
-    def get_current_df(self):
-        # Helper to get the DataFrame currently shown in the table
-        if hasattr(self, 'current_df_override') and self.current_df_override is not None:
-            return self.current_df_override
-        return self.df
+    def remove_from_view(self, deleted):
+        if self.view_groups is not None:
+            self.view_groups = self.view_groups[~np.isin(self.view_positions, deleted)]
+        self.view_positions = remap_after_delete(self.view_positions, deleted)
+        self.selected_positions = set()
 
-    def apply_filter(self):
+    def dedupe_popup(self):
+        if self.loading_in_progress():
+            return
         if self.df is None:
+            messagebox.showwarning("No CSV", "Please load a CSV file first.")
+            return
+        popup = tk.Toplevel(self.root)
+        popup.title("Normalize & Find Duplicates")
+        popup.geometry("380x330")
+        columns = [""] + list(self.df.columns)
+        column_vars = {}
+        for row, (label, keywords) in enumerate([("Name", ("name",)), ("Email", ("mail",)), ("Phone", ("phone", "mobile", "tel"))]):
+            tk.Label(popup, text=label + " column:").grid(row=row, column=0, sticky="e", padx=5, pady=4)
+            var = tk.StringVar(value=guess_column(self.df.columns, *keywords) or "")
+            ttk.Combobox(popup, textvariable=var, values=columns, state="readonly", width=25).grid(row=row, column=1, padx=5, pady=4)
+            column_vars[label] = var
+        tk.Label(popup, text="Default country code:").grid(row=3, column=0, sticky="e", padx=5, pady=4)
+        country_var = tk.StringVar(value=DEFAULT_COUNTRY_CODE)
+        tk.Entry(popup, textvariable=country_var, width=6).grid(row=3, column=1, sticky="w", padx=5, pady=4)
+        option_vars = {}
+        for row, label in enumerate(["Trim whitespace", "Normalize emails", "Normalize phones (E.164)", "Find duplicates"], start=4):
+            var = tk.BooleanVar(value=True)
+            tk.Checkbutton(popup, text=label, variable=var).grid(row=row, column=0, columnspan=2, sticky="w", padx=20)
+            option_vars[label] = var
+        def run():
+            name_col, email_col, phone_col = (column_vars[label].get() or None for label in ("Name", "Email", "Phone"))
+            options = {label: var.get() for label, var in option_vars.items()}
+            country_code = country_var.get().strip().lstrip("+")
+            popup.destroy()
+            self.run_dedupe(name_col, email_col, phone_col, country_code, options)
+        tk.Button(popup, text="Run", command=run, bg="#4CAF50", fg="white").grid(row=8, column=0, columnspan=2, pady=10)
+
+    def run_dedupe(self, name_col, email_col, phone_col, country_code, options):
+        # Work on a snapshot in the background; the result is dropped if the data changes meanwhile
+        snapshot, generation = ContactList(self.df.copy()), self.contacts.search_index.generation
+        tk.Label(self.progress_frame, text="Normalizing and looking for duplicates...").pack(side=tk.LEFT, padx=5)
+        def work():
+            try:
+                stats, groups = snapshot.clean(
+                    name_col,
+                    email_col,
+                    phone_col,
+                    country_code,
+                    trim=options["Trim whitespace"],
+                    emails=options["Normalize emails"],
+                    phones=options["Normalize phones (E.164)"],
+                    duplicates=options["Find duplicates"],
+                )
+                result = (snapshot.df if stats is not None else None, stats, groups)
+            except Exception as e:
+                result = e
+            self.root.after(0, self._finish_dedupe, generation, result)
+        threading.Thread(target=work, daemon=True).start()
+
+    def _finish_dedupe(self, generation, result):
+        self.hide_load_progress()
+        if isinstance(result, Exception):
+            messagebox.showerror("Error", f"Cleaning failed: {result}")
+            return
+        if generation != self.contacts.search_index.generation:
+            messagebox.showwarning("Data Changed", "The contacts were edited while cleaning ran; please run it again.")
+            return
+        df_new, stats, groups = result
+        lines = []
+        if df_new is not None:
+            self.contacts.replace_frame(df_new)
+            self.commit_bulk_change()
+            if "invalid_emails" in stats:
+                lines.append(f"Invalid emails: {stats['invalid_emails']}")
+            if "invalid_phones" in stats:
+                lines.append(f"Phones that could not be normalized: {stats['invalid_phones']}")
+        if groups is not None and (groups >= 0).any():
+            # Review view: candidates ordered by group, shaded per group
+            positions = np.flatnonzero(groups >= 0)
+            positions = positions[np.argsort(groups[positions], kind="stable")]
+            lines.append(f"Found {groups.max() + 1} duplicate group(s) covering {len(positions)} contacts.")
+            self.show_table(positions=positions, groups=groups[positions])
+        else:
+            if groups is not None:
+                lines.append("No duplicates found.")
+            self.add_filter_frame()
+            self.show_table()
+        messagebox.showinfo("Cleaned", "\n".join(lines) or "Done.")
+
+    def merge_groups(self, selected_only):
+        if self.view_groups is None:
+            return
+        positions, groups = self.view_positions, self.view_groups
+        if selected_only:
+            chosen = np.isin(positions, np.fromiter(self.selected_positions, dtype=np.int64))
+            positions, groups = positions[chosen], groups[chosen]
+        # Only groups with at least two chosen rows have anything to merge
+        _, inverse, counts = np.unique(groups, return_inverse=True, return_counts=True)
+        mergeable = counts[inverse] > 1
+        positions, groups = positions[mergeable], groups[mergeable]
+        if not len(positions):
+            messagebox.showwarning("No Selection", "Select at least two rows of a group to merge.")
+            return
+        if not messagebox.askyesno("Confirm Merge", f"Merge {len(positions)} contacts into {len(np.unique(groups))}? Missing fields are filled from the merged rows."):
+            return
+        removed = self.contacts.merge(positions, groups)
+        self.commit_bulk_change()
+        self.remove_from_view(removed)
+        # Drop groups that are down to a single row
+        _, inverse, counts = np.unique(self.view_groups, return_inverse=True, return_counts=True)
+        keep = counts[inverse] > 1
+        self.show_table(positions=self.view_positions[keep], groups=self.view_groups[keep])
+
+    def set_cell(self, pos, col_name, value):
+        self.contacts.set_cell(pos, col_name, value)
+        self.schedule_compact()
+
+    def schedule_compact(self):
+        # Edits hit the journal immediately; the CSV itself is rewritten by a debounced compact
+        if self.contacts.journal is None:
+            return
+        if self._compact_after is not None:
+            self.root.after_cancel(self._compact_after)
+        self._compact_after = self.root.after(COMPACT_DELAY_MS, self.compact)
+
+    def compact(self, wait=False, force=False):
+        if self._compact_after is not None:
+            self.root.after_cancel(self._compact_after)
+            self._compact_after = None
+        journal = self.contacts.journal
+        if journal is None or not (journal.pending or force):
+            return
+        if self._compact_thread is not None and self._compact_thread.is_alive():
+            if not wait:
+                self._compact_after = self.root.after(COMPACT_DELAY_MS, self.compact)
+                return
+            self._compact_thread.join()
+        # Snapshot on the Tk thread; edits made while the file is written stay in the journal
+        snapshot, count, cache = self.df.copy(), journal.pending, self.contacts.cache
+        def run():
+            try:
+                journal.compact(snapshot, count)
+                if cache is not None:
+                    cache.store(snapshot)
+            except Exception as e:
+                self.root.after(0, lambda: messagebox.showerror("Save Error", f"Failed to save CSV: {e}"))
+        self._compact_thread = threading.Thread(target=run)
+        self._compact_thread.start()
+        if wait:
+            self._compact_thread.join()
+
+    def commit_bulk_change(self):
+        # Bulk rewrites (normalization, merges) are not journaled cell by cell; save a full
+        # snapshot right away so later journal entries always apply to the right rows
+        self.contacts.search_index.warm(lambda: self.df)
+        self.compact(wait=True, force=True)
+
+    def save_now(self):
+        if self.loading_in_progress() or self.contacts.journal is None:
+            return
+        self.compact(wait=True)
+        messagebox.showinfo("Saved", f"Saved {self.contacts.path}")
+
+    def save_as(self):
+        if self.loading_in_progress() or self.df is None:
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=SAVE_FILETYPES)
+        if not file_path:
+            return
+        # Settle the current file first; from here on edits are journaled against the new one
+        self.compact(wait=True)
+        try:
+            self.contacts.save_as(file_path, cache=self.use_cache.get())
+        except Exception as e:
+            messagebox.showerror("Save Error", f"Failed to save: {e}")
+            return
+        self.file_entry.delete(0, tk.END)
+        self.file_entry.insert(0, file_path)
+        messagebox.showinfo("Saved", f"Saved {file_path}")
+
+    def on_close(self):
+        self.compact(wait=True)
+        self.root.destroy()
+
+    def apply_filter(self):
+        if self.df is None or self.loading_in_progress():
+            return
+        col = self.filter_column.get()
+        ftype = self.filter_type.get()
+        val = self.filter_value.get().strip()
+        try:
+            positions, columns = self.contacts.filter(ftype, col, val)
+        except FilterQueryError as e:
+            messagebox.showerror("Invalid Query", str(e))
+            return
+        self.show_table(positions=positions, columns=columns)
+
+    def on_filter_change(self, *_):
+        if not self.live_filter.get() or self.df is None or self.loader is not None:
             return
+        # Debounce keystrokes; any query still running is superseded by the next one
+        self._live_generation += 1
+        if self._live_after is not None:
+            self.root.after_cancel(self._live_after)
+        self._live_after = self.root.after(LIVE_FILTER_DELAY_MS, self.start_live_filter)
+
+    def start_live_filter(self):
+        self._live_after = None
         col = self.filter_column.get()
         ftype = self.filter_type.get()
         val = self.filter_value.get().strip()
-        df_filtered = self.df.copy()
-        if ftype == "Contains" and val:
-            df_filtered = df_filtered[df_filtered[col].astype(str).str.contains(val, case=False, na=False)]
-        elif ftype == "Starts With" and val:
-            df_filtered = df_filtered[df_filtered[col].astype(str).str.startswith(val, na=False)]
-        elif ftype == "Filled Only":
-            df_filtered = df_filtered[df_filtered[col].notna() & (df_filtered[col].astype(str).str.strip() != "")]
-        elif ftype == "Most Filled":
-            # Show only the column with the most filled values
-            most_filled_col = self.df.count().idxmax()
-            df_filtered = self.df[[most_filled_col]]
-        self.show_table(df_override=df_filtered)
+        if ftype not in ("Contains", "Starts With", "Query") or not val:
+            self.apply_filter()
+            return
+        generation = self._live_generation
+        contacts = self.contacts
+        version = contacts.search_index.generation
+        # Narrow incrementally: "joh" can only match rows that matched "jo"
+        within = None
+        previous = self._live_result
+        if previous is not None and previous[:2] == (col, ftype) and previous[4] == version:
+            old = previous[2]
+            if (ftype == "Contains" and old.lower() in val.lower()) or (ftype == "Starts With" and val.startswith(old)):
+                within = previous[3]
+        def run():
+            if generation != self._live_generation:
+                return
+            try:
+                positions, _ = contacts.filter(ftype, col, val, within)
+            except FilterQueryError:
+                # Usually a half-typed query; keep the current view until it parses
+                return
+            if generation == self._live_generation:
+                self.root.after(0, self._finish_live_filter, generation, (col, ftype, val, positions, version))
+        threading.Thread(target=run, daemon=True).start()
+
+    def _finish_live_filter(self, generation, result):
+        # Drop results for stale keystrokes or for data that was edited meanwhile
+        if generation != self._live_generation or result[4] != self.contacts.search_index.generation:
+            return
+        self._live_result = result
+        if len(result[3]) and self.view_columns == list(self.df.columns) and hasattr(self, 'tree') and self.tree.winfo_exists():
+            # Same columns: swap the rows under the existing Treeview instead of rebuilding it
+            self.view_positions = result[3]
+            self.selected_positions = set()
+            self._render_rows(0, force=True)
+        else:
+            self.show_table(positions=result[3])
 
     def clear_filter(self):
         self.filter_value.set("")
         self.show_table()
 
     def export_selected(self):
+        if self.loading_in_progress():
+            return
         if not hasattr(self, 'tree') or self.df is None:
             messagebox.showwarning("No Data", "No data to export.")
             return
-        selected = self.tree.selection()
-        if not selected:
+        if not self.selected_positions:
             messagebox.showwarning("No Selection", "Please select rows to export.")
             return
-        cols = list(self.df.columns)
-        rows = [self.tree.item(i)['values'] for i in selected]
-        df_export = pd.DataFrame(rows, columns=cols)
-        file_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel files", "*.xlsx")])
-        if file_path:
-            df_export.to_excel(file_path, index=False)
-            messagebox.showinfo("Exported", f"Exported {len(df_export)} contacts to {file_path}")
+        # Keep the on-screen order of the selected rows
+        positions = self.view_positions[np.isin(self.view_positions, np.fromiter(self.selected_positions, dtype=np.int64))]
+        self.start_export(positions)
+
+    def export_filtered(self):
+        if self.loading_in_progress():
+            return
+        if self.df is None or not len(self.view_positions):
+            messagebox.showwarning("No Data", "No data to export.")
+            return
+        self.start_export(self.view_positions)
+
+    def start_export(self, positions):
+        if self._export_thread is not None and self._export_thread.is_alive():
+            messagebox.showwarning("Exporting", "Please wait for the current export to finish.")
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=EXPORT_FILETYPES)
+        if not file_path:
+            return
+        # Slice the backing DataFrame on the Tk thread; the file is written in the background
+        df_export = self.contacts.view(positions, self.view_columns)
+        total = len(df_export)
+        progress_var = tk.DoubleVar(value=0)
+        ttk.Progressbar(self.progress_frame, variable=progress_var, maximum=max(1, total), length=350).pack(side=tk.LEFT, padx=5)
+        label = tk.Label(self.progress_frame, text=f"Exporting {total:,} contacts...")
+        label.pack(side=tk.LEFT, padx=5)
+        def progress(rows):
+            self.root.after(0, progress_var.set, rows)
+        def run():
+            try:
+                write_frame(df_export, file_path, progress)
+                result = None
+            except Exception as e:
+                result = e
+            self.root.after(0, self._finish_export, file_path, total, result)
+        self._export_thread = threading.Thread(target=run, daemon=True)
+        self._export_thread.start()
 
-    def show_table(self, df_override=None):
+    def _finish_export(self, file_path, total, result):
+        self.hide_load_progress()
+        if isinstance(result, Exception):
+            messagebox.showerror("Export Error", f"Failed to export: {result}")
+            return
+        messagebox.showinfo("Exported", f"Exported {total} contacts to {file_path}")
+
+    def show_table(self, df_override=None, positions=None, columns=None, groups=None):
         # Remove old table if exists
         if hasattr(self, 'table_frame'):
             self.table_frame.destroy()
         self.table_frame = tk.Frame(self.root)
         self.table_frame.pack(fill="both", expand=True, padx=10, pady=10)
-        df_to_show = df_override if df_override is not None else self.df
-        if df_to_show is None or df_to_show.empty:
-            return
-        cols = list(df_to_show.columns)
-        tree_scroll = tk.Scrollbar(self.table_frame, orient="vertical")
-        tree_scroll.pack(side="right", fill="y")
-        tree = ttk.Treeview(self.table_frame, columns=cols, show='headings', selectmode='extended', yscrollcommand=tree_scroll.set)
-        tree_scroll.config(command=tree.yview)
+        # The table is a view over self.df: an array of row positions plus the columns to show
+        if df_override is not None:
+            positions = self.df.index.get_indexer(df_override.index)
+            columns = df_override.columns
+        if positions is None:
+            positions = np.arange(0 if self.df is None else len(self.df))
+        self.view_positions = np.asarray(positions, dtype=np.int64)
+        self.view_columns = list(columns) if columns is not None else list(self.df.columns) if self.df is not None else []
+        self.view_groups = None if groups is None else np.asarray(groups)
+        self.view_offset = 0
+        self.window_start = self.window_stop = 0
+        self.selected_positions = set()
+        if not len(self.view_positions) or not self.view_columns:
+            return
+        if self.view_groups is not None:
+            review = tk.Frame(self.table_frame)
+            review.pack(side="top", fill="x", pady=(0, 5))
+            tk.Label(review, text=f"{len(np.unique(self.view_groups))} duplicate group(s): rows with the same shading are merge candidates").pack(side=tk.LEFT)
+            tk.Button(review, text="Merge All Groups", command=lambda: self.merge_groups(False), bg="#9C27B0", fg="white").pack(side=tk.RIGHT, padx=5)
+            tk.Button(review, text="Merge Selected", command=lambda: self.merge_groups(True), bg="#9C27B0", fg="white").pack(side=tk.RIGHT, padx=5)
+        cols = self.view_columns
+        self.tree_scroll = tk.Scrollbar(self.table_frame, orient="vertical", command=self._on_scrollbar)
+        self.tree_scroll.pack(side="right", fill="y")
+        tree = ttk.Treeview(self.table_frame, columns=cols, show='headings', selectmode='extended', yscrollcommand=self._on_tree_yscroll)
         for col in cols:
             tree.heading(col, text=col)
             tree.column(col, width=120, anchor='center')
         # Add alternating row colors
         style = ttk.Style()
-        style.configure("Treeview", rowheight=24)
+        style.configure("Treeview", rowheight=VIRTUAL_ROW_HEIGHT)
         style.map('Treeview', background=[('selected', '#b3d9ff')])
         style.configure("Treeview.Heading", font=("Arial", 10, "bold"))
         style.layout("Treeview", [('Treeview.treearea', {'sticky': 'nswe'})])
-        for i, row in df_to_show.iterrows():
-            values = [row[col] for col in cols]
-            tag = 'evenrow' if i % 2 == 0 else 'oddrow'
-            tree.insert('', 'end', values=values, tags=(tag,))
         tree.tag_configure('evenrow', background='#f9f9f9')
         tree.tag_configure('oddrow', background='#e6e6e6')
         tree.pack(fill="both", expand=True, side="left")
@@ -220,53 +674,1421 @@ class ContactCleanerApp:
         style.configure("Treeview", bordercolor="#cccccc", borderwidth=1)
         # Smooth mousewheel scrolling
         def _on_mousewheel(event):
-            tree.yview_scroll(int(-1*(event.delta/120)), "units")
+            self._render_rows(self.view_offset + int(-1*(event.delta/120)))
         tree.bind('<Enter>', lambda e: tree.bind_all('<MouseWheel>', _on_mousewheel))
         tree.bind('<Leave>', lambda e: tree.unbind_all('<MouseWheel>'))
+        # Re-window when the viewport is resized
+        tree.bind('<Configure>', lambda e: self._render_rows(self.view_offset))
+        tree.bind('<<TreeviewSelect>>', self._on_tree_select)
+        # Direct cell editing on double-click
+        tree.bind('<Double-1>', self.on_double_click)
         # Save reference for later editing
         self.tree = tree
+        self._render_rows(0, force=True)
 
-        # Direct cell editing on double-click
-        def on_double_click(event):
-            region = tree.identify('region', event.x, event.y)
-            if region != 'cell':
+    def refresh_table(self):
+        # Re-render the current view in place, keeping the scroll position
+        if not hasattr(self, 'tree') or not self.tree.winfo_exists() or not len(self.view_positions):
+            self.show_table(positions=self.view_positions, columns=self.view_columns, groups=self.view_groups)
+            return
+        self._render_rows(self.view_offset, force=True)
+
+    def _visible_rows(self):
+        return max(1, self.tree.winfo_height() // VIRTUAL_ROW_HEIGHT)
+
+    def _render_rows(self, offset, force=False):
+        # Only the viewport plus an overscan margin is inserted into the Treeview;
+        # scrolling inside that window just moves the Treeview, leaving it re-materializes
+        total = len(self.view_positions)
+        visible = self._visible_rows()
+        offset = max(0, min(offset, total - visible))
+        self.view_offset = offset
+        if force or offset < self.window_start or offset + visible > self.window_stop:
+            self.window_start = max(0, offset - VIRTUAL_OVERSCAN)
+            self.window_stop = min(total, offset + visible + VIRTUAL_OVERSCAN)
+            self._materialize_window()
+        span = self.window_stop - self.window_start
+        self.tree.yview_moveto((offset - self.window_start) / span if span else 0)
+        self._update_scrollbar()
+
+    def _materialize_window(self):
+        tree = self.tree
+        tree.delete(*tree.get_children())
+        positions = self.view_positions[self.window_start:self.window_stop]
+        block = self.df.iloc[positions, self.df.columns.get_indexer(self.view_columns)]
+        values = block.astype(object).where(block.notna(), "").to_numpy()
+        stripes = self.view_groups[self.window_start:self.window_stop] if self.view_groups is not None else range(self.window_start, self.window_stop)
+        for pos, row, stripe in zip(positions, values, stripes):
+            tag = 'evenrow' if stripe % 2 == 0 else 'oddrow'
+            # Item ids are DataFrame positions so any visible row maps straight back to self.df
+            tree.insert('', 'end', iid=str(pos), values=list(row), tags=(tag,))
+        selected = [str(pos) for pos in positions if pos in self.selected_positions]
+        if selected:
+            tree.selection_set(selected)
+
+    def _update_scrollbar(self):
+        total = len(self.view_positions)
+        if total:
+            self.tree_scroll.set(self.view_offset / total, min(1.0, (self.view_offset + self._visible_rows()) / total))
+
+    def _on_scrollbar(self, action, *args):
+        if action == 'moveto':
+            self._render_rows(int(float(args[0]) * len(self.view_positions)))
+        elif action == 'scroll':
+            step = int(args[0]) * (self._visible_rows() if args[1] == 'pages' else 1)
+            self._render_rows(self.view_offset + step)
+
+    def _on_tree_yscroll(self, first, last):
+        # The Treeview scrolled itself (keyboard navigation): track the offset and page in
+        # more rows once it reaches the edge of the materialized window
+        span = self.window_stop - self.window_start
+        self.view_offset = self.window_start + int(round(float(first) * span))
+        self._update_scrollbar()
+        if (float(first) <= 0 and self.window_start > 0) or (float(last) >= 1 and self.window_stop < len(self.view_positions)):
+            self.tree.after_idle(self._render_rows, self.view_offset, True)
+
+    def _on_tree_select(self, event=None):
+        # Selection outlives the materialized window, so keep it as a set of DataFrame positions
+        materialized = {int(i) for i in self.tree.get_children()}
+        self.selected_positions -= materialized
+        self.selected_positions.update(int(i) for i in self.tree.selection())
+
+    def on_double_click(self, event):
+        tree = self.tree
+        region = tree.identify('region', event.x, event.y)
+        if region != 'cell':
+            return
+        row_id = tree.identify_row(event.y)
+        col_id = tree.identify_column(event.x)
+        if not row_id or not col_id or self.loading_in_progress():
+            return
+        col_index = int(col_id.replace('#', '')) - 1
+        col_name = self.view_columns[col_index]
+        x, y, width, height = tree.bbox(row_id, col_id)
+        value = tree.set(row_id, col_name)
+        # Create entry widget overlay
+        entry = tk.Entry(tree, width=width//8)
+        entry.place(x=x, y=y, width=width, height=height)
+        entry.insert(0, value)
+        entry.focus()
+        def save_edit(event=None):
+            new_val = entry.get()
+            tree.set(row_id, col_name, new_val)
+            # Update DataFrame at the row's position and save
+            self.set_cell(int(row_id), col_name, new_val)
+            entry.destroy()
+        entry.bind('<Return>', save_edit)
+        entry.bind('<FocusOut>', lambda e: entry.destroy())
+
+
+class ContactList:
+    """A contact list and the edits on it, independent of Tk.
+
+    The GUI and the command line both go through this class, so a recipe run from the
+    command line produces the same result as the same steps clicked through in the app.
+    """
+
+    def __init__(self, df=None, path=None):
+        self.df = df
+        self.path = path
+        self.journal = None
+        self.cache = None
+        self.search_index = SearchIndex()
+        self.filter_engine = FilterEngine()
+
+    @classmethod
+    def load(cls, path, journal=True, cache=False):
+        contacts = cls(path=path)
+        df = read_columnar_source(path, cache)
+        contacts.finish_load(pd.read_csv(path) if df is None else df, journal, cache, cached=df is not None)
+        return contacts
+
+    def finish_load(self, df, journal=True, cache=False, cached=False):
+        # Replay edits that were journaled but never compacted (e.g. after a crash); without
+        # `journal` they are still applied but nothing next to the file is written or deleted
+        self.df = optimize_dtypes(df)
+        self.attach_cache(cache, store=not cached)
+        edits = EditJournal(self.path, discard_stale=journal)
+        entries = edits.entries()
+        if entries:
+            self.df = apply_journal(self.df, entries)
+        self.journal = edits if journal else None
+        return len(entries)
+
+    def attach_cache(self, enabled, store=True):
+        # Arrow copy of a CSV, written in the background from the data as it is on disk
+        columnar = os.path.splitext(self.path)[1].lower() in COLUMNAR_EXTENSIONS
+        self.cache = ColumnarCache(self.path) if enabled and HAS_PYARROW and not columnar else None
+        if self.cache is not None and store:
+            threading.Thread(target=self.cache.store, args=(self.df.copy(),)).start()
+
+    def save_as(self, path, journal=True, cache=False):
+        # Write the list in the format of `path` and keep working on that file from now on
+        os.replace(write_temp(self.df, path), path)
+        self.path = path
+        self.journal = EditJournal(path) if journal else None
+        self.attach_cache(cache)
+
+    def record(self, entry):
+        if self.journal is not None:
+            self.journal.append(entry)
+
+    def set_cell(self, pos, col_name, value):
+        set_value(self.df, pos, col_name, value)
+        self.search_index.update(pos, col_name, value)
+        self.record({"op": "set", "row": int(pos), "col": col_name, "value": value})
+
+    def keep_columns(self, cols):
+        cols = list(cols)
+        self.df = self.df[cols]
+        self.search_index.keep(cols)
+        self.record({"op": "keep", "cols": cols})
+
+    def delete_rows(self, positions):
+        positions = np.unique(np.asarray(positions, dtype=np.int64))
+        self.df = self.df.drop(self.df.index[positions]).reset_index(drop=True)
+        self.search_index.delete(positions)
+        self.record({"op": "delete", "rows": positions.tolist()})
+        return positions
+
+    def keep_rows(self, positions):
+        return self.delete_rows(np.setdiff1d(np.arange(len(self.df)), positions))
+
+    def replace_frame(self, df):
+        # Bulk rewrites are not journaled; the caller saves a full snapshot instead
+        self.df = df
+        self.search_index.invalidate()
+
+    def filter(self, ftype, col=None, value="", within=None):
+        # Returns (positions, columns) through the search index, without copying the
+        # DataFrame; None means all rows / all columns
+        if ftype == "Contains" and value:
+            return self.search_index.contains(self.df, col, value, within), None
+        if ftype == "Starts With" and value:
+            return self.search_index.starts_with(self.df, col, value, within), None
+        if ftype == "Filled Only":
+            return self.search_index.filled(self.df, col), None
+        if ftype == "Most Filled":
+            # Only the column with the most filled values
+            return None, [self.df.count().idxmax()]
+        if ftype == "Query" and value:
+            # Compound query across columns, e.g. city = paris and (email ~ gmail or phone is empty)
+            return self.filter_engine.filter(self.df, value, self.search_index), None
+        if ftype not in FILTER_TYPES:
+            raise ValueError(f"Unknown filter type {ftype!r}")
+        return None, None
+
+    def clean(self, name_col=None, email_col=None, phone_col=None, country_code=DEFAULT_COUNTRY_CODE,
+              trim=True, emails=True, phones=True, duplicates=True):
+        # Returns (stats, groups); stats is None when nothing was normalized and groups
+        # is None when duplicates were not looked for
+        stats = None
+        if trim or emails or phones:
+            df, stats = normalize_contacts(self.df, email_col if emails else None, phone_col if phones else None, country_code, trim)
+            self.replace_frame(df)
+        groups = find_duplicates(self.df, name_col, email_col, phone_col) if duplicates else None
+        return stats, groups
+
+    def merge(self, positions, groups):
+        df, removed = merge_duplicates(self.df, positions, groups)
+        self.replace_frame(df)
+        return removed
+
+    def view(self, positions=None, columns=None):
+        # A copy of the given rows (in the given order) and columns, dtypes intact
+        rows = slice(None) if positions is None else np.asarray(positions, dtype=np.int64)
+        cols = slice(None) if columns is None else self.df.columns.get_indexer(list(columns))
+        return self.df.iloc[rows, cols].reset_index(drop=True)
+
+    def export(self, path, positions=None, columns=None, progress=None):
+        df = self.view(positions, columns)
+        write_frame(df, path, progress)
+        return len(df)
+
+
+class CSVChunkLoader:
+    """Parses a CSV in chunks on a background thread and queues them for the Tk loop."""
+
+    def __init__(self, path, chunksize=LOAD_CHUNK_ROWS, use_cache=False):
+        self.path = path
+        self.chunksize = chunksize
+        self.use_cache = use_cache
+        # Set when the list came from a columnar file or cache rather than being parsed
+        self.cached = False
+        self.total_bytes = os.path.getsize(path)
+        self.events = queue.Queue()
+        self._cancel = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _run(self):
+        # Events are (kind, payload, bytes_read, rows_read) tuples
+        rows = 0
+        try:
+            # Columnar files and up-to-date caches need no parsing and arrive as one chunk
+            df = read_columnar_source(self.path, self.use_cache)
+            if df is not None:
+                self.cached = True
+                self.events.put(("chunk", df, self.total_bytes, len(df)))
+                self.events.put(("done", None, self.total_bytes, len(df)))
                 return
-            row_id = tree.identify_row(event.y)
-            col_id = tree.identify_column(event.x)
-            if not row_id or not col_id:
+            with open(self.path, "rb") as handle:
+                for chunk in pd.read_csv(handle, chunksize=self.chunksize):
+                    if self._cancel.is_set():
+                        return
+                    rows += len(chunk)
+                    self.events.put(("chunk", chunk, handle.tell(), rows))
+            self.events.put(("done", None, self.total_bytes, rows))
+        except Exception as e:
+            self.events.put(("error", e, 0, rows))
+
+
+class EditJournal:
+    """Append-only log of edits to a contact list file, folded back into it by compact().
+
+    The first line records the size/mtime of the file the edits apply to, so a journal
+    left behind by an already-compacted file is recognised as stale and ignored (and
+    deleted, unless `discard_stale` is false). The file is rewritten in its own format
+    (CSV, Parquet or Arrow).
+    """
+
+    def __init__(self, csv_path, discard_stale=True):
+        self.csv_path = csv_path
+        self.path = csv_path + JOURNAL_SUFFIX
+        self._lock = threading.Lock()
+        self._handle = None
+        self._base = stat_key(csv_path)
+        self._lines = self._read_pending(discard_stale)
+
+    @property
+    def pending(self):
+        return len(self._lines)
+
+    def entries(self):
+        return [json.loads(line) for line in self._lines]
+
+    def append(self, entry):
+        line = json.dumps(entry)
+        with self._lock:
+            if self._handle is None:
+                fresh = not os.path.exists(self.path)
+                self._handle = open(self.path, "a", encoding="utf-8")
+                if fresh:
+                    self._handle.write(json.dumps({"op": "base", **self._base}) + "\n")
+            self._handle.write(line + "\n")
+            self._handle.flush()
+            os.fsync(self._handle.fileno())
+            self._lines.append(line)
+
+    def compact(self, df, count):
+        # Write the snapshot (which already includes the first `count` entries) to a temp
+        # file, swap it in atomically and keep only the entries journaled after the snapshot
+        tmp_path = write_temp(df, self.csv_path)
+        try:
+            with self._lock:
+                self._close()
+                base = stat_key(tmp_path)
+                os.replace(tmp_path, self.csv_path)
+                self._base = base
+                self._lines = self._lines[count:]
+                self._rewrite()
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _rewrite(self):
+        if not self._lines:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            handle.write(json.dumps({"op": "base", **self._base}) + "\n")
+            handle.writelines(line + "\n" for line in self._lines)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _read_pending(self, discard_stale):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, encoding="utf-8") as handle:
+            lines = handle.read().splitlines()
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except ValueError:
+            header = {}
+        if header.get("op") != "base" or {k: header.get(k) for k in self._base} != self._base:
+            if discard_stale:
+                os.remove(self.path)
+            return []
+        pending = []
+        for line in lines[1:]:
+            try:
+                json.loads(line)
+            except ValueError:
+                # Torn write from a crash: everything before it is still valid
+                break
+            pending.append(line)
+        return pending
+
+    def _close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+class ColumnarCache:
+    """Arrow IPC copy of a CSV kept next to it (<file>.csv.arrow) so reopening skips parsing.
+
+    The copy records the CSV's size, mtime and SHA-256. It is used when size and mtime
+    still match, or when only the mtime moved (e.g. the file was copied) but the content
+    hash is unchanged; anything else means the CSV changed and is parsed again.
+    """
+
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self.path = csv_path + CACHE_SUFFIX
+
+    def load(self):
+        # The cached DataFrame, or None when there is no up-to-date copy
+        import pyarrow as pa
+        if not os.path.exists(self.path):
+            return None
+        try:
+            # Memory-mapped: checking the key reads only the footer, and the columns are
+            # paged in straight from the OS cache
+            with pa.memory_map(self.path) as source:
+                reader = pa.ipc.open_file(source)
+                key = json.loads(reader.schema.metadata[CACHE_METADATA_KEY])
+                current = stat_key(self.csv_path)
+                if key["size"] != current["size"]:
+                    return None
+                if key["mtime_ns"] != current["mtime_ns"] and key["sha256"] != file_digest(self.csv_path):
+                    return None
+                return reader.read_all().to_pandas()
+        except (OSError, KeyError, TypeError, ValueError):
+            return None
+
+    def store(self, df):
+        # Best effort: a copy that cannot be written only means the next open parses the CSV
+        try:
+            before = stat_key(self.csv_path)
+            digest = file_digest(self.csv_path)
+            if stat_key(self.csv_path) != before:
                 return
-            col_index = int(col_id.replace('#', '')) - 1
-            col_name = cols[col_index]
-            x, y, width, height = tree.bbox(row_id, col_id)
-            value = tree.set(row_id, col_name)
-            # Create entry widget overlay
-            entry = tk.Entry(tree, width=width//8)
-            entry.place(x=x, y=y, width=width, height=height)
-            entry.insert(0, value)
-            entry.focus()
-            def save_edit(event=None):
-                new_val = entry.get()
-                tree.set(row_id, col_name, new_val)
-                # Update DataFrame
-                item_idx = tree.index(row_id)
-                df_to_show.iloc[item_idx, col_index] = new_val
-                # If not filtered, update main df and save to CSV
-                if df_override is None:
-                    self.df.iloc[item_idx, col_index] = new_val
-                    if self.csv_path:
-                        self.df.to_csv(self.csv_path, index=False)
-                else:
-                    # If filtered, update main df as well
-                    orig_idx = df_to_show.index[item_idx]
-                    self.df.at[orig_idx, col_name] = new_val
-                    if self.csv_path:
-                        self.df.to_csv(self.csv_path, index=False)
-                entry.destroy()
-            entry.bind('<Return>', save_edit)
-            entry.bind('<FocusOut>', lambda e: entry.destroy())
-        tree.bind('<Double-1>', on_double_click)
+            tmp_path = write_temp(df, self.path, {CACHE_METADATA_KEY: json.dumps({**before, "sha256": digest})})
+            try:
+                os.replace(tmp_path, self.path)
+            except OSError:
+                os.remove(tmp_path)
+        except Exception:
+            pass
+
+
+class ColumnIndex:
+    """Lowercased values of one column with a sorted prefix index and a trigram index.
+
+    Edits only mark rows dirty and deletes remap positions in place; every query
+    verifies its candidates against the current values, so the indexes just need to
+    return a superset of the matching rows.
+    """
+
+    def __init__(self, series):
+        self.values = normalize_text(series)
+        self.dirty = set()
+        # Prefix index: positions sorted by value, searched with bisection
+        self.order = argsort_strings(self.values)
+        self.sorted_values = self.values[self.order]
+        # Trigram index in CSR form: rows containing tri_keys[i] are tri_rows[tri_starts[i]:tri_starts[i + 1]]
+        lengths = np.fromiter(map(len, self.values), dtype=np.int64, count=len(self.values))
+        self.long_rows = np.flatnonzero(lengths > TRIGRAM_MAX_LEN)
+        short_rows = np.flatnonzero(lengths <= TRIGRAM_MAX_LEN)
+        keys, rows = [], []
+        for start in range(0, len(short_rows), TRIGRAM_BUILD_ROWS):
+            block = short_rows[start:start + TRIGRAM_BUILD_ROWS]
+            # Two end markers make every character start a trigram, so 1-2 character
+            # queries are a range of trigram keys too
+            padded = np.char.add(self.values[block].astype(str), TRIGRAM_END * 2)
+            codes, valid = trigram_codes(padded, TRIGRAM_MAX_LEN + 2)
+            keys.append(codes[valid])
+            rows.append(np.broadcast_to(block[:, None], codes.shape)[valid])
+        keys = np.concatenate(keys) if keys else np.empty(0, dtype=np.int64)
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        by_key = np.lexsort((rows, keys))
+        keys, rows = keys[by_key], rows[by_key]
+        if len(keys):
+            first = np.ones(len(keys), dtype=bool)
+            first[1:] = (keys[1:] != keys[:-1]) | (rows[1:] != rows[:-1])
+            keys, rows = keys[first], rows[first]
+        self.tri_keys, starts = np.unique(keys, return_index=True)
+        self.tri_starts = np.append(starts, len(keys))
+        self.tri_rows = rows.astype(np.int32)
+
+    def contains(self, text, within=None):
+        text = text.lower()
+        if within is not None:
+            # Refining an earlier query: only its hits can still match
+            return self._verify(within, lambda value: text in value)
+        if len(text) < 3:
+            # Rows with a trigram starting with `text`, which is exact for 1-2 characters
+            chars = [ord(c) for c in text]
+            lo = chars[0] << 42 | (chars[1] << 21 if len(chars) > 1 else 0)
+            hi = lo + (1 << (21 if len(chars) > 1 else 42))
+            i, j = np.searchsorted(self.tri_keys, [lo, hi])
+            # The range holds a row once per trigram, so for common characters it is several
+            # times the row count; marking a mask dedupes it in one pass instead of sorting
+            hit = np.zeros(len(self.values), dtype=bool)
+            hit[self.tri_rows[self.tri_starts[i]:self.tri_starts[j]]] = True
+            rows = np.flatnonzero(hit)
+            return self._merge_unindexed(rows, lambda value: text in value)
+        codes, valid = trigram_codes(np.array([text]), len(text))
+        candidates = None
+        postings = []
+        for key in np.unique(codes[valid]):
+            i = np.searchsorted(self.tri_keys, key)
+            if i == len(self.tri_keys) or self.tri_keys[i] != key:
+                candidates = np.empty(0, dtype=np.int64)
+                postings = []
+                break
+            postings.append(self.tri_rows[self.tri_starts[i]:self.tri_starts[i + 1]])
+        for rows in sorted(postings, key=len):
+            candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+        candidates = candidates.astype(np.int64)
+        if len(postings) > 1:
+            # Several trigrams can co-occur without being adjacent, so check the text itself
+            candidates = self._verify(candidates, lambda value: text in value)
+        return self._merge_unindexed(candidates, lambda value: text in value)
+
+    def starts_with(self, text, within=None):
+        text = text.lower()
+        if within is not None:
+            return self._verify(within, lambda value: value.startswith(text))
+        lo, hi = np.searchsorted(self.sorted_values, [text, text + "\U0010ffff"])
+        rows = np.sort(self.order[lo:hi])
+        return self._merge_unindexed(rows, lambda value: value.startswith(text), include_long=False)
+
+    def filled(self):
+        return np.flatnonzero(pd.Series(self.values).str.strip().to_numpy() != "")
+
+    def update(self, pos, value):
+        self.values[pos] = normalize_text(pd.Series([value]))[0]
+        self.dirty.add(pos)
+
+    def delete(self, deleted):
+        keep = np.ones(len(self.values), dtype=bool)
+        keep[deleted] = False
+        self.values = self.values[keep]
+        in_order = keep[self.order]
+        self.order = remap_after_delete(self.order[in_order], deleted)
+        self.sorted_values = self.sorted_values[in_order]
+        kept_rows = keep[self.tri_rows]
+        kept_before = np.concatenate([[0], np.cumsum(kept_rows)])
+        self.tri_starts = kept_before[self.tri_starts]
+        self.tri_rows = remap_after_delete(self.tri_rows[kept_rows].astype(np.int64), deleted).astype(np.int32)
+        self.long_rows = remap_after_delete(self.long_rows, deleted)
+        self.dirty = set(remap_after_delete(np.fromiter(self.dirty, dtype=np.int64), deleted).tolist())
+
+    def _merge_unindexed(self, rows, match, include_long=True):
+        # Index hits are current except for rows edited since the build (and long values,
+        # which have no trigrams); those are checked against their current value instead
+        extra = [self.long_rows] if include_long else []
+        if self.dirty:
+            dirty = np.fromiter(self.dirty, dtype=np.int64)
+            rows = np.setdiff1d(rows, dirty, assume_unique=True)
+            extra.append(dirty)
+        if not extra:
+            return rows
+        extra = self._verify(np.unique(np.concatenate(extra)), match)
+        return np.union1d(rows, extra) if len(extra) else rows
+
+    def _verify(self, candidates, match):
+        if not len(candidates):
+            return candidates.astype(np.int64)
+        hits = np.fromiter(map(match, self.values[candidates]), dtype=bool, count=len(candidates))
+        return candidates[hits].astype(np.int64)
+
+
+class SearchIndex:
+    """Per-column ColumnIndexes, built in the background and kept in step with edits."""
+
+    def __init__(self):
+        self._columns = {}
+        self._lock = threading.RLock()
+        # Bumped by every edit so a background build started on older data is discarded
+        self._generation = 0
+
+    def warm(self, get_df):
+        def run():
+            for col in list(get_df().columns):
+                with self._lock:
+                    df = get_df()
+                    if col in self._columns or col not in df.columns:
+                        continue
+                    series, generation = df[col], self._generation
+                index = ColumnIndex(series)
+                with self._lock:
+                    if generation == self._generation and col not in self._columns:
+                        self._columns[col] = index
+        threading.Thread(target=run, daemon=True).start()
+
+    def column(self, df, col):
+        with self._lock:
+            if col not in self._columns:
+                self._columns[col] = ColumnIndex(df[col])
+            return self._columns[col]
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def contains(self, df, col, text, within=None):
+        with self._lock:
+            return self.column(df, col).contains(text, within)
+
+    def starts_with(self, df, col, text, within=None):
+        # The index is case-insensitive; "Starts With" matches case, so re-check the hits
+        with self._lock:
+            positions = self.column(df, col).starts_with(text, within)
+        return positions[df[col].iloc[positions].astype(str).str.startswith(text).to_numpy(dtype=bool)]
+
+    def filled(self, df, col):
+        with self._lock:
+            return self.column(df, col).filled()
+
+    def update(self, pos, col, value):
+        with self._lock:
+            self._generation += 1
+            if col in self._columns:
+                self._columns[col].update(pos, value)
+
+    def delete(self, positions):
+        deleted = np.sort(np.asarray(positions, dtype=np.int64))
+        with self._lock:
+            self._generation += 1
+            for index in self._columns.values():
+                index.delete(deleted)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._columns = {}
+
+    def keep(self, cols):
+        with self._lock:
+            self._generation += 1
+            self._columns = {col: index for col, index in self._columns.items() if col in cols}
+
+
+class FilterQueryError(ValueError):
+    pass
+
+
+class Predicate:
+    """One column test in a filter query, e.g. city = paris or age between 20 and 40."""
+
+    def __init__(self, column, op, value=None):
+        self.column = column
+        self.op = op
+        self.value = value
+        if op == "matches":
+            try:
+                re.compile(value)
+            except re.error as e:
+                raise FilterQueryError(f"Invalid regex {value!r}: {e}")
+        if op in ("<", "<=", ">", ">="):
+            self.number = _parse_number(value)
+        elif op == "between":
+            self.number = [_parse_number(v) for v in value]
+
+    @property
+    def key(self):
+        return (self.column, self.op, self.value if not isinstance(self.value, list) else tuple(self.value))
+
+    def evaluate(self, engine, rows):
+        return engine.predicate_mask(self, rows)
+
+    def predicates(self):
+        return [self]
+
+
+class BoolNode:
+    def __init__(self, op, children):
+        self.op = op
+        self.children = children
+
+    def evaluate(self, engine, rows):
+        # Query planner: AND runs the most selective child first and tests the others only
+        # on the rows that survive; OR runs the least selective first and tests the others
+        # only on the rows still unmatched
+        children = sorted(self.children, key=lambda child: engine.selectivity(child), reverse=self.op == "or")
+        size = engine.row_count if rows is None else len(rows)
+        result = np.full(size, self.op == "and")
+        pending = np.arange(size)
+        for child in children:
+            if not len(pending):
+                break
+            subset = None if rows is None and len(pending) == size else (pending if rows is None else rows[pending])
+            mask = child.evaluate(engine, subset)
+            if self.op == "and":
+                result[pending[~mask]] = False
+                pending = pending[mask]
+            else:
+                result[pending[mask]] = True
+                pending = pending[~mask]
+        return result
+
+    def predicates(self):
+        return [p for child in self.children for p in child.predicates()]
+
+
+class NotNode:
+    def __init__(self, child):
+        self.child = child
+
+    def evaluate(self, engine, rows):
+        return ~self.child.evaluate(engine, rows)
+
+    def predicates(self):
+        return self.child.predicates()
+
+
+class FilterEngine:
+    """Evaluates filter queries over a DataFrame, caching one boolean mask per predicate.
+
+    Query syntax: predicates joined with and / or / not and parentheses, e.g.
+        city = paris and (email ~ gmail or phone is empty) and age between 20 and 40
+    Operators: = != (equals), ~ (contains), ^= (starts with), matches (regex),
+    < <= > >= between (numeric), is empty, is not empty. Text matching and column names
+    ignore case. Quote values or column names that contain spaces or symbols.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._masks = OrderedDict()
+        self._version = None
+        self._sample = None
+        self.df = None
+        self.search_index = None
+        self.row_count = 0
+
+    def filter(self, df, query, search_index=None):
+        node = parse_query(query)
+        for predicate in node.predicates():
+            predicate.column = resolve_column(df.columns, predicate.column)
+        with self._lock:
+            self._bind(df, search_index)
+            return np.flatnonzero(node.evaluate(self, None))
+
+    def _bind(self, df, search_index):
+        # Cached masks are only valid for the exact data they were computed on
+        version = (id(df), len(df), tuple(df.columns), search_index.generation if search_index else None)
+        if version != self._version:
+            self._version = version
+            self._masks.clear()
+            self._sample = None
+        self.df, self.search_index, self.row_count = df, search_index, len(df)
+
+    def selectivity(self, node):
+        # Share of rows a node keeps: exact from cached masks, otherwise estimated on a sample
+        if isinstance(node, Predicate) and node.key in self._masks:
+            mask = self._masks[node.key]
+            return mask.mean() if len(mask) else 0.0
+        if self._sample is None:
+            size = min(self.row_count, FILTER_SAMPLE_ROWS)
+            self._sample = np.sort(np.random.default_rng(0).choice(self.row_count, size, replace=False))
+        if not len(self._sample):
+            return 0.0
+        return node.evaluate(self, self._sample).mean()
+
+    def predicate_mask(self, predicate, rows):
+        mask = self._masks.get(predicate.key)
+        if mask is not None:
+            self._masks.move_to_end(predicate.key)
+            return mask if rows is None else mask[rows]
+        if rows is None:
+            mask = self._full_mask(predicate)
+            self._masks[predicate.key] = mask
+            if len(self._masks) > FILTER_CACHE_SIZE:
+                self._masks.popitem(last=False)
+            return mask
+        return self._series_mask(predicate, self.df[predicate.column].iloc[rows])
+
+    def _full_mask(self, predicate):
+        # Contains / starts with over the whole column go through the search index
+        if self.search_index is not None and predicate.op in ("~", "^="):
+            index = self.search_index.column(self.df, predicate.column)
+            positions = index.contains(predicate.value) if predicate.op == "~" else index.starts_with(predicate.value)
+            mask = np.zeros(self.row_count, dtype=bool)
+            mask[positions] = True
+            return mask
+        return self._series_mask(predicate, self.df[predicate.column])
+
+    def _series_mask(self, predicate, series):
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Test each category once and broadcast through the codes
+            per_category = self._series_mask(predicate, pd.Series(series.cat.categories.astype(object)))
+            missing = self._series_mask(predicate, pd.Series([None], dtype=object))[0]
+            codes = series.cat.codes.to_numpy()
+            return np.where(codes >= 0, per_category[codes] if len(per_category) else missing, missing)
+        op, value = predicate.op, predicate.value
+        if op in ("<", "<=", ">", ">=", "between"):
+            numbers = pd.to_numeric(series, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+            with np.errstate(invalid="ignore"):
+                if op == "between":
+                    low, high = predicate.number
+                    return (numbers >= low) & (numbers <= high)
+                return {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal}[op](numbers, predicate.number)
+        if op in ("=", "!=") and pd.api.types.is_numeric_dtype(series.dtype):
+            try:
+                number = float(value)
+            except ValueError:
+                number = None
+            if number is not None:
+                equal = series.to_numpy(dtype=float, na_value=np.nan) == number
+                return equal if op == "=" else ~equal
+        text = series.astype("string")
+        if op in ("is empty", "is not empty"):
+            empty = (text.str.strip().fillna("") == "").to_numpy(dtype=bool)
+            return empty if op == "is empty" else ~empty
+        if op in ("=", "!="):
+            equal = (text.str.strip().str.lower() == str(value).strip().lower()).fillna(False).to_numpy(dtype=bool)
+            return equal if op == "=" else ~equal
+        # Same semantics as the search index: lowercased, unstripped
+        if op == "~":
+            matched = text.str.lower().str.contains(value.lower(), regex=False)
+        elif op == "^=":
+            matched = text.str.lower().str.startswith(value.lower())
+        else:
+            matched = text.str.contains(value, regex=True, case=False)
+        return matched.fillna(False).to_numpy(dtype=bool)
+
+
+QUERY_TOKEN_RE = re.compile(r"""\s*(?:(?P<op>==|!=|>=|<=|\^=|=~|[=<>~()])|"(?P<dq>(?:[^"\\]|\\.)*)"|'(?P<sq>(?:[^'\\]|\\.)*)'|`(?P<bq>[^`]*)`|(?P<word>[^\s()=<>!~^"'`]+))""")
+
+
+def tokenize_query(text):
+    tokens = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        match = QUERY_TOKEN_RE.match(text, pos)
+        if not match or match.end() == pos:
+            raise FilterQueryError(f"Unexpected character at position {pos}: {text[pos:pos + 10]!r}")
+        pos = match.end()
+        if match.group("op"):
+            tokens.append(("op", match.group("op")))
+        elif match.group("word") is not None:
+            tokens.append(("word", match.group("word")))
+        else:
+            quoted = next(g for g in (match.group("dq"), match.group("sq"), match.group("bq")) if g is not None)
+            tokens.append(("quoted", re.sub(r"\\(.)", r"\1", quoted)))
+    return tokens
+
+
+def parse_query(text):
+    tokens = tokenize_query(text)
+    pos = 0
+
+    def peek(offset=0):
+        return tokens[pos + offset] if pos + offset < len(tokens) else (None, None)
+
+    def is_keyword(token, *words):
+        return token[0] == "word" and token[1].lower() in words
+
+    def take(expected=None):
+        nonlocal pos
+        token = peek()
+        if token[0] is None:
+            raise FilterQueryError("Unexpected end of query")
+        if expected is not None and token[1].lower() != expected:
+            raise FilterQueryError(f"Expected {expected!r} but found {token[1]!r}")
+        pos += 1
+        return token
+
+    def parse_bool(op, parse_child):
+        children = [parse_child()]
+        while is_keyword(peek(), op):
+            take()
+            children.append(parse_child())
+        return children[0] if len(children) == 1 else BoolNode(op, children)
+
+    def parse_or():
+        return parse_bool("or", parse_and)
+
+    def parse_and():
+        return parse_bool("and", parse_not)
+
+    def parse_not():
+        if is_keyword(peek(), "not"):
+            take()
+            return NotNode(parse_not())
+        if peek() == ("op", "("):
+            take()
+            node = parse_or()
+            take(")")
+            return node
+        return parse_predicate()
+
+    def parse_value():
+        kind, value = take()
+        if kind == "op":
+            raise FilterQueryError(f"Expected a value but found {value!r}")
+        return value
+
+    def parse_predicate():
+        column = parse_value()
+        kind, op = take()
+        op = op.lower()
+        if kind == "word" and op == "is":
+            if is_keyword(peek(), "not"):
+                take()
+                take("empty")
+                return Predicate(column, "is not empty")
+            take("empty")
+            return Predicate(column, "is empty")
+        if kind == "word" and op == "between":
+            low = parse_value()
+            take("and")
+            return Predicate(column, "between", [low, parse_value()])
+        aliases = {"==": "=", "=~": "matches", "contains": "~", "startswith": "^="}
+        op = aliases.get(op, op)
+        if op not in ("=", "!=", "~", "^=", "matches", "<", "<=", ">", ">="):
+            raise FilterQueryError(f"Unknown operator {op!r} after column {column!r}")
+        return Predicate(column, op, parse_value())
+
+    if not tokens:
+        raise FilterQueryError("Empty query")
+    node = parse_or()
+    if pos != len(tokens):
+        raise FilterQueryError(f"Unexpected {tokens[pos][1]!r}")
+    return node
+
+
+def resolve_column(columns, name):
+    # The column called `name`, or else the only one that matches it ignoring case
+    if name in columns:
+        return name
+    matches = [col for col in columns if str(col).lower() == str(name).lower()]
+    if len(matches) == 1:
+        return matches[0]
+    if matches:
+        raise FilterQueryError(f"Ambiguous column {name!r}: matches {', '.join(map(str, matches))}")
+    raise FilterQueryError(f"Unknown column: {name}")
+
+
+def _parse_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise FilterQueryError(f"Expected a number but found {value!r}")
+
+
+def normalize_text(series):
+    return series.astype("string").str.lower().fillna("").to_numpy(dtype=object)
+
+
+def trigram_codes(values, width):
+    # Pack every 3-character window of each string into one int64 (21 bits per code point)
+    # using a fixed-width unicode array, so trigrams are extracted without a Python loop
+    if width < 3 or not len(values):
+        return np.empty((len(values), 0), dtype=np.int64), np.empty((len(values), 0), dtype=bool)
+    chars = np.asarray(values, dtype=f"U{width}").view(np.uint32).reshape(len(values), width).astype(np.int64)
+    codes = (chars[:, :-2] << 42) | (chars[:, 1:-1] << 21) | chars[:, 2:]
+    return codes, chars[:, 2:] != 0
+
+
+def guess_column(columns, *keywords):
+    for col in columns:
+        if any(keyword in str(col).lower() for keyword in keywords):
+            return col
+    return None
+
+
+def trim_whitespace(df):
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Strip the categories rather than every row, unless that would merge two of them
+            stripped = series.cat.categories.astype(str).str.strip()
+            if stripped.is_unique:
+                df[col] = series.cat.rename_categories(stripped)
+            else:
+                df[col] = series.astype(TEXT_DTYPE).str.strip().astype("category")
+        elif series.dtype == object or isinstance(series.dtype, pd.StringDtype):
+            df[col] = series.astype(TEXT_DTYPE).str.strip()
+    return df
+
+
+def normalize_emails(series):
+    # Returns the trimmed, lowercased emails and a mask of syntactically valid ones
+    emails = series.astype(TEXT_DTYPE).str.strip().str.lower()
+    valid = emails.str.fullmatch(EMAIL_RE).fillna(False).to_numpy(dtype=bool)
+    return emails, valid
+
+
+def normalize_phones(series, country_code=DEFAULT_COUNTRY_CODE):
+    # E.164: "+" and 8-15 digits. "00" is read as an international prefix; numbers without
+    # one get country_code with any trunk "0" dropped. Unparseable numbers are left as they were.
+    raw = series.astype(TEXT_DTYPE).str.strip()
+    digits = raw.str.replace(r"\D", "", regex=True)
+    international = raw.str.startswith("+").fillna(False) | digits.str.startswith("00").fillna(False)
+    digits = digits.where(~digits.str.startswith("00").fillna(False), digits.str[2:])
+    if country_code:
+        digits = digits.where(international, country_code + digits.str.lstrip("0"))
+    else:
+        digits = digits.where(international)
+    lengths = digits.str.len()
+    valid = ((lengths >= 8) & (lengths <= 15)).fillna(False).to_numpy(dtype=bool)
+    phones = raw.copy()
+    phones[valid] = "+" + digits[valid]
+    return phones, valid
+
+
+def normalize_contacts(df, email_col=None, phone_col=None, country_code=DEFAULT_COUNTRY_CODE, trim=True):
+    stats = {}
+    if trim:
+        df = trim_whitespace(df)
+    if email_col:
+        df[email_col], valid = normalize_emails(df[email_col])
+        stats["invalid_emails"] = int((~valid & df[email_col].notna().to_numpy()).sum())
+    if phone_col:
+        df[phone_col], valid = normalize_phones(df[phone_col], country_code)
+        stats["invalid_phones"] = int((~valid & df[phone_col].notna().to_numpy()).sum())
+    return df, stats
+
+
+def find_duplicates(df, name_col=None, email_col=None, phone_col=None, threshold=FUZZY_THRESHOLD, window=FUZZY_WINDOW):
+    """Groups likely duplicate contacts; returns a group id per row (-1 for unique rows).
+
+    Exact duplicates share a normalized email or phone. Fuzzy duplicates are found with
+    sorted-neighbourhood blocking: rows are sorted by a blocking key (name tokens, email
+    local part) and each is compared only with the next `window` rows, using a Jaccard
+    estimate over 128-bit trigram signatures, so the cost stays O(n log n).
+    """
+    n = len(df)
+    pairs = []
+    keys = []
+    if name_col:
+        # Two blocking keys for names so "Smith John" still lands next to "John Smith"
+        names = df[name_col].astype(TEXT_DTYPE).str.lower().str.replace(r"[^\w\s]", "", regex=True)
+        names = names.str.replace(r"\s+", " ", regex=True).str.strip()
+        keys.append(names)
+        keys.append(names.str.replace(r"^(\S+) (.*)$", r"\2 \1", regex=True))
+    if email_col:
+        emails, valid = normalize_emails(df[email_col])
+        emails = emails.where(valid)
+        pairs.append(_equal_key_pairs(emails))
+        keys.append(emails.str.replace(r"@.*$|\+.*$|\.", "", regex=True))
+    if phone_col:
+        phones, valid = normalize_phones(df[phone_col])
+        pairs.append(_equal_key_pairs(phones.where(valid)))
+    if keys:
+        # Similarity is measured on the name plus the email local part, or on the name alone
+        # when either row has no email (otherwise "Jane Doe" without an email never matches)
+        signatures = name_signatures = _text_signatures(keys[0])
+        has_email = None
+        if email_col and name_col:
+            local = keys[-1].fillna("")
+            signatures = _text_signatures(keys[0].fillna("") + " " + local)
+            has_email = (local != "").to_numpy(dtype=bool)
+        for key in keys:
+            blank = (key.fillna("") == "").to_numpy(dtype=bool)
+            order = argsort_strings(key.fillna(""))
+            order = order[~blank[order]]
+            ordered, ordered_names = signatures[order], name_signatures[order]
+            for k in range(1, min(window, len(order) - 1) + 1):
+                similarity = jaccard(ordered[:-k], ordered[k:])
+                if has_email is not None:
+                    name_only = ~(has_email[order[:-k]] & has_email[order[k:]])
+                    similarity[name_only] = jaccard(ordered_names[:-k][name_only], ordered_names[k:][name_only])
+                similar = np.flatnonzero(similarity >= threshold)
+                pairs.append(np.column_stack([order[similar], order[similar + k]]))
+    pairs = np.concatenate(pairs) if pairs else np.empty((0, 2), dtype=np.int64)
+    return connected_groups(n, pairs)
+
+
+def _text_signatures(text):
+    return trigram_signatures(text.fillna("").str.strip().str.slice(0, SIGNATURE_MAX_LEN).to_numpy(dtype=object))
+
+
+def argsort_strings(values):
+    # Sorting Python str objects one comparison at a time is slow; use Arrow's or numpy's
+    # native string sort instead
+    if HAS_PYARROW:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        return pc.sort_indices(pa.array(values, type=pa.string())).to_numpy().astype(np.int64)
+    return np.argsort(np.asarray(values, dtype=str), kind="stable")
+
+
+def _equal_key_pairs(key):
+    # Pairs of rows that share a non-missing key, found by grouping the factorized codes
+    codes, _ = pd.factorize(key)
+    order = np.argsort(codes, kind="stable")
+    order = order[codes[order] >= 0]
+    same = codes[order[1:]] == codes[order[:-1]]
+    return np.column_stack([order[:-1][same], order[1:][same]])
+
+
+def connected_groups(n, pairs):
+    # Label propagation over the pair graph: every row ends up labelled with the smallest
+    # position in its component
+    labels = np.arange(n)
+    if len(pairs):
+        a, b = pairs[:, 0], pairs[:, 1]
+        while True:
+            low = np.minimum(labels[a], labels[b])
+            before = labels.copy()
+            np.minimum.at(labels, a, low)
+            np.minimum.at(labels, b, low)
+            labels = labels[labels]
+            if np.array_equal(labels, before):
+                break
+    counts = np.bincount(labels, minlength=n)
+    duplicated = counts[labels] > 1
+    groups = np.full(n, -1)
+    groups[duplicated] = np.unique(labels[duplicated], return_inverse=True)[1]
+    return groups
+
+
+def trigram_signatures(values):
+    # 128-bit set-of-trigrams signature per string (two uint64 words), built one character
+    # column at a time so every step is a flat vector operation
+    signatures = np.zeros((len(values), 2), dtype=np.uint64)
+    for start in range(0, len(values), TRIGRAM_BUILD_ROWS):
+        block = values[start:start + TRIGRAM_BUILD_ROWS]
+        width = max(map(len, block), default=0)
+        if width < 3:
+            continue
+        chars = np.asarray(block, dtype=f"U{width}").view(np.uint32).reshape(len(block), width).T.astype(np.uint64)
+        words = signatures[start:start + len(block)]
+        for j in range(width - 2):
+            code = (chars[j] << np.uint64(42)) | (chars[j + 1] << np.uint64(21)) | chars[j + 2]
+            bits = (code * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(57)
+            flags = np.where(chars[j + 2] != 0, np.uint64(1) << (bits & np.uint64(63)), np.uint64(0))
+            high = bits >= 64
+            words[:, 0] |= np.where(high, np.uint64(0), flags)
+            words[:, 1] |= np.where(high, flags, np.uint64(0))
+    return signatures
+
+
+def jaccard(a, b):
+    union = _popcount(a | b).sum(axis=1)
+    inter = _popcount(a & b).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(union > 0, inter / union, 0.0)
+
+
+def _popcount(words):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    return POPCOUNT_TABLE[words.view(np.uint8)].reshape(*words.shape, 8).sum(axis=-1)
+
+
+def merge_duplicates(df, positions, groups):
+    # Keeps the first row of each group, fills its missing cells from the others and
+    # returns the merged frame plus the positions that were folded away
+    positions = np.asarray(positions, dtype=np.int64)
+    groups = np.asarray(groups)
+    order = np.lexsort((positions, groups))
+    positions, groups = positions[order], groups[order]
+    first = np.ones(len(groups), dtype=bool)
+    first[1:] = groups[1:] != groups[:-1]
+    keepers, removed = positions[first], positions[~first]
+    block = df.iloc[positions]
+    block = block.mask(block.astype(TEXT_DTYPE).apply(lambda col: col.str.strip() == "").fillna(False))
+    merged = block.groupby(groups, sort=True).first()
+    for col in df.columns:
+        values = merged[col]
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            present = values.dropna()
+            df[col] = df[col].cat.add_categories(present[~present.isin(df[col].cat.categories)].unique())
+        df.iloc[keepers, df.columns.get_loc(col)] = values.to_numpy()
+    df = df.drop(df.index[removed]).reset_index(drop=True)
+    return df, removed
+
+
+def set_value(df, pos, col_name, value):
+    col_index = df.columns.get_loc(col_name)
+    if isinstance(df[col_name].dtype, pd.CategoricalDtype) and value not in df[col_name].cat.categories:
+        df[col_name] = df[col_name].cat.add_categories([value])
+    try:
+        df.iat[pos, col_index] = value
+    except (TypeError, ValueError):
+        # Text typed into a numeric column: make it a text column instead of failing the
+        # edit (an object column mixing numbers and text could not be saved as Parquet)
+        df[col_name] = df[col_name].astype(TEXT_DTYPE)
+        df.iat[pos, col_index] = None if value is None else str(value)
+
+
+def apply_journal(df, entries):
+    for entry in entries:
+        if entry["op"] == "set":
+            set_value(df, entry["row"], entry["col"], entry["value"])
+        elif entry["op"] == "delete":
+            df = df.drop(df.index[entry["rows"]]).reset_index(drop=True)
+        elif entry["op"] == "keep":
+            df = df[entry["cols"]]
+    return df
+
+
+def optimize_dtypes(df):
+    # Low-cardinality text (city, country, ...) becomes category, other text the string dtype
+    for col in df.columns:
+        series = df[col]
+        if not (series.dtype == object or isinstance(series.dtype, pd.StringDtype)):
+            continue
+        if len(series) and series.nunique() <= CATEGORY_MAX_RATIO * len(series):
+            df[col] = series.astype("category")
+        else:
+            df[col] = series.astype(TEXT_DTYPE)
+    return df
+
+
+def remap_after_delete(positions, deleted):
+    # Drop deleted positions and shift the rest down to match a reset_index'ed DataFrame
+    deleted = np.sort(np.asarray(deleted, dtype=np.int64))
+    kept = positions[~np.isin(positions, deleted)]
+    return kept - np.searchsorted(deleted, kept)
+
+
+class RecipeError(ValueError):
+    """A cleaning recipe that cannot be applied."""
+
+
+def load_recipe(path):
+    with open(path, encoding="utf-8") as handle:
+        try:
+            recipe = json.load(handle)
+        except ValueError as e:
+            raise RecipeError(f"{path} is not valid JSON: {e}") from None
+    if not isinstance(recipe, dict):
+        raise RecipeError(f"{path} must contain a JSON object")
+    unknown = set(recipe) - RECIPE_KEYS
+    if unknown:
+        raise RecipeError(f"Unknown recipe key(s): {', '.join(sorted(unknown))}")
+    for key in ("dedupe", "output"):
+        if key in recipe and not isinstance(recipe[key], dict):
+            raise RecipeError(f"{key!r} must be a JSON object (use {{}} for the defaults)")
+    if not isinstance(recipe.get("filters", []), list):
+        raise RecipeError("'filters' must be a list")
+    keep = recipe.get("keep", [])
+    if not isinstance(keep, list) or not all(isinstance(col, str) for col in keep):
+        raise RecipeError("'keep' must be a list of column names")
+    for spec in recipe.get("filters", []):
+        if not isinstance(spec, dict) or spec.get("type") not in FILTER_TYPES:
+            raise RecipeError(f"Invalid filter {spec!r}; type must be one of {', '.join(FILTER_TYPES)}")
+    output_format = recipe.get("output", {}).get("format", "csv")
+    if output_format not in EXPORT_FORMATS:
+        raise RecipeError(f"Unknown output format {output_format!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+    return recipe
+
+
+def run_recipe(path, recipe, output_dir=None, cache=False):
+    # Steps always run in this order: keep, filters, dedupe, output. The input file and
+    # its journal are never modified.
+    contacts = ContactList.load(path, journal=False, cache=cache)
+    summary = {"file": path, "rows_in": len(contacts.df)}
+    keep = recipe.get("keep")
+    if keep:
+        missing = [col for col in keep if col not in contacts.df.columns]
+        if missing:
+            raise RecipeError(f"Column(s) not in {path}: {', '.join(missing)}")
+        contacts.keep_columns(keep)
+    for spec in recipe.get("filters", []):
+        try:
+            positions, columns = contacts.filter(spec["type"], spec.get("column"), str(spec.get("value", "")).strip())
+        except KeyError as e:
+            raise RecipeError(f"Column {e} not in {path}") from None
+        if positions is not None:
+            contacts.keep_rows(positions)
+        if columns is not None:
+            contacts.keep_columns(columns)
+    dedupe = recipe.get("dedupe")
+    if dedupe is not None:
+        columns = contacts.df.columns
+        stats, groups = contacts.clean(
+            dedupe.get("name", guess_column(columns, "name")),
+            dedupe.get("email", guess_column(columns, "mail")),
+            dedupe.get("phone", guess_column(columns, "phone", "mobile", "tel")),
+            str(dedupe.get("country_code", DEFAULT_COUNTRY_CODE)).lstrip("+"),
+            trim=dedupe.get("trim", True),
+            emails=dedupe.get("normalize_emails", True),
+            phones=dedupe.get("normalize_phones", True),
+            duplicates=dedupe.get("find_duplicates", True),
+        )
+        summary.update(stats or {})
+        if groups is not None and (groups >= 0).any():
+            summary["duplicate_groups"] = int(groups.max() + 1)
+            if dedupe.get("merge", True):
+                positions = np.flatnonzero(groups >= 0)
+                summary["merged"] = len(contacts.merge(positions, groups[positions]))
+    output = recipe.get("output", {})
+    stem = os.path.splitext(os.path.basename(path))[0]
+    directory = output_dir or output.get("directory") or os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    summary["output"] = os.path.join(directory, f"{stem}{output.get('suffix', '_clean')}.{output.get('format', 'csv')}")
+    summary["rows_out"] = contacts.export(summary["output"])
+    return summary
+
+
+def write_frame(df, path, progress=None, chunk_rows=EXPORT_CHUNK_ROWS, metadata=None):
+    # Written in chunks so large exports report progress as rows_written and never hold
+    # a second full copy of the data; the format follows the file extension
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext == "xlsx" and len(df) >= EXCEL_MAX_ROWS:
+        raise ValueError(f"{len(df):,} rows do not fit in an Excel sheet; export to CSV or Parquet instead")
+    if ext in ("parquet", "arrow"):
+        # Arrow has no type for object columns mixing numbers and text; those are written as text
+        mixed = [col for col in df.columns if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True).startswith("mixed")]
+        if mixed:
+            df = df.astype(dict.fromkeys(mixed, TEXT_DTYPE))
+    chunks = (df.iloc[start:start + chunk_rows] for start in range(0, max(len(df), 1), chunk_rows))
+    written = 0
+    if ext == "xlsx":
+        # openpyxl's write-only mode streams rows to disk instead of building the sheet in memory
+        from openpyxl import Workbook
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append([str(col) for col in df.columns])
+        for chunk in chunks:
+            for row in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None):
+                sheet.append(row)
+            written += len(chunk)
+            if progress:
+                progress(written)
+        workbook.save(path)
+    elif ext in ("parquet", "arrow"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        if metadata:
+            schema = schema.with_metadata({**schema.metadata, **metadata})
+        with (pq.ParquetWriter(path, schema) if ext == "parquet" else pa.ipc.new_file(path, schema)) as writer:
+            for chunk in chunks:
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                written += len(chunk)
+                if progress:
+                    progress(written)
+    else:
+        with open(path, "w", newline="", encoding="utf-8") as handle:
+            for chunk in chunks:
+                chunk.to_csv(handle, index=False, header=written == 0)
+                written += len(chunk)
+                if progress:
+                    progress(written)
+
+
+def write_temp(df, path, metadata=None):
+    # Written and fsynced next to `path` (in its format) for the caller to os.replace
+    base, ext = os.path.splitext(path)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=os.path.basename(base) + ".", suffix=".tmp" + ext)
+    os.close(fd)
+    try:
+        write_frame(df, tmp_path, metadata=metadata)
+        with open(tmp_path, "r+b") as handle:
+            os.fsync(handle.fileno())
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path
+
+
+def read_columnar_source(path, use_cache=False):
+    # Parquet/Arrow working files, or a CSV's up-to-date Arrow cache; None means parse the CSV
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        return pd.read_parquet(path)
+    if ext == ".arrow":
+        # Read into memory rather than mapped, so saving can replace the file (Windows
+        # refuses to replace a file that is still mapped)
+        import pyarrow as pa
+        with pa.OSFile(path) as source:
+            return pa.ipc.open_file(source).read_all().to_pandas()
+    if use_cache and HAS_PYARROW:
+        return ColumnarCache(path).load()
+    return None
+
+
+def stat_key(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def expand_paths(patterns):
+    # Windows shells do not expand wildcards, so do it here
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        paths.extend(match for match in matches if match not in paths)
+    return paths
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        root = tk.Tk()
+        app = ContactCleanerApp(root)
+        root.mainloop()
+        return 0
+    parser = argparse.ArgumentParser(description="Apply a cleaning recipe to one or more contact CSVs without opening the GUI.")
+    parser.add_argument("files", nargs="+", help="CSV, Parquet or Arrow files, or wildcard patterns")
+    parser.add_argument("-r", "--recipe", required=True, help="JSON recipe with keep, filters, dedupe and output steps")
+    parser.add_argument("-o", "--output-dir", help="write results here instead of next to each input")
+    parser.add_argument("--cache", action="store_true", help="keep an Arrow copy next to each CSV so later runs skip parsing")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="files processed in parallel (default: CPU count)")
+    args = parser.parse_args(argv)
+    try:
+        recipe = load_recipe(args.recipe)
+    except (OSError, RecipeError) as e:
+        parser.error(str(e))
+    paths = expand_paths(args.files)
+    if not paths:
+        parser.error("no input files matched")
+    failed = 0
+    def report(path, result):
+        nonlocal failed
+        if isinstance(result, Exception):
+            failed += 1
+            print(f"{path}: failed: {result}", file=sys.stderr)
+            return
+        details = ", ".join(f"{key}={value}" for key, value in result.items() if key not in ("file", "rows_in", "rows_out", "output"))
+        print(f"{path}: {result['rows_in']} -> {result['rows_out']} rows, written to {result['output']}" + (f" ({details})" if details else ""))
+    jobs = max(1, min(args.jobs, len(paths)))
+    if jobs == 1:
+        for path in paths:
+            try:
+                result = run_recipe(path, recipe, args.output_dir, args.cache)
+            except Exception as e:
+                result = e
+            report(path, result)
+    else:
+        # One process per file: parsing and dedup are CPU-bound and hold the GIL
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(run_recipe, path, recipe, args.output_dir, args.cache): path for path in paths}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = e
+                report(futures[future], result)
+    return 1 if failed else 0
+
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = ContactCleanerApp(root)
-    root.mainloop()
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -6,6 +6,127 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import time
 import threading
+import queue
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import signal
+import sqlite3
+import sys
+import string
+import openpyxl
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+try:
+    import aiosmtplib
+except ImportError:
+    aiosmtplib = None
+try:
+    import dns.resolver
+except ImportError:
+    dns = None
+
+# SMTP sending: connections used in parallel, each recycled after this many messages
+DEFAULT_CONNECTIONS = 4
+DEFAULT_MESSAGES_PER_CONNECTION = 100
+SMTP_TIMEOUT = 20
+# Rendered messages waiting for a free connection
+SEND_QUEUE_SIZE = 1000
+# Templates without placeholders are sent once to many recipients (Bcc-style envelopes)
+DEFAULT_BATCH_RECIPIENTS = 50
+UNDISCLOSED_RECIPIENTS = "undisclosed-recipients:;"
+# Sending limits as (per second, per minute, per day), None meaning no limit. Daily numbers
+# are the providers' published quotas; the shorter windows are conservative
+PROVIDER_PRESETS = {
+    "Gmail": (1, 20, 500),
+    "Google Workspace": (2, 60, 2000),
+    "Office 365": (None, 30, 10000),
+    "Custom": None,
+}
+# "Slow down" replies: every worker pauses and the rate is cut, then recovers on success
+THROTTLE_CODES = (421, 451)
+THROTTLE_RETRIES = 3
+BACKOFF_SECONDS = 5
+BACKOFF_MAX_SECONDS = 300
+MIN_RATE_SCALE = 0.1
+RATE_RECOVERY = 0.05
+# Sending engines: worker threads over smtplib, or one asyncio loop over aiosmtplib
+ENGINES = ["Threads", "Asyncio"] if aiosmtplib is not None else ["Threads"]
+CONTROL_POLL_SECONDS = 0.2
+# Recipients are read from the file and rendered this many rows at a time on a producer
+# thread, ahead of the senders
+RECIPIENT_CHUNK_ROWS = 500
+RECIPIENT_FILETYPES = [
+    ("Recipient lists", "*.xlsx *.xls *.csv *.parquet"),
+    ("Excel files", "*.xlsx *.xls"),
+    ("CSV files", "*.csv"),
+    ("Parquet files", "*.parquet"),
+]
+# Campaign store next to the recipient file: per-recipient state, committed in batches.
+# Temporary failures are retried up to MAX_ATTEMPTS times with exponential backoff
+CAMPAIGN_SUFFIX = ".campaign.sqlite3"
+STORE_BATCH_ROWS = 200
+STORE_FLUSH_SECONDS = 1.0
+MAX_ATTEMPTS = 4
+RETRY_BASE_SECONDS = 30
+# Workers post status events to a queue that the Tk loop drains once per frame. The status
+# box keeps the last LOG_VIEW_LINES lines; the full log goes to <file>.send.log
+UI_FRAME_MS = 100
+MAX_EVENTS_PER_FRAME = 5000
+LOG_VIEW_LINES = 1000
+LOG_SUFFIX = ".send.log"
+THROUGHPUT_WINDOW_SECONDS = 10
+# Pre-send checks: addresses failing them are recorded as skipped and never reach SMTP.
+# MX lookups (with dnspython) run once per domain, a few in parallel
+EMAIL_RE = r"[^@\s]+@[^@\s]+\.[^@\s.]+"
+MX_LOOKUP_THREADS = 16
+MX_TIMEOUT = 5
+TOP_DOMAINS = 5
+SUPPRESSION_FILETYPES = [("Suppression lists", "*.txt *.csv"), ("All files", "*.*")]
+# Campaign settings, shared by the GUI and campaign config files for the command line.
+# Paths in a config file are relative to it
+CAMPAIGN_KEYS = {
+    "recipients", "columns", "subject", "body", "body_file", "format", "sender", "password", "password_env",
+    "smtp_host", "smtp_port", "tls", "connections", "emails_per_connection", "engine", "preset", "limits",
+    "batch_recipients", "suppression", "check_mx", "resume",
+}
+CAMPAIGN_TEXT_KEYS = {
+    "recipients", "subject", "body", "body_file", "format", "sender", "password", "password_env", "smtp_host",
+    "engine", "preset", "suppression",
+}
+CAMPAIGN_OBJECT_KEYS = {"columns", "limits"}
+CAMPAIGN_DEFAULTS = {
+    "format": "Plain Text",
+    "smtp_port": 587,
+    "tls": True,
+    "connections": DEFAULT_CONNECTIONS,
+    "emails_per_connection": DEFAULT_MESSAGES_PER_CONNECTION,
+    "engine": "Threads",
+    "limits": {},
+    "batch_recipients": DEFAULT_BATCH_RECIPIENTS,
+    "suppression": None,
+    "check_mx": False,
+    "resume": True,
+}
+EMAIL_FORMATS = ("Plain Text", "HTML")
+# Command line exit codes (argparse already exits with 2 for bad arguments)
+EXIT_OK = 0
+EXIT_RECIPIENTS_FAILED = 1
+EXIT_CONFIG_ERROR = 2
+EXIT_SEND_ERROR = 3
+EXIT_CANCELLED = 130
+CAMPAIGN_SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaigns (id INTEGER PRIMARY KEY, fingerprint TEXT UNIQUE, created REAL);
+CREATE TABLE IF NOT EXISTS recipients (
+    campaign INTEGER, email TEXT, name TEXT, state TEXT, attempts INTEGER DEFAULT 0,
+    response TEXT, updated REAL, next_attempt REAL, PRIMARY KEY (campaign, email)
+);
+CREATE INDEX IF NOT EXISTS recipients_state ON recipients (campaign, state);
+"""
 
 class EmailSenderApp:
     def __init__(self, root):
@@ -13,19 +134,24 @@ class EmailSenderApp:
         self.root.title("Email Sender from Excel")
         self.root.geometry("700x700")
         self.file_path = None
-        self.df = None
+        self.source = None
         self.column_vars = {}
         self.custom_fields = []
+        self.events = queue.SimpleQueue()
+        self.log_file = None
+        self.progress_store = None
+        self.throughput = None
         self.setup_gui()
+        self.root.after(UI_FRAME_MS, self.drain_events)
 
     def setup_gui(self):
         # File selection
         file_frame = tk.Frame(self.root)
         file_frame.pack(pady=10)
-        tk.Label(file_frame, text="Excel File:").pack(side=tk.LEFT)
+        tk.Label(file_frame, text="Recipient File:").pack(side=tk.LEFT)
         self.file_entry = tk.Entry(file_frame, width=50)
         self.file_entry.pack(side=tk.LEFT, padx=5)
-        tk.Button(file_frame, text="Browse", command=self.browse_excel_file).pack(side=tk.LEFT)
+        tk.Button(file_frame, text="Browse", command=self.browse_recipient_file).pack(side=tk.LEFT)
 
         # Column mapping
         self.mapping_frame = tk.LabelFrame(self.root, text="Column Mapping")
@@ -86,23 +212,52 @@ class EmailSenderApp:
         self.smtp_port_entry.grid(row=0, column=3, padx=5, pady=2)
         self.tls_var = tk.BooleanVar(value=True)
         tk.Checkbutton(smtp_frame, text="Use TLS/SSL", variable=self.tls_var).grid(row=0, column=4, padx=5)
+        tk.Label(smtp_frame, text="Connections:").grid(row=1, column=0, sticky="e")
+        self.connections_var = tk.StringVar(value=str(DEFAULT_CONNECTIONS))
+        tk.Entry(smtp_frame, textvariable=self.connections_var, width=6).grid(row=1, column=1, sticky="w", padx=5, pady=2)
+        tk.Label(smtp_frame, text="Emails per connection:").grid(row=1, column=2, sticky="e")
+        self.max_messages_var = tk.StringVar(value=str(DEFAULT_MESSAGES_PER_CONNECTION))
+        tk.Entry(smtp_frame, textvariable=self.max_messages_var, width=6).grid(row=1, column=3, padx=5, pady=2)
+        tk.Label(smtp_frame, text="Engine:").grid(row=1, column=4, sticky="e")
+        self.engine_var = tk.StringVar(value=ENGINES[0])
+        ttk.Combobox(smtp_frame, textvariable=self.engine_var, values=ENGINES, state="readonly", width=8).grid(row=1, column=5, padx=5, pady=2)
 
         # Email format selection
         format_frame = tk.Frame(self.root)
         format_frame.pack(fill="x", padx=10, pady=2)
         tk.Label(format_frame, text="Email Format:").pack(side=tk.LEFT)
         self.format_var = tk.StringVar(value="Plain Text")
-        format_options = ["Plain Text", "HTML"]
-        self.format_menu = ttk.Combobox(format_frame, textvariable=self.format_var, values=format_options, state="readonly", width=10)
+        self.format_menu = ttk.Combobox(format_frame, textvariable=self.format_var, values=EMAIL_FORMATS, state="readonly", width=10)
         self.format_menu.pack(side=tk.LEFT, padx=5)
+        tk.Label(format_frame, text="Recipients per email (no placeholders):").pack(side=tk.LEFT, padx=(10, 0))
+        self.batch_var = tk.StringVar(value=str(DEFAULT_BATCH_RECIPIENTS))
+        tk.Entry(format_frame, textvariable=self.batch_var, width=6).pack(side=tk.LEFT, padx=5)
+
+        # Sending limits, shared by all connections
+        limit_frame = tk.Frame(self.root)
+        limit_frame.pack(fill="x", padx=10, pady=2)
+        tk.Label(limit_frame, text="Sending limit:").pack(side=tk.LEFT)
+        self.preset_var = tk.StringVar(value="Gmail")
+        preset_menu = ttk.Combobox(limit_frame, textvariable=self.preset_var, values=list(PROVIDER_PRESETS), state="readonly", width=16)
+        preset_menu.pack(side=tk.LEFT, padx=5)
+        preset_menu.bind("<<ComboboxSelected>>", self.apply_preset)
+        self.limit_vars = {}
+        for period in ("second", "minute", "day"):
+            var = tk.StringVar()
+            tk.Entry(limit_frame, textvariable=var, width=6).pack(side=tk.LEFT, padx=(5, 0))
+            tk.Label(limit_frame, text=f"per {period}").pack(side=tk.LEFT)
+            self.limit_vars[period] = var
+        self.apply_preset()
 
-        # Delay setting
-        delay_frame = tk.Frame(self.root)
-        delay_frame.pack(fill="x", padx=10, pady=2)
-        tk.Label(delay_frame, text="Delay between emails (seconds):").pack(side=tk.LEFT)
-        self.delay_var = tk.StringVar(value="1.5")
-        self.delay_entry = tk.Entry(delay_frame, textvariable=self.delay_var, width=5)
-        self.delay_entry.pack(side=tk.LEFT, padx=5)
+        # Pre-send checks
+        check_frame = tk.Frame(self.root)
+        check_frame.pack(fill="x", padx=10, pady=2)
+        tk.Label(check_frame, text="Suppression list:").pack(side=tk.LEFT)
+        self.suppression_entry = tk.Entry(check_frame, width=35)
+        self.suppression_entry.pack(side=tk.LEFT, padx=5)
+        tk.Button(check_frame, text="Browse", command=self.browse_suppression_file).pack(side=tk.LEFT)
+        self.mx_var = tk.BooleanVar(value=dns is not None)
+        tk.Checkbutton(check_frame, text="Check mail domains (MX)", variable=self.mx_var, state="normal" if dns is not None else "disabled").pack(side=tk.LEFT, padx=5)
 
         # Send button
         self.send_button = tk.Button(self.root, text="Send Emails", command=self.start_sending_emails, bg="#4CAF50", fg="white", font=("Arial", 12, "bold"))
@@ -117,24 +272,33 @@ class EmailSenderApp:
 
         # Progress bar popup (hidden by default)
         self.progress_popup = None
+        self.control = None
         self.progress_var = tk.DoubleVar(value=0)
 
-    def browse_excel_file(self):
-        file_path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx *.xls")])
+    def browse_recipient_file(self):
+        file_path = filedialog.askopenfilename(filetypes=RECIPIENT_FILETYPES)
         if file_path:
             self.file_entry.delete(0, tk.END)
             self.file_entry.insert(0, file_path)
             self.file_path = file_path
             try:
-                self.df = pd.read_excel(file_path)
-                columns = list(self.df.columns)
+                # Only the header row is read here; the rows are streamed while sending
+                self.source = RecipientSource(file_path)
+                columns = self.source.columns
                 for label, cb in self.mapping_widgets.items():
                     cb['values'] = columns
                     if columns:
                         cb.current(0)
                 self.update_placeholder_label()
             except Exception as e:
-                messagebox.showerror("Error", f"Failed to load Excel file: {e}")
+                self.source = None
+                messagebox.showerror("Error", f"Failed to open recipient file: {e}")
+
+    def browse_suppression_file(self):
+        file_path = filedialog.askopenfilename(filetypes=SUPPRESSION_FILETYPES)
+        if file_path:
+            self.suppression_entry.delete(0, tk.END)
+            self.suppression_entry.insert(0, file_path)
 
     def add_custom_field(self):
         idx = len(self.custom_fields) + 1
@@ -145,13 +309,20 @@ class EmailSenderApp:
         var = tk.StringVar()
         cb = ttk.Combobox(row, textvariable=var, state="readonly")
         cb.pack(side=tk.LEFT, fill="x", expand=True)
-        if self.df is not None:
-            cb['values'] = list(self.df.columns)
-            if self.df.columns.size > 0:
+        if self.source is not None:
+            cb['values'] = self.source.columns
+            if self.source.columns:
                 cb.current(0)
         self.custom_fields.append((field_name, var))
         self.update_placeholder_label()
 
+    def apply_preset(self, event=None):
+        limits = PROVIDER_PRESETS[self.preset_var.get()]
+        if limits is None:
+            return
+        for var, limit in zip(self.limit_vars.values(), limits):
+            var.set("" if limit is None else str(limit))
+
     def update_placeholder_label(self):
         placeholders = ["{Name}", "{Email}"]
         for field, _ in self.custom_fields:
@@ -159,136 +330,1351 @@ class EmailSenderApp:
         self.placeholder_label.config(text="Available placeholders: " + ", ".join(placeholders))
 
     def start_sending_emails(self):
-        t = threading.Thread(target=self.send_emails)
+        self.set_status("")
+        if not self.source_is_ready():
+            return
+        try:
+            campaign = Campaign(self.campaign_settings())
+        except CampaignError as e:
+            self.set_status(str(e))
+            return
+        # A campaign that already ran (same sender and templates) can pick up where it stopped
+        counts = campaign.previous()
+        if counts:
+            answer = messagebox.askyesnocancel(
+                "Resume Campaign",
+                f"This campaign has already run on this file ({format_counts(counts)}).\n\n"
+                "Yes: resume and only send to recipients who have not received it.\n"
+                "No: start over and send to everyone again.",
+            )
+            if answer is None:
+                return
+            campaign.resume = answer
+        self.open_log(self.file_path + LOG_SUFFIX)
+        self.control = campaign.control
+        t = threading.Thread(target=self.run_campaign, args=(campaign,))
         t.start()
 
-    def show_progress_bar(self, max_value):
+    def campaign_settings(self):
+        # The form as campaign settings, the same keys a campaign config file uses
+        columns = {"Name": self.column_vars["Name"].get(), "Email": self.column_vars["Email"].get()}
+        columns.update((field, var.get()) for field, var in self.custom_fields)
+        return {
+            "recipients": self.file_path,
+            "columns": columns,
+            "subject": self.subject_entry.get(),
+            "body": self.body_text.get("1.0", tk.END),
+            "format": self.format_var.get(),
+            "sender": self.sender_email_entry.get().strip(),
+            "password": self.sender_password_entry.get().strip(),
+            "smtp_host": self.smtp_host_entry.get().strip(),
+            "smtp_port": self.smtp_port_entry.get().strip(),
+            "tls": self.tls_var.get(),
+            "connections": self.connections_var.get(),
+            "emails_per_connection": self.max_messages_var.get(),
+            "engine": self.engine_var.get(),
+            "limits": {period: var.get().strip() or None for period, var in self.limit_vars.items()},
+            "batch_recipients": self.batch_var.get(),
+            "suppression": self.suppression_entry.get().strip() or None,
+            "check_mx": self.mx_var.get(),
+        }
+
+    def show_progress_bar(self):
         if self.progress_popup is not None:
             self.progress_popup.destroy()
         self.progress_popup = tk.Toplevel(self.root)
         self.progress_popup.title("Sending Emails...")
-        self.progress_popup.geometry("400x100")
+        self.progress_popup.geometry("400x180")
         self.progress_popup.resizable(False, False)
         tk.Label(self.progress_popup, text="Sending emails, please wait...").pack(pady=10)
-        self.progress_bar = ttk.Progressbar(self.progress_popup, variable=self.progress_var, maximum=max_value, length=350)
-        self.progress_bar.pack(pady=10)
+        self.progress_bar = ttk.Progressbar(self.progress_popup, variable=self.progress_var, maximum=1, length=350)
+        self.progress_bar.pack(pady=(10, 0))
+        self.progress_label = tk.Label(self.progress_popup, text="")
+        self.progress_label.pack(pady=(0, 5))
+        buttons = tk.Frame(self.progress_popup)
+        buttons.pack()
+        self.pause_button = tk.Button(buttons, text="Pause", width=8, command=self.toggle_pause)
+        self.pause_button.pack(side=tk.LEFT, padx=5)
+        tk.Button(buttons, text="Cancel", width=8, command=self.cancel_sending).pack(side=tk.LEFT, padx=5)
         self.progress_popup.grab_set()
         self.progress_popup.protocol("WM_DELETE_WINDOW", lambda: None)  # Disable close
 
+    def toggle_pause(self):
+        if self.control is None:
+            return
+        if self.control.paused:
+            self.control.resume()
+            self.pause_button.config(text="Pause")
+        else:
+            self.control.pause()
+            self.pause_button.config(text="Resume")
+
+    def cancel_sending(self):
+        if self.control is not None:
+            self.control.cancel()
+
     def update_progress_bar(self, value):
         self.progress_var.set(value)
         if self.progress_popup:
             self.progress_popup.update_idletasks()
 
+    def track_progress(self, store):
+        # Progress comes from the campaign store once per frame rather than from per-email callbacks
+        self.progress_store = store
+        self.throughput = ThroughputMeter()
+
+    def refresh_progress(self):
+        counts = self.progress_store.counts()
+        done = counts.get("sent", 0) + counts.get("failed", 0) + counts.get("skipped", 0)
+        rate = self.throughput.update(time.monotonic(), done)
+        left = counts.get("queued", 0) + counts.get("retrying", 0)
+        text = format_counts(counts)
+        if rate:
+            text += f"\n{rate:.1f} emails/s, about {format_duration(left / rate)} left"
+        # The total grows while the recipient file is still being read
+        self.progress_bar.config(maximum=max(1, sum(counts.values())))
+        self.update_progress_bar(done)
+        self.progress_label.config(text=text)
+
     def hide_progress_bar(self):
+        self.progress_store = None
         if self.progress_popup:
             self.progress_popup.destroy()
             self.progress_popup = None
 
-    def send_emails(self):
-        self.set_status("")
-        if not self.df_is_ready():
-            return
-        sender = self.sender_email_entry.get().strip()
-        password = self.sender_password_entry.get().strip()
-        smtp_host = self.smtp_host_entry.get().strip()
-        smtp_port = self.smtp_port_entry.get().strip()
-        use_tls = self.tls_var.get()
-        subject_template = self.subject_entry.get()
-        body_template = self.body_text.get("1.0", tk.END)
-        name_col = self.column_vars["Name"].get()
-        email_col = self.column_vars["Email"].get()
-        custom_map = {field: var.get() for field, var in self.custom_fields}
-        email_format = self.format_var.get()
-        # Validation
-        if not sender or not password or not smtp_host or not smtp_port:
-            self.set_status("Missing sender credentials or SMTP details.")
-            return
-        if not name_col or not email_col:
-            self.set_status("Please map both Name and Email columns.")
-            return
-        try:
-            smtp_port = int(smtp_port)
-        except ValueError:
-            self.set_status("SMTP port must be a number.")
-            return
-        # Connect to SMTP
+    def run_campaign(self, campaign):
+        # Runs on a worker thread: everything shown in the window goes through post() and log()
+        def on_start(store):
+            self.post(self.show_progress_bar)
+            self.post(self.track_progress, store)
         try:
-            server = smtplib.SMTP(smtp_host, smtp_port, timeout=20)
-            if use_tls:
-                server.starttls()
-            server.login(sender, password)
+            campaign.run(lambda event, message, **fields: self.log(message), on_start)
         except Exception as e:
-            self.set_status(f"SMTP connection failed: {e}")
-            return
-        total = len(self.df)
-        sent = 0
-        errors = 0
-        self.root.after(0, self.show_progress_bar, total)
-        try:
-            delay = float(self.delay_var.get())
-        except ValueError:
-            self.set_status("Delay must be a number.")
-            return
-        for idx, row in self.df.iterrows():
-            name = str(row.get(name_col, ""))
-            email = str(row.get(email_col, ""))
-            if not email:
-                self.append_status(f"Row {idx+1}: Missing email, skipped.")
-                errors += 1
-                continue
-            # Prepare placeholders
-            placeholders = {"Name": name, "Email": email}
-            for field, col in custom_map.items():
-                placeholders[field] = str(row.get(col, ""))
-            subject = subject_template.format(**placeholders)
-            body = body_template.format(**placeholders)
-            msg = MIMEMultipart()
-            msg['From'] = sender
-            msg['To'] = email
-            msg['Subject'] = subject
-            if email_format == "HTML":
-                msg.attach(MIMEText(body, 'html'))
-            else:
-                msg.attach(MIMEText(body, 'plain'))
-            try:
-                server.sendmail(sender, email, msg.as_string())
-                sent += 1
-                self.append_status(f"Email sent to {name} <{email}>. Remaining: {total-sent}")
-            except Exception as e:
-                errors += 1
-                self.append_status(f"Error sending to {name} <{email}>: {e}")
-            self.root.after(0, self.update_progress_bar, sent + errors)
-            time.sleep(delay)
-        server.quit()
-        self.root.after(0, self.hide_progress_bar)
-        if errors == 0:
-            self.append_status("All emails sent successfully!")
-        else:
-            self.append_status(f"Completed with {errors} errors.")
+            self.post(self.set_status, f"Sending failed: {e}")
+        finally:
+            self.control = None
+            self.post(self.hide_progress_bar)
+            self.post(self.close_log)
 
     def set_status(self, msg):
         self.status_text.config(state="normal")
         self.status_text.delete("1.0", tk.END)
-        self.status_text.insert(tk.END, msg+"\n")
         self.status_text.config(state="disabled")
+        if msg:
+            self.append_status(msg)
 
-    def append_status(self, msg):
+    def append_status(self, *lines):
+        if self.log_file is not None:
+            stamp = datetime.now().isoformat(sep=" ", timespec="seconds")
+            self.log_file.write("".join(f"{stamp} {line}\n" for line in lines))
         self.status_text.config(state="normal")
-        self.status_text.insert(tk.END, msg+"\n")
+        self.status_text.insert(tk.END, "".join(line + "\n" for line in lines[-LOG_VIEW_LINES:]))
+        # The view is a ring buffer: older lines are dropped (they stay in the log file)
+        excess = int(self.status_text.index("end-1c").split(".")[0]) - 1 - LOG_VIEW_LINES
+        if excess > 0:
+            self.status_text.delete("1.0", f"{excess + 1}.0")
         self.status_text.see(tk.END)
         self.status_text.config(state="disabled")
 
-    def df_is_ready(self):
-        if self.df is None:
-            self.set_status("No Excel file loaded.")
+    def post(self, callback, *args):
+        # Thread-safe: runs callback(*args) on the Tk thread at the next frame
+        self.events.put((callback, args))
+
+    def log(self, msg):
+        # Thread-safe: appends a line to the status box at the next frame
+        self.events.put((None, msg))
+
+    def drain_events(self):
+        # Log lines arriving in one frame are inserted together; other events run in order
+        lines = []
+        for _ in range(MAX_EVENTS_PER_FRAME):
+            try:
+                callback, args = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if callback is None:
+                lines.append(args)
+                continue
+            if lines:
+                self.append_status(*lines)
+                lines = []
+            callback(*args)
+        if lines:
+            self.append_status(*lines)
+        if self.log_file is not None:
+            self.log_file.flush()
+        if self.progress_store is not None and self.progress_popup is not None:
+            self.refresh_progress()
+        self.root.after(UI_FRAME_MS, self.drain_events)
+
+    def open_log(self, path):
+        self.close_log()
+        try:
+            self.log_file = open(path, "a", encoding="utf-8")
+        except OSError as e:
+            self.append_status(f"Could not open log file {path}: {e}")
+
+    def close_log(self):
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+    def source_is_ready(self):
+        if self.source is None:
+            self.set_status("No recipient file loaded.")
             return False
         return True
 
-def main():
-    root = tk.Tk()
-    app = EmailSenderApp(root)
-    root.mainloop()
+class CampaignError(ValueError):
+    """Campaign settings that cannot be sent."""
+
+class Campaign:
+    """One send of a recipient list, independent of the GUI.
+
+    Built from campaign settings (see CAMPAIGN_KEYS), which are all checked up front.
+    run() streams the recipients, sends, retries temporary failures and reports each step
+    to report(event, message, **fields). The window and the command line both drive it.
+    """
+
+    def __init__(self, settings):
+        settings = {**CAMPAIGN_DEFAULTS, **settings}
+        self.sender = settings.get("sender") or ""
+        self.password = settings.get("password") or ""
+        self.smtp_host = settings.get("smtp_host") or ""
+        if not self.sender or not self.password or not self.smtp_host or not settings["smtp_port"]:
+            raise CampaignError("Missing sender credentials or SMTP details.")
+        self.columns = {field: col for field, col in settings.get("columns", {}).items() if col}
+        if not self.columns.get("Name") or not self.columns.get("Email"):
+            raise CampaignError("Please map both Name and Email columns.")
+        if settings["format"] not in EMAIL_FORMATS:
+            raise CampaignError(f"Email format must be one of {', '.join(EMAIL_FORMATS)}.")
+        self.subject = settings.get("subject") or ""
+        self.body = settings.get("body") or ""
+        self.email_format = settings["format"]
+        # Placeholders are checked against the mapping now rather than failing mid-run
+        try:
+            self.template = MessageTemplate(self.subject, self.body, self.email_format)
+            self.template.validate(self.columns)
+        except TemplateError as e:
+            raise CampaignError(f"Template error: {e}") from None
+        try:
+            self.smtp_port = int(settings["smtp_port"])
+        except (TypeError, ValueError):
+            raise CampaignError("SMTP port must be a number.") from None
+        try:
+            self.connections = max(1, int(settings["connections"]))
+            self.max_messages = max(1, int(settings["emails_per_connection"]))
+            self.batch_size = max(1, int(settings["batch_recipients"]))
+        except (TypeError, ValueError):
+            raise CampaignError("Connections, emails per connection and recipients per email must be numbers.") from None
+        limits = settings["limits"]
+        if not isinstance(limits, dict):
+            raise CampaignError("Sending limits must map second/minute/day to numbers.")
+        try:
+            self.limits = [float(limits[period]) if limits.get(period) not in (None, "") else None for period in ("second", "minute", "day")]
+        except (TypeError, ValueError):
+            raise CampaignError("Sending limits must be numbers (leave blank for no limit).") from None
+        self.use_tls = bool(settings["tls"])
+        self.engine = settings["engine"]
+        if self.engine not in ENGINES:
+            raise CampaignError(f"Engine {self.engine!r} is not available; choose from {', '.join(ENGINES)}.")
+        try:
+            self.suppressed = load_suppression(settings["suppression"]) if settings["suppression"] else ()
+        except OSError as e:
+            raise CampaignError(f"Could not read suppression list: {e}") from None
+        self.check_mx = bool(settings["check_mx"]) and dns is not None
+        self.resume = bool(settings["resume"])
+        self.path = settings.get("recipients") or ""
+        try:
+            self.source = RecipientSource(self.path)
+        except Exception as e:
+            raise CampaignError(f"Could not open recipient file {self.path}: {e}") from None
+        unknown = [col for col in self.columns.values() if col not in self.source.columns]
+        if unknown:
+            raise CampaignError(f"Column(s) not in {self.path}: {', '.join(unknown)}")
+        self.store_path = self.path + CAMPAIGN_SUFFIX
+        self.fingerprint = campaign_fingerprint(self.sender, self.subject, self.body, self.email_format)
+        self.control = SendControl()
+
+    def previous(self):
+        # Counts from an earlier run of this campaign on this file, if it got anywhere
+        if not os.path.exists(self.store_path):
+            return None
+        store = CampaignStore(self.store_path, self.fingerprint)
+        try:
+            counts = store.counts()
+        finally:
+            store.close()
+        return counts if counts.get("sent") or counts.get("failed") or counts.get("retrying") else None
+
+    def run(self, report, on_start=None):
+        # Sends the campaign and returns the final counts per state. Connection and login
+        # errors are raised; per-recipient errors are recorded and reported
+        control = self.control
+        checker = RecipientChecker(self.suppressed, dns_has_mail_server if self.check_mx else None)
+        email_col, name_col = self.columns["Email"], self.columns["Name"]
+        # Every recipient's state lives in the campaign store, keyed by lower-cased address
+        store = CampaignStore(self.store_path, self.fingerprint)
+        # Emails sent from this list in the last day count toward the daily limit (sends
+        # from other lists or programs aren't known here)
+        sent_last_day = store.sent_since(time.time() - 86400)
+        if not self.resume:
+            store.reset()
+        limiter = RateLimiter(*self.limits, sent_last_day=sent_last_day)
+        missing = 0
+        skipped = Counter()
+        listed = set()  # every address in the file, gathered on the first pass
+        def recipients(wanted, record):
+            # Streams the file; yields each address's first row when it passes the checks and
+            # wanted(keys) selects it, grouped by domain within each chunk. On the first pass
+            # new addresses are added to the store as they are read
+            nonlocal missing
+            seen = set()
+            missing = 0
+            for chunk in self.source.chunks(self.columns.values()):
+                keys = text_column(chunk, email_col).str.strip().str.lower()
+                missing += int((keys == "").sum())
+                first = (keys != "") & ~keys.duplicated() & ~keys.isin(seen)
+                seen.update(keys[first])
+                if record:
+                    listed.update(keys[first])
+                reasons = checker.check(keys[first])
+                passed = first & (reasons.reindex(keys.index, fill_value="") == "")
+                if record:
+                    names = text_column(chunk, name_col)
+                    rejected = reasons[reasons != ""]
+                    store.skip(zip(keys[rejected.index], names[rejected.index], rejected))
+                    for idx, reason in rejected.items():
+                        skipped[reason] += 1
+                        report("skipped", f"Skipped {names[idx]} <{keys[idx]}>: {reason}", name=names[idx], email=keys[idx], reason=reason)
+                    store.add(zip(keys[passed], names[passed]))
+                rows = passed & wanted(keys)
+                if rows.any():
+                    order = keys[rows].str.rpartition("@")[2].sort_values(kind="stable").index
+                    yield chunk.loc[order]
+        latencies = []
+        latency_lock = threading.Lock()
+        attempted = 0
+        def finish(name, email, error=None, latency=None):
+            nonlocal attempted
+            key = email.strip().lower()
+            with latency_lock:
+                attempted += 1
+            if error is None:
+                store.record_sent(key)
+                with latency_lock:
+                    latencies.append(latency)
+                report("sent", f"Email sent to {name} <{email}> ({latency * 1000:.0f} ms).", name=name, email=email, latency_ms=round(latency * 1000, 1))
+            elif is_permanent(error):
+                store.record_failure(key, str(error), permanent=True)
+                report("failed", f"Error sending to {name} <{email}>: {error}", name=name, email=email, error=str(error))
+            else:
+                store.record_failure(key, str(error), permanent=False)
+                report("retrying", f"Temporary error sending to {name} <{email}>: {error}", name=name, email=email, error=str(error))
+        def send_pass(chunks, on_open=None):
+            messages = prefetch(render_messages(self.template, self.sender, self.columns, chunks, self.batch_size), SEND_QUEUE_SIZE)
+            if self.engine == "Asyncio":
+                pool = AsyncSMTPPool(self.smtp_host, self.smtp_port, self.sender, self.password, self.use_tls, self.connections, self.max_messages)
+                asyncio.run(send_async(pool, messages, self.sender, limiter, control, finish, on_open))
+            else:
+                # Connect to SMTP (the first connection is opened now so bad credentials fail early)
+                pool = SMTPConnectionPool(self.smtp_host, self.smtp_port, self.sender, self.password, self.use_tls, self.connections, self.max_messages)
+                pool.open()
+                if on_open:
+                    on_open()
+                send_threaded(pool, messages, self.sender, limiter, control, finish)
+        try:
+            if self.resume and store.counts().get("sent"):
+                report("info", f"Resuming campaign: {format_counts(store.counts())}.")
+            if self.limits[2] and sent_last_day:
+                report("info", f"{sent_last_day} email(s) sent from this list in the last 24 hours count toward the daily limit of {self.limits[2]:.0f}.", sent_last_day=sent_last_day)
+            if self.batch_size > 1 and not self.template.fields:
+                report("info", f"The email has no placeholders: sending one copy to up to {self.batch_size} recipients at a time (Bcc).")
+            # Sending starts with the first chunk read; addresses already settled are skipped
+            settled = store.settled()
+            send_pass(recipients(lambda keys: ~keys.isin(settled), True), on_start and (lambda: on_start(store)))
+            if missing:
+                report("info", f"{missing} row(s) have no email address and were skipped.", rows=missing)
+            if skipped:
+                report("info", "Skipped before sending: " + ", ".join(f"{count} {reason}" for reason, count in skipped.most_common()) + ".", skipped=dict(skipped))
+            if checker.domains:
+                top = ", ".join(f"{domain} {count}" for domain, count in checker.domains.most_common(TOP_DOMAINS))
+                report("info", f"Recipients by domain: {top} ({len(checker.domains)} domains).", domains=dict(checker.domains.most_common(TOP_DOMAINS)))
+            # Recipients of an earlier run who were since removed from the file can't be sent
+            # (or retried) from it, so they are settled as skipped
+            removed = 0 if control.cancelled else store.skip_missing(listed, "not in recipient list")
+            if removed:
+                report("info", f"{removed} recipient(s) from the earlier run are no longer in the file and were skipped.", removed=removed)
+            # Temporary failures come back after their backoff until they succeed or run out of
+            # attempts; each retry pass reads the file again for just those rows
+            while not control.cancelled:
+                due = store.due()
+                if due:
+                    before = attempted
+                    send_pass(recipients(lambda keys: keys.isin(due), False))
+                    if attempted == before:
+                        break  # none of them could be read from the file
+                    continue
+                wait = store.next_retry()
+                if wait is None:
+                    break
+                report("info", f"Retrying {store.counts().get('retrying', 0)} temporary failure(s) in {wait:.0f} s...")
+                control.sleep(wait)
+        finally:
+            store.close()
+        counts = store.counts()
+        if control.cancelled:
+            report("summary", f"Cancelled ({format_counts(counts)}). Send again to resume.", cancelled=True, **counts)
+        elif not counts.get("failed"):
+            report("summary", "All emails sent successfully!", cancelled=False, **counts)
+        else:
+            report("summary", f"Completed with {counts['failed']} errors ({format_counts(counts)}).", cancelled=False, **counts)
+        if latencies:
+            latencies.sort()
+            average = sum(latencies) / len(latencies)
+            slowest = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            report("info", f"{self.engine} engine: average send latency {average * 1000:.0f} ms, 95th percentile {slowest * 1000:.0f} ms.",
+                   average_ms=round(average * 1000, 1), p95_ms=round(slowest * 1000, 1))
+        return counts
+
+def load_campaign(path):
+    # A campaign config file as settings for Campaign; paths are resolved against its folder
+    with open(path, encoding="utf-8") as handle:
+        try:
+            config = json.load(handle)
+        except ValueError as e:
+            raise CampaignError(f"{path} is not valid JSON: {e}") from None
+    if not isinstance(config, dict):
+        raise CampaignError(f"{path} must contain a JSON object")
+    unknown = set(config) - CAMPAIGN_KEYS
+    if unknown:
+        raise CampaignError(f"Unknown campaign key(s): {', '.join(sorted(unknown))}")
+    # Wrong types would otherwise surface as tracebacks deep inside Campaign
+    for key, value in config.items():
+        if key in CAMPAIGN_OBJECT_KEYS and not isinstance(value, dict):
+            raise CampaignError(f"{key!r} must be a JSON object")
+        if key in CAMPAIGN_TEXT_KEYS and value is not None and not isinstance(value, str):
+            raise CampaignError(f"{key!r} must be a string")
+    folder = os.path.dirname(os.path.abspath(path))
+    for key in ("recipients", "body_file", "suppression"):
+        if config.get(key):
+            config[key] = os.path.join(folder, config[key])
+    if "body_file" in config:
+        with open(config.pop("body_file"), encoding="utf-8") as handle:
+            config["body"] = handle.read()
+    if "password_env" in config:
+        # Keeps the password out of the config file
+        name = config.pop("password_env")
+        if name not in os.environ:
+            raise CampaignError(f"Environment variable {name} is not set")
+        config["password"] = os.environ[name]
+    if "preset" in config:
+        preset = PROVIDER_PRESETS.get(config.pop("preset"))
+        if preset is None:
+            raise CampaignError(f"Unknown preset; choose from {', '.join(name for name, limits in PROVIDER_PRESETS.items() if limits)}")
+        config["limits"] = {**dict(zip(("second", "minute", "day"), preset)), **config.get("limits", {})}
+    return config
+
+class RecipientSource:
+    """A recipient list (.xlsx, .xls, .csv or .parquet) read a chunk of rows at a time.
+
+    Opening it reads only the header row. chunks() yields DataFrames holding just the
+    requested columns, so sending can start while the rest of the file is being read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.kind = os.path.splitext(path)[1].lower()
+        if self.kind == ".csv":
+            self.columns = list(pd.read_csv(path, nrows=0).columns)
+        elif self.kind == ".parquet":
+            import pyarrow.parquet as pq
+            self.columns = pq.ParquetFile(path).schema_arrow.names
+        elif self.kind == ".xls":
+            self.columns = list(pd.read_excel(path, nrows=0).columns)
+        elif self.kind == ".xlsx":
+            with self._xlsx_rows() as rows:
+                self.columns = header_names(next(rows, ()))
+        else:
+            raise ValueError(f"Unsupported file type {self.kind or '(none)'}")
+
+    def chunks(self, columns, chunk_rows=RECIPIENT_CHUNK_ROWS):
+        columns = list(dict.fromkeys(col for col in columns if col))
+        if self.kind == ".csv":
+            yield from pd.read_csv(self.path, usecols=columns, dtype=str, chunksize=chunk_rows)
+        elif self.kind == ".parquet":
+            import pyarrow.parquet as pq
+            start = 0
+            for batch in pq.ParquetFile(self.path).iter_batches(batch_size=chunk_rows, columns=columns):
+                # Row numbers run on across chunks, as for the other formats
+                yield batch.to_pandas().set_axis(range(start, start + batch.num_rows))
+                start += batch.num_rows
+        elif self.kind == ".xls":
+            # Legacy .xls has no streaming reader, so the sheet is read in one go
+            df = pd.read_excel(self.path, usecols=columns)
+            for start in range(0, len(df), chunk_rows):
+                yield df.iloc[start:start + chunk_rows]
+        else:
+            yield from self._xlsx_chunks(columns, chunk_rows)
+
+    def _xlsx_chunks(self, columns, chunk_rows):
+        # openpyxl's read-only mode streams rows from the sheet XML instead of loading the workbook
+        with self._xlsx_rows() as rows:
+            header = header_names(next(rows, ()))
+            positions = [header.index(col) for col in columns]
+            batch = []
+            start = 0
+            for row in rows:
+                values = [row[i] if i < len(row) else None for i in positions]
+                if any(value is not None for value in values):
+                    batch.append(values)
+                if len(batch) >= chunk_rows:
+                    yield pd.DataFrame(batch, columns=columns, index=range(start, start + len(batch)))
+                    start += len(batch)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=columns, index=range(start, start + len(batch)))
+
+    @contextlib.contextmanager
+    def _xlsx_rows(self):
+        workbook = openpyxl.load_workbook(self.path, read_only=True, data_only=True)
+        try:
+            yield workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+def header_names(row):
+    # Header cells as pandas names them: blanks become "Unnamed: i", and repeats get the
+    # first ".1", ".2", ... suffix that no other header already has
+    names = [f"Unnamed: {i}" if cell is None else str(cell) for i, cell in enumerate(row)]
+    original = set(names)
+    counts = {}
+    for i, name in enumerate(names):
+        base, count = name, counts.get(name, 0)
+        while count > 0:
+            counts[base] = count + 1
+            name = f"{base}.{count}"
+            count = count + 1 if name in original else counts.get(name, 0)
+        names[i] = name
+        counts[name] = count + 1
+    return names
+
+class SMTPConnectionPool:
+    """Up to `size` authenticated SMTP connections shared by the sending workers.
+
+    STARTTLS and login happen once per connection. A connection is recycled after
+    `max_messages` emails and reopened transparently if the server drops it.
+    """
+
+    def __init__(self, host, port, sender, password, use_tls=True, size=DEFAULT_CONNECTIONS, max_messages=DEFAULT_MESSAGES_PER_CONNECTION):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.password = password
+        self.use_tls = use_tls
+        self.max_messages = max_messages
+        # Each slot is [server or None, emails sent on it]; a worker owns a slot while sending.
+        # Last in, first out, so the slot just used (and still connected) is taken next and
+        # a run only opens as many connections as it keeps busy
+        self._slots = queue.LifoQueue()
+        for _ in range(size):
+            self._slots.put([None, 0])
+        self.size = size
+
+    def open(self):
+        slot = self._slots.get()
+        try:
+            slot[:] = [self._connect(), 0]
+        finally:
+            self._slots.put(slot)
+
+    def send(self, from_addr, to_addrs, message):
+        slot = self._slots.get()
+        try:
+            if slot[0] is None:
+                slot[:] = [self._connect(), 0]
+            try:
+                refused = slot[0].sendmail(from_addr, to_addrs, message)
+            except smtplib.SMTPServerDisconnected:
+                # Idle timeout or the server closed the session: reconnect and resend once
+                slot[:] = [self._connect(), 0]
+                refused = slot[0].sendmail(from_addr, to_addrs, message)
+            slot[1] += 1
+            if slot[1] >= self.max_messages:
+                self._close(slot)
+            # Recipients the server refused when it accepted others, as {address: (code, reply)}
+            return refused
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException):
+            # The server answered, so the connection itself is still usable
+            raise
+        except Exception:
+            self._close(slot)
+            raise
+        finally:
+            self._slots.put(slot)
+
+    def close(self):
+        slots = [self._slots.get() for _ in range(self.size)]
+        for slot in slots:
+            self._close(slot)
+            self._slots.put(slot)
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+        try:
+            if self.use_tls:
+                server.starttls()
+            server.login(self.sender, self.password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    @staticmethod
+    def _close(slot):
+        server = slot[0]
+        slot[:] = [None, 0]
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+class CampaignStore:
+    """SQLite record of one campaign's recipients, so a run can resume where it stopped.
+
+    A campaign is identified by its sender and templates and recipients by email address.
+    Each is queued, sent, retrying (after a temporary failure) or failed. Updates are
+    buffered and committed in batches; counts() reflects the last commit.
+    """
+
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(CAMPAIGN_SCHEMA)
+        self._db.execute("INSERT OR IGNORE INTO campaigns (fingerprint, created) VALUES (?, ?)", (fingerprint, time.time()))
+        self._db.commit()
+        self.campaign = self._db.execute("SELECT id FROM campaigns WHERE fingerprint = ?", (fingerprint,)).fetchone()[0]
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._flushed = time.monotonic()
+        self._counts = self._query_counts()
+
+    def reset(self):
+        with self._lock:
+            self._buffer = []
+            self._db.execute("DELETE FROM recipients WHERE campaign = ?", (self.campaign,))
+            self._db.commit()
+            self._counts = self._query_counts()
+
+    def add(self, recipients):
+        # (email, name) pairs; recipients already in the campaign keep their state
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO recipients (campaign, email, name, state, updated) VALUES (?, ?, ?, 'queued', ?)",
+                ((self.campaign, email, name, now) for email, name in recipients),
+            )
+            self._db.commit()
+            self._counts = self._query_counts()
+
+    def skip(self, recipients):
+        # (email, name, reason) triples failing the pre-send checks; sent recipients stay sent
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO recipients (campaign, email, name, state, response, updated) VALUES (?, ?, ?, 'skipped', ?, ?)"
+                " ON CONFLICT (campaign, email) DO UPDATE SET state = 'skipped', response = excluded.response, updated = excluded.updated"
+                " WHERE state != 'sent'",
+                ((self.campaign, email, name, reason, now) for email, name, reason in recipients),
+            )
+            self._db.commit()
+            self._counts = self._query_counts()
+
+    def sent_since(self, since):
+        # Recipients marked sent since `since` (epoch seconds) in any campaign on this list
+        self.flush()
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM recipients WHERE state = 'sent' AND updated >= ?", (since,)).fetchone()[0]
+
+    def skip_missing(self, listed, reason):
+        # Marks queued and retrying addresses that are not in `listed` as skipped; returns how many
+        self.flush()
+        now = time.time()
+        with self._lock:
+            pending = self._db.execute("SELECT email FROM recipients WHERE campaign = ? AND state IN ('queued', 'retrying')", (self.campaign,))
+            gone = [email for email, in pending if email not in listed]
+            self._db.executemany(
+                "UPDATE recipients SET state = 'skipped', response = ?, updated = ? WHERE campaign = ? AND email = ?",
+                ((reason, now, self.campaign, email) for email in gone),
+            )
+            self._db.commit()
+            self._counts = self._query_counts()
+        return len(gone)
+
+    def settled(self):
+        # Addresses not to send now: sent, failed, skipped, or waiting out a retry backoff
+        self.flush()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT email FROM recipients WHERE campaign = ? AND state != 'queued' AND NOT (state = 'retrying' AND next_attempt <= ?)",
+                (self.campaign, time.time()),
+            )
+            return {email for email, in rows}
+
+    def due(self):
+        # Addresses to send now: queued ones and retries whose backoff has expired
+        self.flush()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT email FROM recipients WHERE campaign = ? AND (state = 'queued' OR (state = 'retrying' AND next_attempt <= ?))",
+                (self.campaign, time.time()),
+            )
+            return {email for email, in rows}
+
+    def next_retry(self):
+        # Seconds until the next retry is due, or None when nothing is waiting
+        self.flush()
+        with self._lock:
+            due = self._db.execute("SELECT MIN(next_attempt) FROM recipients WHERE campaign = ? AND state = 'retrying'", (self.campaign,)).fetchone()[0]
+        return None if due is None else max(0.0, due - time.time())
+
+    def record_sent(self, email):
+        self._queue("UPDATE recipients SET state = 'sent', response = NULL, updated = ? WHERE campaign = ? AND email = ?", (time.time(), self.campaign, email))
+
+    def record_failure(self, email, response, permanent):
+        # The backoff doubles with each attempt: base, 2 x base, 4 x base, ...
+        now = time.time()
+        self._queue(
+            "UPDATE recipients SET attempts = attempts + 1, response = ?, updated = ?,"
+            " state = CASE WHEN ? OR attempts + 1 >= ? THEN 'failed' ELSE 'retrying' END,"
+            " next_attempt = ? + ? * (1 << attempts) WHERE campaign = ? AND email = ?",
+            (response, now, permanent, MAX_ATTEMPTS, now, RETRY_BASE_SECONDS, self.campaign, email),
+        )
+
+    def counts(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+    def _queue(self, sql, params):
+        with self._lock:
+            self._buffer.append((sql, params))
+            if len(self._buffer) >= STORE_BATCH_ROWS or time.monotonic() - self._flushed >= STORE_FLUSH_SECONDS:
+                self._flush()
+
+    def _flush(self):
+        self._flushed = time.monotonic()
+        if not self._buffer:
+            return
+        for sql, params in self._buffer:
+            self._db.execute(sql, params)
+        self._db.commit()
+        self._buffer = []
+        self._counts = self._query_counts()
+
+    def _query_counts(self):
+        return dict(self._db.execute("SELECT state, COUNT(*) FROM recipients WHERE campaign = ? GROUP BY state", (self.campaign,)).fetchall())
+
+class ThroughputMeter:
+    """Emails per second over the last `window` seconds, from (time, emails done) samples."""
+
+    def __init__(self, window=THROUGHPUT_WINDOW_SECONDS):
+        self.window = window
+        self._samples = deque()
+
+    def update(self, now, done):
+        self._samples.append((now, done))
+        while now - self._samples[0][0] > self.window:
+            self._samples.popleft()
+        then, before = self._samples[0]
+        return (done - before) / (now - then) if now > then else 0.0
+
+class RecipientChecker:
+    """Vectorized pre-send checks on lower-cased addresses: syntax, suppression and MX.
+
+    `suppressed` holds addresses and "@domain" entries. `resolver(domain)` returns
+    whether the domain accepts mail; it is called once per domain. `domains` counts the
+    addresses that passed, by domain.
+    """
+
+    def __init__(self, suppressed=(), resolver=None):
+        self.addresses = {entry for entry in suppressed if not entry.startswith("@")}
+        self.suppressed_domains = {entry[1:] for entry in suppressed if entry.startswith("@")}
+        self.resolver = resolver
+        self.mail_domains = {}
+        self.domains = Counter()
+
+    def check(self, keys):
+        # The reason each address is rejected, or "" when it passes
+        domains = keys.str.rpartition("@")[2]
+        reasons = pd.Series("", index=keys.index, dtype=object)
+        reasons[~keys.str.fullmatch(EMAIL_RE).fillna(False).astype(bool)] = "invalid address"
+        suppressed = keys.isin(self.addresses) | domains.isin(self.suppressed_domains)
+        reasons[(reasons == "") & suppressed] = "suppressed"
+        if self.resolver is not None:
+            pending = reasons == ""
+            self._resolve(domains[pending].unique())
+            reasons[pending & ~domains.map(self.mail_domains).fillna(True).astype(bool)] = "no mail server for domain"
+        self.domains.update(domains[reasons == ""])
+        return reasons
+
+    def _resolve(self, domains):
+        new = [domain for domain in domains if domain not in self.mail_domains]
+        if not new:
+            return
+        with ThreadPoolExecutor(min(MX_LOOKUP_THREADS, len(new))) as pool:
+            self.mail_domains.update(zip(new, pool.map(self.resolver, new)))
+
+def dns_has_mail_server(domain):
+    # A domain with no MX record can still take mail at its A record; lookup errors count as yes
+    resolver = dns.resolver.Resolver()
+    resolver.lifetime = MX_TIMEOUT
+    for record in ("MX", "A"):
+        try:
+            resolver.resolve(domain, record)
+            return True
+        except dns.resolver.NXDOMAIN:
+            return False
+        except dns.resolver.NoAnswer:
+            continue
+        except dns.exception.DNSException:
+            return True
+    return False
+
+def load_suppression(path):
+    # One address or "@domain" per line; in a CSV the first column is used and headers are skipped
+    entries = set()
+    with open(path, encoding="utf-8-sig") as f:
+        for line in f:
+            entry = line.split(",", 1)[0].strip().strip('"').lower()
+            if "@" in entry:
+                entries.add(entry)
+    return entries
+
+class TemplateError(ValueError):
+    """A subject or body template that cannot be rendered with the current mapping."""
+
+class MessageTemplate:
+    """Subject and body templates parsed once with string.Formatter.
+
+    validate() checks every placeholder against the column mapping before anything is
+    sent, and render_batch() fills a whole batch of rows column by column.
+    """
+
+    def __init__(self, subject, body, email_format="Plain Text"):
+        self.email_format = email_format
+        self._formatter = string.Formatter()
+        self.subject_parts = self._compile(subject, "subject")
+        self.body_parts = self._compile(body, "body")
+        self.fields = list(dict.fromkeys(field for _, field, _, _ in self.subject_parts + self.body_parts if field is not None))
+
+    def validate(self, available):
+        unknown = [field for field in self.fields if field not in available]
+        if unknown:
+            raise TemplateError(
+                "Unknown placeholder(s) " + ", ".join(f"{{{field}}}" for field in unknown)
+                + ". Available: " + ", ".join(f"{{{field}}}" for field in available)
+            )
+
+    def render_batch(self, values):
+        # `values` holds one text column per placeholder; returns (subjects, bodies)
+        return self._render(self.subject_parts, values), self._render(self.body_parts, values)
+
+    def build_message(self, sender, recipient, subject, body):
+        msg = MIMEMultipart()
+        msg['From'] = sender
+        msg['To'] = recipient
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'html' if self.email_format == "HTML" else 'plain'))
+        return msg.as_string()
+
+    def _compile(self, text, where):
+        try:
+            parts = list(self._formatter.parse(text))
+        except ValueError as e:
+            raise TemplateError(f"Invalid {where} template: {e}") from None
+        for _, field, spec, conversion in parts:
+            if field is None:
+                continue
+            if not field or "." in field or "[" in field:
+                raise TemplateError(f"Invalid placeholder {{{field}}} in {where}; use a field name such as {{Name}}")
+            try:
+                # Values are always text, so numeric format specs can never work
+                self._format("", conversion, spec)
+            except ValueError as e:
+                raise TemplateError(f"Invalid format for {{{field}}} in {where}: {e}") from None
+        return parts
+
+    def _format(self, value, conversion, spec):
+        return self._formatter.format_field(self._formatter.convert_field(value, conversion) if conversion else value, spec)
+
+    def _render(self, parts, values):
+        rendered = pd.Series("", index=values.index, dtype=object)
+        for literal, field, spec, conversion in parts:
+            if literal:
+                rendered = rendered + literal
+            if field is not None:
+                column = values[field]
+                if conversion or spec:
+                    column = column.map(lambda value: self._format(value, conversion, spec))
+                rendered = rendered + column
+        return rendered
+
+class AsyncSMTPPool:
+    """asyncio counterpart of SMTPConnectionPool, built on aiosmtplib."""
+
+    def __init__(self, host, port, sender, password, use_tls=True, size=DEFAULT_CONNECTIONS, max_messages=DEFAULT_MESSAGES_PER_CONNECTION):
+        if aiosmtplib is None:
+            raise RuntimeError("aiosmtplib not installed. Run: python -m pip install aiosmtplib")
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.password = password
+        self.use_tls = use_tls
+        self.max_messages = max_messages
+        self.size = size
+        self._slots = None
+
+    async def open(self):
+        # The queue must be created inside the running event loop (LIFO as in SMTPConnectionPool)
+        self._slots = asyncio.LifoQueue()
+        for _ in range(self.size):
+            self._slots.put_nowait([None, 0])
+        slot = await self._slots.get()
+        try:
+            slot[:] = [await self._connect(), 0]
+        finally:
+            self._slots.put_nowait(slot)
+
+    async def send(self, from_addr, to_addrs, message):
+        slot = await self._slots.get()
+        try:
+            if slot[0] is None:
+                slot[:] = [await self._connect(), 0]
+            try:
+                refused, _ = await slot[0].sendmail(from_addr, to_addrs, message)
+            except aiosmtplib.SMTPServerDisconnected:
+                slot[:] = [await self._connect(), 0]
+                refused, _ = await slot[0].sendmail(from_addr, to_addrs, message)
+            slot[1] += 1
+            if slot[1] >= self.max_messages:
+                await self._close(slot)
+            return {address: (reply.code, reply.message) for address, reply in refused.items()}
+        except (aiosmtplib.SMTPRecipientsRefused, aiosmtplib.SMTPResponseException):
+            raise
+        except Exception:
+            await self._close(slot)
+            raise
+        finally:
+            self._slots.put_nowait(slot)
+
+    async def close(self):
+        if self._slots is None:
+            return
+        slots = [await self._slots.get() for _ in range(self.size)]
+        for slot in slots:
+            await self._close(slot)
+            self._slots.put_nowait(slot)
+
+    async def _connect(self):
+        server = aiosmtplib.SMTP(hostname=self.host, port=self.port, timeout=SMTP_TIMEOUT, start_tls=False)
+        await server.connect()
+        try:
+            if self.use_tls:
+                await server.starttls()
+            await server.login(self.sender, self.password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    @staticmethod
+    async def _close(slot):
+        server = slot[0]
+        slot[:] = [None, 0]
+        if server is None:
+            return
+        try:
+            await server.quit()
+        except Exception:
+            server.close()
+
+class SendControl:
+    """Pause/resume/cancel flags, set from the GUI and checked by the senders between emails."""
+
+    def __init__(self):
+        self._running = threading.Event()
+        self._running.set()
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()
+
+    def sleep(self, seconds):
+        # Returns early when the run is cancelled
+        self._cancelled.wait(seconds)
+
+    def wait(self):
+        # Blocks while paused; False once the run is cancelled
+        self._running.wait()
+        return not self.cancelled
+
+    async def wait_async(self):
+        while self.paused:
+            await asyncio.sleep(CONTROL_POLL_SECONDS)
+        return not self.cancelled
+
+class RateLimiter:
+    """Token buckets for per-second, per-minute and per-day limits, shared by all workers.
+
+    acquire() blocks until every bucket has a token. backoff() pauses everyone after a
+    421/451 reply and halves the refill rate, which creeps back up with each success.
+    The daily bucket starts short of `sent_last_day` tokens, so a new run or a resume
+    doesn't get a fresh day's quota.
+    """
+
+    def __init__(self, per_second=None, per_minute=None, per_day=None, sent_last_day=0):
+        # Buckets start full: [capacity, refill per second, tokens]; capacity is at least one
+        # token so fractional limits (0.5 per second) still work
+        periods = ((per_second, 1, 0), (per_minute, 60, 0), (per_day, 86400, sent_last_day))
+        self._buckets = [[max(limit, 1), limit / period, max(0, max(limit, 1) - used)] for limit, period, used in periods if limit]
+        self._lock = threading.Lock()
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._scale = 1.0
+        self._strikes = 0
+
+    def acquire(self):
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(min(wait, 1.0))
+
+    async def acquire_async(self):
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            await asyncio.sleep(min(wait, 1.0))
+
+    def try_acquire(self):
+        # Takes a token from every bucket and returns 0, or returns how long to wait
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = self._paused_until - now
+            if wait > 0:
+                return wait
+            short = [(1 - tokens) / (rate * self._scale) for _, rate, tokens in self._buckets if tokens < 1]
+            if short:
+                return max(short)
+            for bucket in self._buckets:
+                bucket[2] -= 1
+            return 0
+
+    def backoff(self):
+        with self._lock:
+            self._strikes += 1
+            self._scale = max(MIN_RATE_SCALE, self._scale / 2)
+            pause = min(BACKOFF_MAX_SECONDS, BACKOFF_SECONDS * 2 ** (self._strikes - 1))
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+
+    def success(self):
+        with self._lock:
+            self._strikes = 0
+            self._scale = min(1.0, self._scale + RATE_RECOVERY)
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        for bucket in self._buckets:
+            bucket[2] = min(bucket[0], bucket[2] + elapsed * bucket[1] * self._scale)
+
+def smtp_codes(error):
+    # Reply codes carried by an smtplib/aiosmtplib error (one per refused recipient)
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return [code for code, _ in error.recipients.values()]
+    if aiosmtplib is not None and isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return [refused.code for refused in error.recipients]
+    code = getattr(error, "smtp_code", getattr(error, "code", None))
+    return [code] if isinstance(code, int) else []
+
+def refused_recipients(error):
+    # One smtplib error per refused address, so each recipient of a batch is judged by its
+    # own reply (a 450 among 550s is retried, the 550s fail)
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return {email: smtplib.SMTPRecipientsRefused({email: reply}) for email, reply in error.recipients.items()}
+    if aiosmtplib is not None and isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return {refused.recipient: smtplib.SMTPRecipientsRefused({refused.recipient: (refused.code, refused.message)}) for refused in error.recipients}
+    return {}
+
+def is_throttled(error):
+    # 421/451 mean "try again later"; for refused recipients every address must say so
+    codes = smtp_codes(error)
+    return bool(codes) and all(code in THROTTLE_CODES for code in codes)
+
+def is_permanent(error):
+    # 5xx replies will fail the same way again; connection errors and 4xx are worth a retry
+    codes = smtp_codes(error)
+    return bool(codes) and all(code >= 500 for code in codes)
+
+def campaign_fingerprint(sender, subject, body, email_format):
+    return hashlib.sha256(json.dumps([sender.lower(), subject, body, email_format]).encode("utf-8")).hexdigest()
+
+def format_counts(counts):
+    labels = [("sent", "sent"), ("failed", "failed"), ("skipped", "skipped"), ("retrying", "retrying"), ("queued", "not sent yet")]
+    return ", ".join(f"{counts.get(state, 0)} {label}" for state, label in labels if counts.get(state))
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m" if hours else f"{minutes}m {seconds:02d}s"
+
+def text_column(df, col):
+    # A column as plain strings with missing cells as "", or all "" for an unmapped field
+    if not col:
+        return pd.Series("", index=df.index, dtype=object)
+    series = df[col].astype(object)
+    return series.where(series.notna(), "").astype(str)
+
+def render_messages(template, sender, columns, chunks, batch_size=1):
+    # Yields (names, emails, message). Fills the templates a chunk of rows at a time, with
+    # missing cells as ""; a template without placeholders is built once and shared by up to
+    # batch_size recipients per message
+    if batch_size > 1 and not template.fields:
+        yield from batch_messages(template, sender, columns, chunks, batch_size)
+        return
+    for chunk in chunks:
+        values = pd.DataFrame({field: text_column(chunk, col) for field, col in columns.items()}, index=chunk.index)
+        subjects, bodies = template.render_batch(values)
+        for name, email, subject, body in zip(values["Name"], values["Email"].str.strip(), subjects, bodies):
+            yield [name], [email], template.build_message(sender, email, subject, body)
+
+def batch_messages(template, sender, columns, chunks, batch_size):
+    subjects, bodies = template.render_batch(pd.DataFrame(index=[0]))
+    message = template.build_message(sender, UNDISCLOSED_RECIPIENTS, subjects[0], bodies[0])
+    names, emails = [], []
+    for chunk in chunks:
+        for name, email in zip(text_column(chunk, columns["Name"]), text_column(chunk, columns["Email"]).str.strip()):
+            names.append(name)
+            emails.append(email)
+            if len(emails) == batch_size:
+                yield names, emails, message
+                names, emails = [], []
+    if emails:
+        yield names, emails, message
+
+def prefetch(iterable, maxsize):
+    # Runs `iterable` on a producer thread so it overlaps with the consumer; errors are
+    # re-raised in the consumer, and the producer stops when the consumer goes away
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=CONTROL_POLL_SECONDS)
+                return True
+            except queue.Full:
+                pass
+        return False
+    def produce():
+        try:
+            for item in iterable:
+                if not put((True, item)):
+                    return
+        except Exception as e:
+            put((False, e))
+            return
+        put((False, None))
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            ok, item = items.get()
+            if not ok:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        stop.set()
+
+def finish_batch(finish, names, emails, refused, latency):
+    # A message accepted for some recipients: the refused ones fail with their own reply
+    for name, email in zip(names, emails):
+        if email in refused:
+            finish(name, email, smtplib.SMTPRecipientsRefused({email: refused[email]}))
+        else:
+            finish(name, email, latency=latency)
+
+def fail_batch(finish, names, emails, error):
+    # A message that failed for every recipient: refused ones fail with their own reply
+    refused = refused_recipients(error)
+    for name, email in zip(names, emails):
+        finish(name, email, refused.get(email, error))
+
+def send_threaded(pool, messages, sender, limiter, control, finish):
+    # One worker thread per pooled connection, fed through a bounded queue
+    jobs = queue.Queue(maxsize=SEND_QUEUE_SIZE)
+    def worker():
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            names, emails, message = job
+            if not control.wait():
+                continue
+            for attempt in range(THROTTLE_RETRIES + 1):
+                # Waits for the shared limiter (one token per recipient), so the time a send
+                # takes counts toward the rate
+                for _ in emails:
+                    limiter.acquire()
+                started = time.perf_counter()
+                try:
+                    refused = pool.send(sender, emails, message)
+                except Exception as e:
+                    if is_throttled(e) and attempt < THROTTLE_RETRIES:
+                        limiter.backoff()
+                        continue
+                    fail_batch(finish, names, emails, e)
+                else:
+                    limiter.success()
+                    finish_batch(finish, names, emails, refused, time.perf_counter() - started)
+                break
+    workers = [threading.Thread(target=worker, daemon=True) for _ in range(pool.size)]
+    for thread in workers:
+        thread.start()
+    try:
+        for job in messages:
+            if not control.wait():
+                break
+            jobs.put(job)
+    finally:
+        for _ in workers:
+            jobs.put(None)
+        for thread in workers:
+            thread.join()
+        pool.close()
+
+async def send_async(pool, messages, sender, limiter, control, finish, on_open=None):
+    # Same flow as send_threaded, with one task per connection on a single event loop
+    await pool.open()
+    if on_open:
+        on_open()
+    jobs = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+    async def worker():
+        while True:
+            job = await jobs.get()
+            if job is None:
+                return
+            names, emails, message = job
+            if not await control.wait_async():
+                continue
+            for attempt in range(THROTTLE_RETRIES + 1):
+                # Providers count every recipient toward their limits, not every message
+                for _ in emails:
+                    await limiter.acquire_async()
+                started = time.perf_counter()
+                try:
+                    refused = await pool.send(sender, emails, message)
+                except Exception as e:
+                    if is_throttled(e) and attempt < THROTTLE_RETRIES:
+                        limiter.backoff()
+                        continue
+                    fail_batch(finish, names, emails, e)
+                else:
+                    limiter.success()
+                    finish_batch(finish, names, emails, refused, time.perf_counter() - started)
+                break
+    workers = [asyncio.create_task(worker()) for _ in range(pool.size)]
+    # `messages` blocks while the next chunk is read and rendered, so it is advanced on a
+    # thread; calling next() here would stall every send in flight
+    loop, messages, done = asyncio.get_running_loop(), iter(messages), object()
+    try:
+        while True:
+            job = await loop.run_in_executor(None, next, messages, done)
+            if job is done or not await control.wait_async():
+                break
+            await jobs.put(job)
+    finally:
+        for _ in workers:
+            await jobs.put(None)
+        await asyncio.gather(*workers)
+        await pool.close()
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        root = tk.Tk()
+        app = EmailSenderApp(root)
+        root.mainloop()
+        return EXIT_OK
+    parser = argparse.ArgumentParser(description="Send an email campaign from a JSON config file without opening the GUI. Progress is logged as JSON lines.")
+    parser.add_argument("config", help="JSON campaign config (recipients, columns, subject, body, sender, smtp_host, ...)")
+    parser.add_argument("--start-over", action="store_true", help="send to everyone again instead of resuming an earlier run")
+    parser.add_argument("--log-file", help="append the JSON log here instead of printing it")
+    args = parser.parse_args(argv)
+    log = open(args.log_file, "a", encoding="utf-8") if args.log_file else sys.stdout
+    def report(event, message, **fields):
+        record = {"time": datetime.now().isoformat(timespec="milliseconds"), "event": event, "message": message, **fields}
+        log.write(json.dumps(record, default=str) + "\n")
+        log.flush()
+    try:
+        return run_campaign_file(args.config, not args.start_over, report)
+    finally:
+        if log is not sys.stdout:
+            log.close()
+
+def run_campaign_file(path, resume, report):
+    try:
+        settings = load_campaign(path)
+        settings["resume"] = resume and settings.get("resume", True)
+        campaign = Campaign(settings)
+    except (OSError, CampaignError) as e:
+        report("error", str(e))
+        return EXIT_CONFIG_ERROR
+    # Ctrl+C or a scheduler's SIGTERM stops sending cleanly; the next run resumes. Python
+    # only allows signal handlers on the main thread, and the caller's are put back after
+    handlers = {}
+    if threading.current_thread() is threading.main_thread():
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            handlers[signum] = signal.signal(signum, lambda *_: campaign.control.cancel())
+    try:
+        counts = campaign.run(report)
+    except Exception as e:
+        report("error", f"Sending failed: {e}")
+        return EXIT_SEND_ERROR
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+    if campaign.control.cancelled:
+        return EXIT_CANCELLED
+    return EXIT_RECIPIENTS_FAILED if counts.get("failed") else EXIT_OK
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -6,14 +6,25 @@ if not hasattr(sys, 'stdout') or sys.stdout is None:
 
 # Ensure builtins is imported for speedtest-cli compatibility
 import builtins
+import json
+import os
+import queue
 import threading
 import time
+from collections import deque
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
 
+import numpy as np
 import pandas as pd
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
 import pyqtgraph as pg
-from PyQt6.QtCore import QObject, QThread, pyqtSignal, Qt
+from PyQt6.QtCore import QObject, QThread, QTimer, pyqtSignal, Qt
 from PyQt6.QtGui import QCloseEvent
 from PyQt6.QtWidgets import (
     QApplication,
@@ -29,7 +40,10 @@ from PyQt6.QtWidgets import (
 
 # System monitoring
 import psutil
-import wmi
+try:
+    import wmi  # CPU temperature, Windows only
+except ImportError:
+    wmi = None
 
 try:
     from speedtest import Speedtest
@@ -38,6 +52,150 @@ except ImportError:
         "speedtest-cli not installed. Run: python -m pip install speedtest-cli"
     )
 
+# Columns of a speed test result and their storage type, in CSV order
+RESULT_COLUMNS = {
+    "timestamp": "datetime64[us]",
+    "download": "float64",
+    "upload": "float64",
+    "ping": "float64",
+    "server": "object",
+    "error": "object",
+}
+# Columns of a system sample (network in Mbps, disk in MB/s), then one per CPU core
+SYSTEM_COLUMNS = {
+    "timestamp": "datetime64[us]",
+    "cpu_percent": "float64",
+    "mem_percent": "float64",
+    "mem_used": "float64",
+    "mem_total": "float64",
+    "cpu_temp": "float64",
+    "net_recv_mbps": "float64",
+    "net_sent_mbps": "float64",
+    "disk_read_mb_s": "float64",
+    "disk_write_mb_s": "float64",
+}
+SYSTEM_COLUMNS.update({f"cpu{core}_percent": "float64" for core in range(psutil.cpu_count() or 1)})
+# System metrics are sampled every SAMPLE_SECONDS on their own thread, whatever the speed tests are doing
+SAMPLE_SECONDS = 1.0
+# --- Speedtest server cache (edit here to change everywhere) ---
+# The speedtest.net configuration and server list are kept on disk for CONFIG_TTL_SECONDS,
+# so starting the app doesn't fetch them again. The best server is kept for
+# SERVER_TTL_SECONDS; before each test only that server is pinged, and the closest servers
+# are re-ranked sooner when a test fails or its latency rises above LATENCY_REGRESSION
+# times the latency it was ranked with
+SERVER_CACHE_FILE = Path.home() / ".net_speed_monitor_servers.json"
+CONFIG_TTL_SECONDS = 24 * 3600
+SERVER_TTL_SECONDS = 6 * 3600
+LATENCY_REGRESSION = 2.0
+# Results kept in memory for the graph (a week at the 10-second test interval, a day of
+# samples at 1 Hz); the log files have all of them
+BUFFER_CAPACITY = 65_536
+SAMPLE_BUFFER_CAPACITY = 86_400
+# --- Session log (edit here to change everywhere) ---
+# Results are appended by a background thread in batches. LOG_FSYNC is "always" (after
+# every batch), "interval" (every LOG_FSYNC_SECONDS) or "never" (left to the OS). A new
+# file is started past LOG_ROTATE_BYTES or at midnight. "parquet" needs pyarrow
+LOG_FORMAT = "csv"
+LOG_BATCH_ROWS = 100
+LOG_FLUSH_SECONDS = 5
+LOG_FSYNC = "interval"
+LOG_FSYNC_SECONDS = 60
+LOG_ROTATE_BYTES = 50 * 1024 * 1024
+LOG_ROTATE_DAILY = True
+LOG_FILE_FILTER = "Speed logs (*.csv *.parquet)"
+# Redraws are coalesced to one per frame and only the visible window is pushed to the
+# plot, decimated to at most MAX_PLOT_POINTS per line. The x-axis is time; while following
+# new results it shows at least the last PLOT_WINDOW_SECONDS
+PLOT_FRAME_MS = 200
+PLOT_WINDOW_SECONDS = 300
+MAX_PLOT_POINTS = 2000
+# A critical drop is a download below DROP_RATIO of the mean of the previous DROP_WINDOW tests
+DROP_WINDOW = 5
+DROP_RATIO = 0.3
+
+
+class ServerCache:
+    """Speedtest configuration, server list and best server, persisted between runs."""
+
+    def __init__(self, path: Path = SERVER_CACHE_FILE):
+        self.path = path
+        try:
+            self.data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.data = {}
+
+    def _fresh(self, key: str, ttl: float) -> bool:
+        return time.time() - self.data.get(key, 0) < ttl
+
+    def config(self) -> Optional[dict]:
+        """The cached configuration, or None once it is older than CONFIG_TTL_SECONDS."""
+        return self.data.get("config") if self._fresh("config_at", CONFIG_TTL_SECONDS) else None
+
+    def store_config(self, config: dict):
+        # Server distances and the best server depend on the client location in the
+        # configuration, so they are fetched again with it
+        self.data = {"config": config, "config_at": time.time()}
+        self.save()
+
+    def speedtest(self) -> "CachedSpeedtest":
+        """A Speedtest set up from the cache, fetching only what is missing or stale."""
+        st = CachedSpeedtest(self)
+        if self.data.get("servers"):
+            for server in self.data["servers"]:
+                st.servers.setdefault(server["d"], []).append(server)
+        else:
+            st.get_servers()
+            self.data["servers"] = [server for servers in st.servers.values() for server in servers]
+            self.save()
+        return st
+
+    def best_server(self, st: "CachedSpeedtest") -> dict:
+        """Selects the server for the next test (see SERVER_TTL_SECONDS) and returns it."""
+        best = self.data.get("best")
+        if best and self._fresh("ranked_at", SERVER_TTL_SECONDS):
+            try:
+                server = st.get_best_server([dict(best)])  # pings only this server
+                if server["latency"] <= LATENCY_REGRESSION * self.data["ranked_latency"]:
+                    return server
+            except Exception:
+                pass  # unreachable: re-rank
+        server = st.get_best_server()  # pings the closest servers
+        self.data.update(best=server, ranked_latency=server["latency"], ranked_at=time.time())
+        self.save()
+        return server
+
+    def invalidate(self):
+        """Forgets the best server, so the next test re-ranks."""
+        if self.data.pop("best", None) is not None:
+            self.save()
+
+    def save(self):
+        try:
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(json.dumps(self.data), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except OSError:
+            pass  # the cache only saves time; tests work without it
+
+
+class CachedSpeedtest(Speedtest):
+    """Speedtest that takes its configuration from a ServerCache while the cached copy is fresh."""
+
+    def __init__(self, cache: ServerCache, **kwargs):
+        self._cache = cache
+        super().__init__(**kwargs)  # calls get_config()
+
+    def get_config(self):
+        config = self._cache.config()
+        if config is None:
+            config = super().get_config()
+            self._cache.store_config(config)
+            return config
+        self.config.update(config)
+        client = self.config["client"]
+        self.lat_lon = (float(client["lat"]), float(client["lon"]))
+        return self.config
+
 
 class SpeedTestWorker(QObject):
     """Runs speed tests in a separate thread and emits results."""
@@ -62,59 +220,36 @@ class SpeedTestWorker(QObject):
         self._running = False
 
     def _loop(self):
-        st = Speedtest()
-        st.get_servers()
-        c = wmi.WMI(namespace="root\\wmi")
+        cache = ServerCache()
+        st = None
         while self._running:
             if self._paused:
                 time.sleep(1)
                 continue
             try:
-                st.get_best_server()
+                if st is None or cache.config() is None:
+                    st = cache.speedtest()  # first test, or the cached configuration expired
+                server = cache.best_server(st)
                 download = st.download() / 1_000_000  # to Mbps
                 upload = st.upload(pre_allocate=False) / 1_000_000
                 ping = st.results.ping
 
-                # System metrics
-                cpu_percent = psutil.cpu_percent(interval=None)
-                mem = psutil.virtual_memory()
-                mem_percent = mem.percent
-                mem_used = mem.used / (1024 ** 3)
-                mem_total = mem.total / (1024 ** 3)
-                # CPU temperature (Windows, may require admin)
-                cpu_temp = None
-                try:
-                    temps = c.MSAcpi_ThermalZoneTemperature()
-                    if temps:
-                        # Convert from tenths of Kelvin to Celsius
-                        cpu_temp = round(temps[0].CurrentTemperature / 10.0 - 273.15, 1)
-                except Exception:
-                    cpu_temp = None
-
                 result = {
                     "timestamp": datetime.now(),
                     "download": round(download, 2),
                     "upload": round(upload, 2),
                     "ping": round(ping, 2),
-                    "cpu_percent": cpu_percent,
-                    "mem_percent": mem_percent,
-                    "mem_used": round(mem_used, 2),
-                    "mem_total": round(mem_total, 2),
-                    "cpu_temp": cpu_temp,
+                    "server": f"{server['sponsor']} ({server['name']})",
                 }
                 self.result_ready.emit(result)
             except Exception as exc:
+                cache.invalidate()  # the server may be the problem: re-rank before the next test
                 self.result_ready.emit(
                     {
                         "timestamp": datetime.now(),
                         "download": None,
                         "upload": None,
                         "ping": None,
-                        "cpu_percent": None,
-                        "mem_percent": None,
-                        "mem_used": None,
-                        "mem_total": None,
-                        "cpu_temp": None,
                         "error": str(exc),
                     }
                 )
@@ -124,6 +259,333 @@ class SpeedTestWorker(QObject):
                 time.sleep(1)
 
 
+class SystemSampler(QObject):
+    """Samples system metrics at a fixed rate in a separate thread and emits them.
+
+    Runs independently of the speed tests, so CPU and I/O are seen second by second
+    (including while a test is running) rather than once per test.
+    """
+
+    sample_ready = pyqtSignal(dict)
+
+    def __init__(self, interval: float = SAMPLE_SECONDS):
+        super().__init__()
+        self._interval = interval  # seconds between samples
+        self._stopped = threading.Event()
+        self._stopped.set()
+
+    def start(self):
+        if not self._stopped.is_set():
+            return
+        # a fresh event per run, so a previous loop still finishing its sample can't restart
+        self._stopped = threading.Event()
+        threading.Thread(target=self._loop, args=(self._stopped,), daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _loop(self, stopped: threading.Event):
+        c = wmi.WMI(namespace="root\\wmi") if wmi is not None else None
+        psutil.cpu_percent(percpu=True)  # the first call only starts the measurement
+        last = (time.monotonic(), psutil.net_io_counters(), psutil.disk_io_counters())
+        next_at = time.monotonic() + self._interval
+        while not stopped.wait(max(0.0, next_at - time.monotonic())):
+            # fixed rate: the time spent sampling doesn't add up, and a stall doesn't cause a burst
+            next_at = max(next_at + self._interval, time.monotonic())
+            now = (time.monotonic(), psutil.net_io_counters(), psutil.disk_io_counters())
+            try:
+                self.sample_ready.emit(self._sample(c, last, now))
+            except Exception:
+                pass  # skip this sample; the next one measures from the same baseline
+            else:
+                last = now
+
+    @staticmethod
+    def _sample(c, last: tuple, now: tuple) -> dict:
+        elapsed = now[0] - last[0]
+        cores = psutil.cpu_percent(percpu=True)  # since the previous sample
+        mem = psutil.virtual_memory()
+        sample = {
+            "timestamp": datetime.now(),
+            "cpu_percent": round(sum(cores) / len(cores), 1),
+            "mem_percent": mem.percent,
+            "mem_used": round(mem.used / (1024 ** 3), 2),
+            "mem_total": round(mem.total / (1024 ** 3), 2),
+            "net_recv_mbps": round((now[1].bytes_recv - last[1].bytes_recv) * 8 / elapsed / 1_000_000, 3),
+            "net_sent_mbps": round((now[1].bytes_sent - last[1].bytes_sent) * 8 / elapsed / 1_000_000, 3),
+        }
+        if now[2] is not None and last[2] is not None:  # no disk counters on some systems
+            sample["disk_read_mb_s"] = round((now[2].read_bytes - last[2].read_bytes) / elapsed / (1024 ** 2), 3)
+            sample["disk_write_mb_s"] = round((now[2].write_bytes - last[2].write_bytes) / elapsed / (1024 ** 2), 3)
+        sample.update({f"cpu{core}_percent": value for core, value in enumerate(cores)})
+        # CPU temperature (Windows, may require admin)
+        try:
+            temps = c.MSAcpi_ThermalZoneTemperature() if c is not None else None
+            if temps:
+                # Convert from tenths of Kelvin to Celsius
+                sample["cpu_temp"] = round(temps[0].CurrentTemperature / 10.0 - 273.15, 1)
+        except Exception:
+            pass
+        return sample
+
+
+class MetricsBuffer:
+    """Fixed-capacity columnar ring buffer of results, one preallocated NumPy array per column.
+
+    Appending is O(1) and memory stays flat however long the monitor runs. Each array is
+    twice the capacity and every value is written to both halves, so the newest values are
+    always contiguous and view() returns a slice without copying. The oldest values are
+    overwritten once it is full (the session log keeps them).
+    """
+
+    def __init__(self, columns: dict = RESULT_COLUMNS, capacity: int = BUFFER_CAPACITY):
+        self.capacity = capacity
+        self._arrays = {name: self._empty(dtype, 2 * self.capacity) for name, dtype in columns.items()}
+        self._pos = 0  # next slot to write
+        self.size = 0  # results held in memory
+        self.total = 0  # results appended, including overwritten ones
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, columns: dict = RESULT_COLUMNS, capacity: int = BUFFER_CAPACITY) -> "MetricsBuffer":
+        """A buffer holding the newest results of a saved log, filled column by column."""
+        buffer = cls(columns, capacity)
+        tail = frame.iloc[-capacity:]
+        count = len(tail)
+        for name, array in buffer._arrays.items():
+            if name in tail:
+                values = tail[name].to_numpy(dtype=array.dtype, na_value=None if array.dtype == object else array[0])
+                array[:count] = array[capacity:capacity + count] = values
+        buffer._pos = count % capacity
+        buffer.size = count
+        buffer.total = len(frame)
+        return buffer
+
+    @staticmethod
+    def _empty(dtype: str, length: int) -> np.ndarray:
+        if dtype == "object":
+            return np.full(length, None, dtype=object)
+        return np.full(length, np.datetime64("NaT") if dtype.startswith("datetime64") else np.nan, dtype=dtype)
+
+    def append(self, result: dict):
+        for name, array in self._arrays.items():
+            value = result.get(name)
+            if value is None and array.dtype != object:
+                value = np.datetime64("NaT") if array.dtype.kind == "M" else np.nan
+            array[self._pos] = array[self._pos + self.capacity] = value
+        self._pos = (self._pos + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.total += 1
+
+    def view(self, name: str, last: Optional[int] = None) -> np.ndarray:
+        """The newest `last` values of a column (all in memory by default), oldest first."""
+        count = self.size if last is None else min(last, self.size)
+        end = self._pos + self.capacity
+        return self._arrays[name][end - count:end]
+
+    def index(self, last: Optional[int] = None) -> np.ndarray:
+        """Sample numbers (0 = first result of the session) matching view()."""
+        count = self.size if last is None else min(last, self.size)
+        return np.arange(self.total - count, self.total)
+
+    def frame(self, last: Optional[int] = None) -> pd.DataFrame:
+        return pd.DataFrame({name: self.view(name, last) for name in self._arrays})
+
+
+
+class ResultLogWriter:
+    """Appends results to the session log on a background thread.
+
+    put() only queues the result, so the UI never waits on the disk. Results are written
+    in batches (LOG_BATCH_ROWS, or every LOG_FLUSH_SECONDS), synced per LOG_FSYNC, and a
+    new numbered file is started past LOG_ROTATE_BYTES or when the day changes.
+
+    A Parquet file can only be read once it is closed, so in that format flush() closes
+    the current file and the next batch starts a new one; a crash loses the open file.
+    """
+
+    def __init__(self, path: Path, fmt: str = LOG_FORMAT, columns: dict = RESULT_COLUMNS):
+        if fmt == "parquet" and pq is None:
+            fmt = "csv"  # pyarrow not installed
+        self.base = path.with_suffix("." + fmt)
+        self.format = fmt
+        self.columns = columns
+        self.paths = []  # every file written this session
+        self.error = None
+        self._queue = queue.Queue()
+        self._file = None  # CSV file object or pyarrow ParquetWriter
+        self._day = None
+        self._synced = time.monotonic()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def put(self, result: dict):
+        self._queue.put(result)
+
+    def flush(self):
+        """Blocks until everything put so far is written, synced and readable."""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + LOG_FLUSH_SECONDS
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = False  # flush interval reached
+            if isinstance(item, dict):
+                batch.append(item)
+                if len(batch) < LOG_BATCH_ROWS:
+                    continue
+            force = item is None or isinstance(item, threading.Event)
+            if batch:
+                self._write(batch)
+                batch = []
+            if force and self._file is not None:
+                self._checkpoint()
+            deadline = time.monotonic() + LOG_FLUSH_SECONDS
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                self._close_file()
+                return
+
+    def _write(self, batch: list):
+        frame = pd.DataFrame(batch).reindex(columns=list(self.columns))
+        for name, dtype in self.columns.items():
+            frame[name] = frame[name].astype(dtype)
+        try:
+            self._rotate()
+            if self.format == "parquet":
+                # object columns (the error text) are typed as strings even in a batch without any
+                schema = pa.schema([pa.field(name, pa.string()) if dtype == "object" else pa.field(name, pa.from_numpy_dtype(frame[name].dtype))
+                                    for name, dtype in self.columns.items()])
+                table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+                if self._file is None:
+                    self._file = pq.ParquetWriter(self.paths[-1], table.schema)
+                self._file.write_table(table)  # one row group per batch
+            else:
+                if self._file is None:
+                    self._file = open(self.paths[-1], "a", newline="", encoding="utf-8")
+                frame.to_csv(self._file, header=self._file.tell() == 0, index=False)
+                self._file.flush()
+            if LOG_FSYNC == "always" or (LOG_FSYNC == "interval" and time.monotonic() - self._synced >= LOG_FSYNC_SECONDS):
+                self._sync()
+        except Exception as exc:
+            self.error = exc
+
+    def _checkpoint(self):
+        # A Parquet file only gets its footer when closed, so it is closed (the next batch
+        # starts a new numbered file); a CSV file just needs syncing
+        try:
+            if self.format == "parquet":
+                self._close_file()
+            else:
+                self._sync()
+        except Exception as exc:
+            self.error = exc
+
+    def _rotate(self):
+        # Starts the first file, or the next numbered one past the size limit or at midnight
+        today = datetime.now().date()
+        if self._file is not None:
+            too_big = LOG_ROTATE_BYTES and os.path.getsize(self.paths[-1]) >= LOG_ROTATE_BYTES
+            if not too_big and not (LOG_ROTATE_DAILY and today != self._day):
+                return
+            self._close_file()
+        self._day = today
+        part = len(self.paths) + 1
+        self.paths.append(self.base if part == 1 else self.base.with_name(f"{self.base.stem}_{part:03d}{self.base.suffix}"))
+
+    def _sync(self):
+        # Parquet files are only complete once closed, so they are synced on close instead
+        if self.format == "csv" and LOG_FSYNC != "never":
+            os.fsync(self._file.fileno())
+        self._synced = time.monotonic()
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        try:
+            if self.format == "csv":
+                self._sync()
+                self._file.close()
+            else:
+                self._file.close()
+                if LOG_FSYNC != "never":
+                    with open(self.paths[-1], "r+b") as handle:
+                        os.fsync(handle.fileno())
+        except Exception as exc:
+            self.error = exc
+        self._file = None
+
+
+def load_log(paths: list) -> tuple:
+    """Reads a saved session as (speed results, system samples), each in time order.
+
+    The paths can mix parts of the speed log and the system log (CSV or Parquet); they are
+    told apart by their columns. Logs from before the two were split have both.
+    """
+    speeds, samples = [], []
+    for path in paths:
+        frame = pd.read_parquet(path) if str(path).endswith(".parquet") else pd.read_csv(path)
+        frame["timestamp"] = pd.to_datetime(frame["timestamp"])
+        if "download" in frame:
+            speeds.append(frame)
+        if "cpu_percent" in frame:
+            samples.append(frame)
+
+    def in_time_order(frames: list, columns: dict) -> pd.DataFrame:
+        frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=list(columns))
+        return frame.sort_values("timestamp", kind="stable", ignore_index=True)
+
+    return in_time_order(speeds, RESULT_COLUMNS), in_time_order(samples, SYSTEM_COLUMNS)
+
+
+def find_drops(download: pd.Series) -> pd.Series:
+    """Critical drops in a whole log: downloads below DROP_RATIO of the previous DROP_WINDOW tests' mean."""
+    previous = download.shift(1).rolling(DROP_WINDOW, min_periods=1).mean()
+    return (download < DROP_RATIO * previous) & (download.index >= DROP_WINDOW)
+
+
+def epoch_seconds(stamps: np.ndarray) -> np.ndarray:
+    """Timestamps as plot x values. They are local wall-clock times counted as if UTC, so the
+    date axis (utcOffset=0) shows them unshifted."""
+    return stamps.astype("datetime64[us]").astype(np.int64) / 1e6
+
+
+def visible_slice(stamps: np.ndarray, x0: float, x1: float) -> slice:
+    """The part of a time-ordered column between plot x values x0 and x1, plus one value on
+    each side so lines run to the edges of the view."""
+    start = np.searchsorted(stamps, np.datetime64(int(x0 * 1e6), "us"), side="left")
+    stop = np.searchsorted(stamps, np.datetime64(int(x1 * 1e6), "us"), side="right")
+    return slice(max(0, start - 1), min(len(stamps), stop + 1))
+
+
+def minmax_decimate(x: np.ndarray, y: np.ndarray, max_points: int = MAX_PLOT_POINTS):
+    """Reduces a line to about max_points points, keeping each bucket's min and max so
+    spikes and drops stay visible when zoomed out."""
+    if len(x) <= max_points:
+        return x, y
+    size = -(-len(x) // (max_points // 2))
+    count = len(x) // size * size
+    blocks = y[:count].reshape(-1, size)
+    starts = np.arange(0, count, size)[:, None]
+    # min and max of each bucket, in the order they occur
+    picks = np.sort(np.column_stack((blocks.argmin(axis=1), blocks.argmax(axis=1))), axis=1) + starts
+    # the shorter last bucket keeps its min and max too, and the line always ends at the newest point
+    tail = y[count:]
+    ends = [count + tail.argmin(), count + tail.argmax()] if len(tail) else []
+    index = np.unique(np.concatenate((picks.ravel(), ends, [len(x) - 1])).astype(np.int64))
+    return x[index], y[index]
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -131,18 +593,18 @@ class MainWindow(QMainWindow):
         self.resize(900, 500)
 
         # ‑‑‑ Data storage
-        self.data = pd.DataFrame(columns=[
-            "timestamp", "download", "upload", "ping",
-            "cpu_percent", "mem_percent", "mem_used", "mem_total", "cpu_temp"
-        ])
         self.csv_path = (
             Path.cwd()
             / f"speed_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
         )
+        self.buffer = MetricsBuffer()
+        self.samples = MetricsBuffer(SYSTEM_COLUMNS, SAMPLE_BUFFER_CAPACITY)
+        self.log_writer = ResultLogWriter(self.csv_path)
+        self.sample_writer = ResultLogWriter(self.csv_path.with_name(f"{self.csv_path.stem}_system.csv"), columns=SYSTEM_COLUMNS)
 
         # ‑‑‑ Plot
         pg.setConfigOptions(antialias=True)
-        self.plot = pg.PlotWidget(title="Live Internet Speed (Mbps)")
+        self.plot = pg.PlotWidget(title="Live Internet Speed (Mbps)", axisItems={"bottom": pg.DateAxisItem(utcOffset=0)})
         self.plot.addLegend()
         # --- Graph line colors (edit here to change everywhere) ---
         self.color_download = 'b'  # blue
@@ -150,6 +612,7 @@ class MainWindow(QMainWindow):
         self.color_cpu = 'm'       # magenta
         self.color_mem = 'c'       # cyan
         self.color_temp = 'orange' # orange
+        self.color_net = 'y'       # yellow
 
         self.download_line = self.plot.plot(
             pen=pg.mkPen(self.color_download, width=2), name="Download"
@@ -166,12 +629,22 @@ class MainWindow(QMainWindow):
         self.temp_line = self.plot.plot(
             pen=pg.mkPen(self.color_temp, width=2), name="CPU Temp"
         )
+        self.net_line = self.plot.plot(
+            pen=pg.mkPen(self.color_net, width=1), name="Network In"
+        )
         self.drop_scatter = pg.ScatterPlotItem(pen=None, brush="r", size=10)
         self.plot.addItem(self.drop_scatter)
-        # Set up auto-range for x-axis (show last N points)
-        self.max_points = 30  # Number of points to keep visible
-        self.plot.setXRange(0, self.max_points, padding=0)
         self.plot.setAutoVisible(y=True)
+        self.drops = deque(maxlen=BUFFER_CAPACITY)  # (time, download) of critical drops
+        # Results and zooming only mark the plot dirty; the timer redraws at most once per frame.
+        # While the newest result is in view the plot follows it, keeping the zoom level
+        self._plot_dirty = False
+        self._following = True
+        self._moving_view = False
+        self.plot.getViewBox().sigXRangeChanged.connect(self.view_changed)
+        self.plot_timer = QTimer(self)
+        self.plot_timer.timeout.connect(self.refresh_plot)
+        self.plot_timer.start(PLOT_FRAME_MS)
 
         # Loading animation
         self.loading_label = QLabel("<b>Loading...</b>")
@@ -185,21 +658,23 @@ class MainWindow(QMainWindow):
         self.cpu_label = QLabel("CPU: … %")
         self.mem_label = QLabel("Memory: … %")
         self.temp_label = QLabel("CPU Temp: … °C")
+        self.net_label = QLabel("Network: … Mbps")
 
         # ‑‑‑ Buttons
         self.start_btn = QPushButton("Start")
         self.pause_btn = QPushButton("Pause")
         self.stop_btn = QPushButton("Stop & Save")
+        self.load_btn = QPushButton("Load Log")
         self.pause_btn.setEnabled(False)
         self.stop_btn.setEnabled(False)
 
         # Layout
         hbox = QHBoxLayout()
-        for widget in (self.dl_label, self.ul_label, self.ping_label, self.cpu_label, self.mem_label, self.temp_label):
+        for widget in (self.dl_label, self.ul_label, self.ping_label, self.cpu_label, self.mem_label, self.temp_label, self.net_label):
             hbox.addWidget(widget)
             hbox.addStretch(1)
         btnbox = QHBoxLayout()
-        for widget in (self.start_btn, self.pause_btn, self.stop_btn):
+        for widget in (self.start_btn, self.pause_btn, self.stop_btn, self.load_btn):
             btnbox.addWidget(widget)
         vbox = QVBoxLayout()
         vbox.addLayout(hbox)
@@ -216,19 +691,24 @@ class MainWindow(QMainWindow):
         self.worker.moveToThread(self.worker_thread)
         self.worker.result_ready.connect(self.handle_result)
         self.worker_thread.started.connect(self.worker.start_tests)
+        self.sampler = SystemSampler()
+        self.sampler.sample_ready.connect(self.handle_sample)
 
         # Signals
         self.start_btn.clicked.connect(self.start_tests)
         self.pause_btn.clicked.connect(self.toggle_pause)
         self.stop_btn.clicked.connect(self.stop_tests)
+        self.load_btn.clicked.connect(self.load_previous_log)
 
     # ‑‑‑ UI callbacks
     def start_tests(self):
         if not self.worker_thread.isRunning():
             self.worker_thread.start()
+        self.sampler.start()
         self.start_btn.setEnabled(False)
         self.pause_btn.setEnabled(True)
         self.stop_btn.setEnabled(True)
+        self.load_btn.setEnabled(False)
         self.loading_label.show()
         self.loading_label.setText("<b>Testing... Please wait</b>")
 
@@ -239,88 +719,146 @@ class MainWindow(QMainWindow):
 
     def stop_tests(self):
         self.worker.stop()
+        self.sampler.stop()
         self.worker_thread.quit()
         self.worker_thread.wait()
         self.save_data()
         self.start_btn.setEnabled(True)
         self.pause_btn.setEnabled(False)
         self.stop_btn.setEnabled(False)
+        self.load_btn.setEnabled(True)
         self.loading_label.hide()
 
     def handle_result(self, result: dict):
-        # append to DataFrame
-        self.data = pd.concat(
-            [self.data, pd.DataFrame([result])], ignore_index=True
-        )
+        # append to the ring buffer (O(1), no copy of the history) and queue it for the log
+        self.buffer.append(result)
+        self.log_writer.put(result)
         # update labels
         if result.get("download") is not None:
             self.dl_label.setText(f"Download: {result['download']:.2f} Mbps")
             self.ul_label.setText(f"Upload: {result['upload']:.2f} Mbps")
             self.ping_label.setText(f"Ping: {result['ping']:.2f} ms")
-            self.cpu_label.setText(f"CPU: {result.get('cpu_percent', 0):.1f} %")
-            self.mem_label.setText(f"Memory: {result.get('mem_percent', 0):.1f} % ({result.get('mem_used', 0):.2f}/{result.get('mem_total', 0):.2f} GB)")
-            temp = result.get('cpu_temp')
-            if temp is not None:
-                self.temp_label.setText(f"CPU Temp: {temp:.1f} °C")
-            else:
-                self.temp_label.setText("CPU Temp: N/A")
             self.loading_label.setText("<b>Testing... Please wait</b>")
         else:
             # error case
             self.dl_label.setText("Download: error")
             self.ul_label.setText("Upload: error")
             self.ping_label.setText("Ping: error")
-            self.cpu_label.setText("CPU: error")
-            self.mem_label.setText("Memory: error")
-            self.temp_label.setText("CPU Temp: error")
             self.loading_label.setText("<b>Error: Test failed</b>")
 
-        # update plot lines
-        x = self.data.index.values
-        self.download_line.setData(x, self.data["download"].fillna(0).values)
-        self.upload_line.setData(x, self.data["upload"].fillna(0).values)
-        self.cpu_line.setData(x, self.data["cpu_percent"].fillna(0).values)
-        self.mem_line.setData(x, self.data["mem_percent"].fillna(0).values)
-        # Only plot CPU temp if at least one value is not None
-        if self.data["cpu_temp"].notnull().any():
-            self.temp_line.setData(x, self.data["cpu_temp"].fillna(0).values)
-        else:
-            self.temp_line.clear()
-
-        # Auto-move x-axis to keep last N points visible
-        if len(x) > self.max_points:
-            self.plot.setXRange(x[-self.max_points], x[-1], padding=0)
+        # critical drops are checked once, against the tests before this one
+        download = result.get("download")
+        previous = self.buffer.view("download", DROP_WINDOW + 1)[:-1]
+        if download is not None and len(previous) == DROP_WINDOW and np.isfinite(previous).any():
+            if download < DROP_RATIO * np.nanmean(previous):
+                self.drops.append((epoch_seconds(self.buffer.view("timestamp", 1))[0], download))
+        self._plot_dirty = True
+
+    def handle_sample(self, sample: dict):
+        self.samples.append(sample)
+        self.sample_writer.put(sample)
+        self.cpu_label.setText(f"CPU: {sample['cpu_percent']:.1f} %")
+        self.mem_label.setText(f"Memory: {sample['mem_percent']:.1f} % ({sample['mem_used']:.2f}/{sample['mem_total']:.2f} GB)")
+        temp = sample.get('cpu_temp')
+        if temp is not None:
+            self.temp_label.setText(f"CPU Temp: {temp:.1f} °C")
         else:
-            self.plot.setXRange(0, self.max_points, padding=0)
-
-        # critical drops (download < 30% of mean of previous 5 tests)
-        if len(self.data) > 5:
-            recent_mean = self.data["download"].tail(5).mean()
-            drops = self.data["download"] < 0.3 * recent_mean
-            self.drop_scatter.setData(x[drops], self.data.loc[drops, "download"].values)
+            self.temp_label.setText("CPU Temp: N/A")
+        self.net_label.setText(f"Network: {sample['net_recv_mbps']:.2f}↓ {sample['net_sent_mbps']:.2f}↑ Mbps")
+        self._plot_dirty = True
+
+    def newest_time(self) -> Optional[float]:
+        """Plot x value of the newest speed result or system sample."""
+        stamps = [epoch_seconds(buffer.view("timestamp", 1))[0] for buffer in (self.buffer, self.samples) if buffer.size]
+        return max(stamps, default=None)
+
+    def view_changed(self, *args):
+        if not self._moving_view:
+            # Panning or zooming by hand: keep following only if the newest result is still in view
+            newest = self.newest_time()
+            self._following = newest is None or self.plot.getViewBox().viewRange()[0][1] >= newest
+        self._plot_dirty = True
+
+    def refresh_plot(self):
+        newest = self.newest_time()
+        if not self._plot_dirty or newest is None:
+            return
+        self._plot_dirty = False
+        x0, x1 = self.plot.getViewBox().viewRange()[0]
+        if self._following:
+            # Auto-move x-axis to keep the last PLOT_WINDOW_SECONDS (or the zoomed-out width) visible
+            width = max(PLOT_WINDOW_SECONDS, x1 - x0)
+            x0, x1 = newest - width, newest
+            self._moving_view = True
+            self.plot.setXRange(x0, x1, padding=0)
+            self._moving_view = False
+        # Speed results and system samples are drawn against their own timestamps, so they
+        # line up in time. Only the in-memory values inside the view are pushed (missing
+        # values plot as 0)
+        streams = (
+            (self.buffer, ((self.download_line, "download"), (self.upload_line, "upload"))),
+            (self.samples, ((self.cpu_line, "cpu_percent"), (self.mem_line, "mem_percent"), (self.net_line, "net_recv_mbps"), (self.temp_line, "cpu_temp"))),
+        )
+        for buffer, lines in streams:
+            in_view = visible_slice(buffer.view("timestamp"), x0, x1)
+            x = epoch_seconds(buffer.view("timestamp")[in_view])
+            for line, column in lines:
+                values = buffer.view(column)[in_view]
+                # Only plot CPU temp if at least one value in view is not None
+                if column == "cpu_temp" and not np.isfinite(values).any():
+                    line.clear()
+                    continue
+                line.setData(*minmax_decimate(x, np.nan_to_num(values)))
+        drops = [(t, value) for t, value in self.drops if x0 <= t <= x1]
+        self.drop_scatter.setData([t for t, _ in drops], [value for _, value in drops])
 
     # ‑‑‑ Helpers
     def save_data(self):
-        try:
-            self.data.to_csv(self.csv_path, index=False)
+        # Results are already streamed to the logs; this only waits for the last batches
+        writers = (self.log_writer, self.sample_writer)
+        for writer in writers:
+            writer.flush()
+        errors = [str(writer.error) for writer in writers if writer.error is not None]
+        paths = [str(path) for writer in writers for path in writer.paths]
+        if errors:
+            QMessageBox.critical(
+                self,
+                "Save error",
+                f"Could not save log: {'; '.join(errors)}",
+            )
+        elif paths:
             QMessageBox.information(
                 self,
                 "Saved",
-                f"Log saved to {self.csv_path}",
+                "Log saved to " + ", ".join(paths),
             )
+
+    def load_previous_log(self):
+        paths, _ = QFileDialog.getOpenFileNames(self, "Load speed log", str(Path.cwd()), LOG_FILE_FILTER)
+        if not paths:
+            return
+        try:
+            frame, samples = load_log(paths)
         except Exception as exc:
-            QMessageBox.critical(
-                self,
-                "Save error",
-                f"Could not save log: {exc}",
-            )
+            QMessageBox.critical(self, "Load error", f"Could not load log: {exc}")
+            return
+        # The loaded session replaces the graph; new results continue after it
+        self.buffer = MetricsBuffer.from_frame(frame)
+        self.samples = MetricsBuffer.from_frame(samples, SYSTEM_COLUMNS, SAMPLE_BUFFER_CAPACITY)
+        drops = frame[find_drops(frame["download"])]
+        self.drops = deque(zip(epoch_seconds(drops["timestamp"].to_numpy()), drops["download"]), maxlen=BUFFER_CAPACITY)
+        self._following = True
+        self._plot_dirty = True
 
     def closeEvent(self, event: QCloseEvent):
+        self.sampler.stop()
         if self.worker_thread.isRunning():
             self.worker.stop()
             self.worker_thread.quit()
             self.worker_thread.wait()
         self.save_data()
+        self.log_writer.close()
+        self.sample_writer.close()
         self.loading_label.hide()
         super().closeEvent(event)
 
@@ -0,0 +1,117 @@
+import re
+import socketserver
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "net_speed_monitor")]
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Minimal plain-text SMTP server (EHLO, AUTH, MAIL, RCPT, DATA) that records what it gets.
+
+    `replies` maps a message number (1-based, in arrival order) to the reply sent after its
+    DATA instead of 250, e.g. {3: "421 4.7.0 Try again later"}. `refuse` maps addresses to
+    the reply to their RCPT, e.g. {"gone@example.com": "550 5.1.1 No such user"}.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, replies=None, refuse=None):
+        super().__init__(("127.0.0.1", 0), SMTPSession)
+        self.port = self.server_address[1]
+        self.replies = replies or {}
+        self.refuse = refuse or {}
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.logins = 0
+        self.received = 0  # DATA commands, including rejected ones
+        self.messages = []  # (connection number, sender, recipients)
+        self.rcpts = Counter()
+        self.refused = Counter()  # RCPT commands refused, by address
+
+    def per_connection(self):
+        return Counter(connection for connection, _, _ in self.messages)
+
+
+class SMTPSession(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+            connection = server.connections
+        sender, recipients = None, []
+        self.reply("220 stand-in ESMTP")
+        for raw in self.rfile:
+            command = raw.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.reply("250-stand-in")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif verb == "HELO":
+                self.reply("250 stand-in")
+            elif verb == "AUTH":
+                with server.lock:
+                    server.logins += 1
+                self.reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                sender, recipients = re.search(r"<([^>]*)>", command).group(1), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                address = re.search(r"<([^>]*)>", command).group(1)
+                if address in server.refuse:
+                    with server.lock:
+                        server.refused[address] += 1
+                    self.reply(server.refuse[address])
+                else:
+                    recipients.append(address)
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                if not recipients:
+                    self.reply("554 5.5.1 No valid recipients")
+                    continue
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                for line in self.rfile:
+                    if line in (b".\r\n", b".\n"):
+                        break
+                with server.lock:
+                    server.received += 1
+                    reply = server.replies.get(server.received)
+                    if not reply:
+                        server.messages.append((connection, sender, recipients))
+                        server.rcpts.update(recipients)
+                self.reply(reply or "250 OK")
+            elif verb == "RSET":
+                sender, recipients = None, []
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+@pytest.fixture
+def smtp_server():
+    servers = []
+
+    def start(replies=None, refuse=None):
+        server = SMTPStandIn(replies, refuse)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,341 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import contact_cleaner as cc
+
+
+def expected(values, match):
+    return np.flatnonzero([match(str(value).lower()) for value in values])
+
+
+@pytest.fixture
+def emails():
+    rng = np.random.default_rng(7)
+    names = np.array(["anna", "Bob", "carl", "dora", "Émile", "zoë", "max"])
+    domains = np.array(["gmail.com", "web.de", "example.org"])
+    values = [f"{names[i]}{n}@{domains[j]}" for i, n, j in zip(rng.integers(0, 7, 500), rng.integers(0, 50, 500), rng.integers(0, 3, 500))]
+    values[3] = ""
+    values[10] = "x" * (cc.TRIGRAM_MAX_LEN + 5) + "anna"  # too long for the trigram index
+    return values
+
+
+@pytest.mark.parametrize("text", ["a", "Z", "@", "an", "ë", "ann", "nna4", "gmail.com", "q", "xxxanna"])
+def test_column_index_contains_matches_a_scan(emails, text):
+    index = cc.ColumnIndex(pd.Series(emails))
+    assert index.contains(text).tolist() == expected(emails, lambda value: text.lower() in value).tolist()
+
+
+@pytest.mark.parametrize("text", ["a", "bob", "émile1", "x", ""])
+def test_column_index_starts_with_matches_a_scan(emails, text):
+    index = cc.ColumnIndex(pd.Series(emails))
+    assert index.starts_with(text).tolist() == expected(emails, lambda value: value.startswith(text)).tolist()
+
+
+def test_column_index_sees_edits_and_deletes(emails):
+    index = cc.ColumnIndex(pd.Series(emails))
+    index.update(0, "Quentin@quux.io")
+    emails[0] = "Quentin@quux.io"
+    assert index.contains("q").tolist() == [0]
+    assert index.starts_with("quen").tolist() == [0]
+
+    deleted = np.array([1, 2, 50, 499])
+    index.delete(deleted)
+    emails = [value for pos, value in enumerate(emails) if pos not in set(deleted.tolist())]
+    for text in ["a", "an", "gmail", "quux"]:
+        assert index.contains(text).tolist() == expected(emails, lambda value: text in value).tolist()
+    assert index.starts_with("dora").tolist() == expected(emails, lambda value: value.startswith("dora")).tolist()
+
+
+def test_column_index_refines_within_earlier_hits(emails):
+    index = cc.ColumnIndex(pd.Series(emails))
+    first = index.contains("an")
+    assert index.contains("anna", within=first).tolist() == expected(emails, lambda value: "anna" in value).tolist()
+
+
+@pytest.fixture
+def contacts():
+    return pd.DataFrame({
+        "Name": ["Ann", "Bob", "Cléo", "Dan", "Eve", "Finn"],
+        "City": ["Paris", "paris ", "London", "Paris", None, "Berlin"],
+        "Email": ["ann@gmail.com", "bob@web.de", "cleo@gmail.com", "", "eve@GMAIL.com", "finn@x.org"],
+        "Phone": ["+33 1", "", None, "+33 2", "", "+49 3"],
+        "Age": [25, 41, 30, 38, 19, "n/a"],
+        "Zip Code": ["75001", "75002", "SW1", "75003", "", "10115"],
+    })
+
+
+@pytest.mark.parametrize("query, rows", [
+    # the documented examples, with lower-case column names
+    ("city = paris and (email ~ gmail or phone is empty) and age between 20 and 40", [0]),
+    ("city = paris or city = london", [0, 1, 2, 3]),
+    ("City != paris", [2, 4, 5]),
+    ("email ^= c or email matches '^e.*@gmail'", [2, 4]),
+    ("not (phone is not empty) and age < 20", [4]),
+    ("age >= 38", [1, 3]),
+    ("`zip code` ^= 750 and name contains o", [1]),
+    ("\"Zip Code\" is empty", [4]),
+])
+def test_filter_engine_documented_syntax(contacts, query, rows):
+    assert cc.FilterEngine().filter(contacts, query).tolist() == rows
+
+
+@pytest.mark.parametrize("query, message", [
+    ("town = paris", "Unknown column"),
+    ("city paris", "Unknown operator"),
+    ("city = paris and", "Unexpected end"),
+    ("(city = paris", "Unexpected end"),
+    ("age between 1", "Unexpected end"),
+    ("age > old", "Expected a number"),
+    ("email matches '['", "Invalid regex"),
+    ("", "Empty query"),
+])
+def test_filter_engine_rejects_bad_queries(contacts, query, message):
+    with pytest.raises(cc.FilterQueryError, match=message):
+        cc.FilterEngine().filter(contacts, query)
+
+
+def test_filter_engine_rejects_ambiguous_column_case(contacts):
+    contacts["city"] = "x"
+    assert cc.FilterEngine().filter(contacts, "city = x").tolist() == list(range(6))
+    with pytest.raises(cc.FilterQueryError, match="Ambiguous"):
+        cc.FilterEngine().filter(contacts, "CITY = x")
+
+
+def test_parse_query_precedence():
+    node = cc.parse_query("a = 1 or b = 2 and not c = 3")
+    assert isinstance(node, cc.BoolNode) and node.op == "or"
+    assert [p.key for p in node.predicates()] == [("a", "=", "1"), ("b", "=", "2"), ("c", "=", "3")]
+    assert isinstance(node.children[1], cc.BoolNode) and node.children[1].op == "and"
+    assert isinstance(node.children[1].children[1], cc.NotNode)
+
+
+def test_filter_engine_uses_the_search_index_and_cached_masks(contacts):
+    index = cc.SearchIndex()
+    engine = cc.FilterEngine()
+    assert engine.filter(contacts, "email ~ GMAIL", index).tolist() == [0, 2, 4]
+    assert engine.filter(contacts, "email ~ gmail and name ^= c", index).tolist() == [2]
+
+
+def write_stale_journal(path):
+    journal = str(path) + cc.JOURNAL_SUFFIX
+    with open(journal, "w", encoding="utf-8") as handle:
+        handle.write('{"op": "base", "size": 1, "mtime_ns": 1}\n{"op": "set", "row": 0, "col": "Name", "value": "Zed"}\n')
+    return journal
+
+
+def test_recipe_run_ignores_a_stale_journal_without_deleting_it(contacts, tmp_path):
+    path = tmp_path / "contacts.csv"
+    contacts.to_csv(path, index=False)
+    journal = write_stale_journal(path)
+    before = path.read_bytes()
+
+    cc.run_recipe(str(path), {}, output_dir=str(tmp_path / "out"))
+
+    assert (tmp_path / "out").exists()
+    assert path.read_bytes() == before
+    assert open(journal, encoding="utf-8").read().count("\n") == 2
+    out = pd.read_csv(next((tmp_path / "out").iterdir()))
+    assert out["Name"].tolist() == contacts["Name"].tolist()  # the stale edit is not applied
+
+
+def test_gui_load_discards_a_stale_journal(contacts, tmp_path):
+    path = tmp_path / "contacts.csv"
+    contacts.to_csv(path, index=False)
+    journal = write_stale_journal(path)
+
+    loaded = cc.ContactList.load(str(path))
+
+    assert loaded.df["Name"].tolist() == contacts["Name"].tolist()
+    assert not cc.os.path.exists(journal)
+
+
+def test_journal_replays_edits_after_a_crash_up_to_a_torn_line(contacts, tmp_path):
+    path = str(tmp_path / "contacts.csv")
+    contacts.to_csv(path, index=False)
+    edited = cc.ContactList.load(path)
+    edited.set_cell(0, "Name", "Zed")
+    edited.delete_rows([2])
+    # The process dies halfway through writing the next entry
+    with open(edited.journal.path, "a", encoding="utf-8") as handle:
+        handle.write('{"op": "set", "row": 1, "col"')
+
+    loaded = cc.ContactList.load(path)
+
+    assert loaded.df["Name"].tolist() == ["Zed", "Bob", "Dan", "Eve", "Finn"]
+    assert loaded.journal.pending == 2
+
+
+@pytest.mark.parametrize("ext", [".csv", ".parquet"])
+def test_journal_compact_keeps_edits_made_during_the_write(contacts, tmp_path, ext):
+    if ext == ".parquet":
+        pytest.importorskip("pyarrow")
+    path = str(tmp_path / ("contacts" + ext))
+    cc.ContactList(contacts.astype({"Age": str}), path).save_as(path)
+    edited = cc.ContactList.load(path)
+    edited.set_cell(0, "Name", "Zed")
+    edited.set_cell(1, "Name", "Yan")
+    snapshot, count = edited.df.copy(), edited.journal.pending
+    edited.set_cell(2, "Name", "Xia")  # journaled while the snapshot is being written
+
+    edited.journal.compact(snapshot, count)
+
+    assert edited.journal.pending == 1
+    assert cc.ContactList.load(path, journal=False).df["Name"].tolist() == ["Zed", "Yan", "Xia", "Dan", "Eve", "Finn"]
+    on_disk = pd.read_csv(path) if ext == ".csv" else cc.read_columnar_source(path)
+    assert on_disk["Name"].tolist()[:3] == ["Zed", "Yan", "Cléo"]
+
+    edited.journal.compact(edited.df.copy(), edited.journal.pending)
+
+    assert not cc.os.path.exists(edited.journal.path)
+    assert sorted(cc.os.listdir(tmp_path)) == ["contacts" + ext]
+    assert cc.ContactList.load(path).df["Name"].tolist()[:3] == ["Zed", "Yan", "Xia"]
+
+
+def test_text_typed_into_a_numeric_column_can_still_be_saved(contacts, tmp_path):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "contacts.parquet")
+    cc.ContactList(contacts.assign(Age=[25, 41, 30, 38, 19, 52]), path).save_as(path)
+    edited = cc.ContactList.load(path)
+    edited.set_cell(0, "Age", "n/a")
+    assert edited.df["Age"].tolist()[:2] == ["n/a", "41"]
+
+    edited.journal.compact(edited.df.copy(), edited.journal.pending)
+    assert edited.export(str(tmp_path / "export.parquet")) == 6
+
+    for saved in (path, str(tmp_path / "export.parquet")):
+        assert pd.read_parquet(saved)["Age"].tolist() == ["n/a", "41", "30", "38", "19", "52"]
+    assert not cc.os.path.exists(edited.journal.path)
+
+
+def test_write_frame_stores_mixed_object_columns_as_text(tmp_path):
+    pytest.importorskip("pyarrow")
+    df = pd.DataFrame({"Age": pd.Series([25, "n/a", None], dtype=object), "Name": ["a", "b", "c"]})
+    for ext in (".parquet", ".arrow"):
+        cc.write_frame(df, str(tmp_path / ("out" + ext)))
+    for saved in (pd.read_parquet(tmp_path / "out.parquet"), cc.read_columnar_source(str(tmp_path / "out.arrow"))):
+        assert saved["Age"].tolist()[:2] == ["25", "n/a"] and pd.isna(saved["Age"].iloc[2])
+
+
+def test_recipe_empty_dedupe_runs_with_the_defaults(tmp_path):
+    path = tmp_path / "contacts.csv"
+    pd.DataFrame({
+        "Name": ["Ann Lee", "ann lee", "Bob"],
+        "Email": ["ann@x.org", "ANN@x.org ", "bob@x.org"],
+        "Phone": ["", "(212) 555-0100", ""],
+    }).to_csv(path, index=False)
+
+    summary = cc.run_recipe(str(path), {"dedupe": {}}, output_dir=str(tmp_path / "out"))
+
+    assert summary["rows_out"] == 2 and summary["merged"] == 1
+    out = pd.read_csv(summary["output"], dtype=str)
+    assert out["Email"].tolist() == ["ann@x.org", "bob@x.org"]
+    assert out["Phone"].tolist()[0] == "+12125550100"
+
+
+@pytest.mark.parametrize("recipe, message", [
+    ({"dedupe": True}, "'dedupe' must be a JSON object"),
+    ({"output": "parquet"}, "'output' must be a JSON object"),
+    ({"keep": "Name"}, "'keep' must be a list"),
+    ({"keep": ["Name", 3]}, "'keep' must be a list"),
+    ({"filters": {"type": "Contains"}}, "'filters' must be a list"),
+])
+def test_load_recipe_rejects_wrong_types(tmp_path, recipe, message):
+    path = tmp_path / "recipe.json"
+    path.write_text(cc.json.dumps(recipe))
+    with pytest.raises(cc.RecipeError, match=message):
+        cc.load_recipe(str(path))
+
+
+def test_normalize_phones_to_e164():
+    raw = pd.Series(["(212) 555-0100", "+44 20 7946 0958", "0044 20 7946 0958", "06 12 34 56 78", "12345", "", None, "call me"])
+    phones, valid = cc.normalize_phones(raw, "33")
+    assert phones.tolist()[:4] == ["+332125550100", "+442079460958", "+442079460958", "+33612345678"]
+    # Numbers that can't be made valid are left as they were
+    assert phones.tolist()[4:6] + phones.tolist()[7:] == ["12345", "", "call me"] and pd.isna(phones[6])
+    assert valid.tolist() == [True] * 4 + [False] * 4
+
+
+@pytest.fixture
+def people():
+    return pd.DataFrame({
+        "Name": ["Jane Doe", "Bob Ray", "jane doe ", "Ann Lee", "ANN LEE", "Carl Jung", "Robert Ray", "Dee"],
+        "Email": ["jane@x.org", "bob@y.org", "", "ann@z.org", "ann@z.org ", "carl@x.org", "bob@y.org", "dee@w.org"],
+        "Phone": ["", "+1 212 555 0100", "06 12 34 56 78", "", "", "(212) 555-0100", "", "0612345678"],
+        "City": pd.Series(["", None, "Paris", None, "Lyon", "Bern", "Oslo", None], dtype="category"),
+    })
+
+
+def test_find_duplicates_exact_and_fuzzy_groups(people):
+    groups = cc.find_duplicates(people, "Name", "Email", "Phone")
+    def group_of(*rows):
+        return {groups[row] for row in rows}
+    assert len(group_of(1, 5, 6)) == 1 and groups[1] >= 0  # same phone (1, 5) and same email (1, 6)
+    assert len(group_of(3, 4)) == 1 and groups[3] >= 0  # same email after trimming and lower-casing
+    assert len(group_of(0, 2, 7)) == 1 and groups[0] >= 0  # same name, one without email; same phone (2, 7)
+    assert len(set(groups)) == 3
+
+
+def test_find_duplicates_compares_names_alone_when_an_email_is_missing():
+    df = pd.DataFrame({"Name": ["Jane Doe", "jane doe ", "Jane Dole"], "Email": ["jane@x.org", "", "jd@y.org"]})
+    assert cc.find_duplicates(df, "Name", "Email").tolist() == [0, 0, -1]
+    assert cc.find_duplicates(df, "Name").tolist() == [0, 0, -1]
+
+
+def test_merge_duplicates_fills_the_kept_row(people):
+    df, removed = cc.merge_duplicates(people.copy(), [6, 1, 5, 3, 4], [0, 0, 0, 1, 1])
+    assert removed.tolist() == [5, 6, 4]
+    assert df["Name"].tolist() == ["Jane Doe", "Bob Ray", "jane doe ", "Ann Lee", "Dee"]
+    # Blank and missing cells of the first row in each group come from the later ones
+    assert df.loc[1, "Phone"] == "+1 212 555 0100" and df.loc[1, "City"] == "Bern"
+    assert df.loc[3, "City"] == "Lyon"
+    assert isinstance(df["City"].dtype, pd.CategoricalDtype)
+
+
+def frames_equal(cached, expected):
+    return cached is not None and cached.astype(str).values.tolist() == expected.astype(str).values.tolist()
+
+
+def test_columnar_cache_hits_until_the_csv_changes(contacts, tmp_path):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "contacts.csv")
+    contacts.to_csv(path, index=False)
+    df = pd.read_csv(path)
+    cache = cc.ColumnarCache(path)
+    assert cache.load() is None
+    cache.store(df)
+    assert frames_equal(cache.load(), df)
+
+    # A copy of the same file (new mtime, same bytes) still uses the cache
+    stat = cc.os.stat(path)
+    cc.os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert frames_equal(cache.load(), df)
+
+    # Same size, different content
+    with open(path, "r+b") as handle:
+        handle.seek(-3, cc.os.SEEK_END)
+        handle.write(b"999")
+    assert cc.os.path.getsize(path) == stat.st_size
+    assert cache.load() is None
+
+    with open(cache.path, "wb") as handle:
+        handle.write(b"not arrow")
+    assert cache.load() is None
+
+
+def test_columnar_cache_is_refreshed_after_compaction(contacts, tmp_path):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "contacts.csv")
+    contacts.to_csv(path, index=False)
+    edited = cc.ContactList.load(path)
+    cache = cc.ColumnarCache(path)
+    cache.store(edited.df.copy())
+    edited.set_cell(0, "Name", "Zed")
+
+    edited.journal.compact(edited.df.copy(), edited.journal.pending)
+    assert cache.load() is None  # the rewritten CSV no longer matches
+    cache.store(edited.df.copy())
+
+    reloaded = cc.ContactList.load(path, cache=True)
+    assert reloaded.df["Name"].tolist()[0] == "Zed"
+    assert frames_equal(cache.load(), reloaded.df)
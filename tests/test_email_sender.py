@@ -0,0 +1,508 @@
+import email
+import io
+import re
+import threading
+
+import pandas as pd
+import pytest
+
+import email_sender as es
+
+
+def write_recipients(path, emails):
+    pd.DataFrame({"Name": [email.split("@")[0].title() for email in emails], "Email": emails}).to_csv(path, index=False)
+
+
+def make_campaign(server, path, **settings):
+    return es.Campaign({
+        "recipients": str(path),
+        "columns": {"Name": "Name", "Email": "Email"},
+        "subject": "Hello {Name}",
+        "body": "Hi {Name}",
+        "sender": "me@example.com",
+        "password": "secret",
+        "smtp_host": "127.0.0.1",
+        "smtp_port": server.port,
+        "tls": False,
+        "connections": 1,
+        **settings,
+    })
+
+
+def run(campaign, timeout=10):
+    # Runs the campaign on a thread so a hang fails the test instead of blocking it
+    events, result = [], {}
+    thread = threading.Thread(target=lambda: result.update(counts=campaign.run(lambda event, message, **fields: events.append((event, fields)))), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        campaign.control.cancel()
+        thread.join(timeout)
+        pytest.fail("campaign did not finish")
+    return result["counts"], events
+
+
+def test_resume_skips_recipients_removed_from_the_file(smtp_server, tmp_path):
+    server = smtp_server()
+    path = tmp_path / "list.csv"
+    write_recipients(path, ["ann@example.com", "bob@example.com"])
+    campaign = make_campaign(server, path)
+    # An earlier run queued an address that has since been removed from the file
+    store = es.CampaignStore(campaign.store_path, campaign.fingerprint)
+    store.add([("gone@example.com", "Gone"), ("ann@example.com", "Ann")])
+    store.close()
+
+    counts, events = run(campaign)
+
+    assert counts == {"sent": 2, "skipped": 1}
+    assert sorted(server.rcpts) == ["ann@example.com", "bob@example.com"]
+    assert server.connections == 1
+    assert any(fields.get("removed") == 1 for event, fields in events if event == "info")
+
+
+HEADER = ["Name", None, "Email", "Name", "Name", "Name.1"]
+ROWS = [[f"P{n}", None, f"p{n}@example.com", f"a{n}", f"b{n}", f"c{n}"] for n in range(7)]
+
+
+def write_list(path):
+    # The same sheet in each format, with a blank header and repeated ones
+    if path.suffix == ".xlsx":
+        workbook = es.openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(HEADER)
+        for n, row in enumerate(ROWS):
+            sheet.append(row)
+            if n == 3:
+                sheet.append([None] * len(row))  # blank rows are skipped
+        workbook.save(path)
+        return
+    df = pd.DataFrame(ROWS, columns=es.header_names(HEADER))
+    df.to_csv(path, index=False) if path.suffix == ".csv" else df.to_parquet(path, index=False)
+
+
+def test_header_names_follow_pandas(tmp_path):
+    path = tmp_path / "list.xlsx"
+    write_list(path)
+    expected = ["Name", "Unnamed: 1", "Email", "Name.2", "Name.3", "Name.1"]
+    assert es.header_names(HEADER) == expected
+    assert list(pd.read_excel(path).columns) == expected
+    assert es.header_names(["a", "a", "a.1", None]) == list(pd.read_csv(io.StringIO("a,a,a.1,\n")).columns)
+
+
+@pytest.mark.parametrize("suffix", [".xlsx", ".csv", ".parquet"])
+def test_recipient_source_reads_requested_columns_in_chunks(tmp_path, suffix):
+    if suffix == ".parquet":
+        pytest.importorskip("pyarrow")
+    path = tmp_path / f"list{suffix}"
+    write_list(path)
+    source = es.RecipientSource(str(path))
+    assert source.columns == ["Name", "Unnamed: 1", "Email", "Name.2", "Name.3", "Name.1"]
+
+    chunks = list(source.chunks(["Email", "Name.1", "", "Email"], chunk_rows=3))
+
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert all(list(chunk.columns) == ["Email", "Name.1"] for chunk in chunks)
+    frame = pd.concat(chunks)
+    assert frame["Email"].tolist() == [f"p{n}@example.com" for n in range(7)]
+    assert frame["Name.1"].tolist() == [f"c{n}" for n in range(7)]
+    assert frame.index.is_unique
+
+
+def test_recipient_source_rejects_unknown_file_types(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported file type"):
+        es.RecipientSource(str(tmp_path / "list.txt"))
+
+
+def test_pool_reuses_the_opened_connection(smtp_server):
+    server = smtp_server()
+    pool = es.SMTPConnectionPool("127.0.0.1", server.port, "me@example.com", "secret", use_tls=False, size=4, max_messages=3)
+    pool.open()
+    for n in range(7):
+        pool.send("me@example.com", [f"r{n}@example.com"], "Subject: hi\r\n\r\nhi")
+    pool.close()
+    # Sent one after another, the emails share one connection at a time, recycled every 3
+    assert server.connections == 3
+    assert server.logins == 3
+    assert sorted(server.per_connection().values()) == [1, 3, 3]
+
+
+def test_pool_runs_parallel_sends_on_separate_connections(smtp_server):
+    server = smtp_server()
+    pool = es.SMTPConnectionPool("127.0.0.1", server.port, "me@example.com", "secret", use_tls=False, size=2, max_messages=100)
+    pool.open()
+    barrier = threading.Barrier(2)
+
+    def send(n):
+        barrier.wait()
+        for i in range(5):
+            pool.send("me@example.com", [f"r{n}.{i}@example.com"], "Subject: hi\r\n\r\nhi")
+
+    threads = [threading.Thread(target=send, args=(n,)) for n in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pool.close()
+    assert server.connections <= 2
+    assert sum(server.per_connection().values()) == 10
+
+
+def test_async_pool_reuses_the_opened_connection(smtp_server):
+    pytest.importorskip("aiosmtplib")
+    server = smtp_server()
+
+    async def send_all():
+        pool = es.AsyncSMTPPool("127.0.0.1", server.port, "me@example.com", "secret", use_tls=False, size=4, max_messages=3)
+        await pool.open()
+        for n in range(7):
+            await pool.send("me@example.com", [f"r{n}@example.com"], "Subject: hi\r\n\r\nhi")
+        await pool.close()
+
+    es.asyncio.run(send_all())
+    assert server.connections == 3
+    assert sorted(server.per_connection().values()) == [1, 3, 3]
+
+
+def test_async_engine_keeps_sending_while_the_next_message_is_prepared(smtp_server):
+    pytest.importorskip("aiosmtplib")
+    server = smtp_server()
+    first_sent = threading.Event()
+    waited = []
+
+    def messages():
+        yield ["Ann"], ["ann@example.com"], "Subject: hi\r\n\r\nhi"
+        # Reading the next chunk takes a while; the first email goes out meanwhile
+        waited.append(first_sent.wait(5))
+        yield ["Bob"], ["bob@example.com"], "Subject: hi\r\n\r\nhi"
+
+    def finish(name, email, error=None, latency=None):
+        assert error is None
+        first_sent.set()
+
+    pool = es.AsyncSMTPPool("127.0.0.1", server.port, "me@example.com", "secret", use_tls=False, size=2, max_messages=100)
+    es.asyncio.run(es.send_async(pool, messages(), "me@example.com", es.RateLimiter(), es.SendControl(), finish))
+    assert waited == [True]
+    assert sorted(server.rcpts) == ["ann@example.com", "bob@example.com"]
+
+
+def test_template_renders_format_specs_and_conversions():
+    template = es.MessageTemplate("{Name:.3}: {Company!r}", "Dear {Name:>6}|{Company!s:^9}|{{literal}}")
+    assert template.fields == ["Name", "Company"]
+    subjects, bodies = template.render_batch(pd.DataFrame({"Name": ["Annabel", "Bo"], "Company": ["ACME", ""]}))
+    assert subjects.tolist() == ["Ann: 'ACME'", "Bo: ''"]
+    assert bodies.tolist() == ["Dear Annabel|  ACME   |{literal}", "Dear     Bo|         |{literal}"]
+
+
+@pytest.mark.parametrize("subject, body, message", [
+    ("Hi {Name:.2f}", "", "Invalid format for {Name} in subject"),
+    ("", "Total {Amount:d}", "Invalid format for {Amount} in body"),
+    ("", "Hi {Name!x}", "Invalid format for {Name} in body: Unknown conversion"),
+    ("Hi {Name", "", "Invalid subject template"),
+    ("Hi {}", "", "Invalid placeholder {}"),
+    ("", "Hi {user.name}", "Invalid placeholder {user.name}"),
+    ("", "Hi {rows[0]}", "Invalid placeholder {rows[0]}"),
+])
+def test_template_rejects_bad_placeholders(subject, body, message):
+    with pytest.raises(es.TemplateError, match=re.escape(message)):
+        es.MessageTemplate(subject, body)
+
+
+def test_template_validation_names_unknown_placeholders():
+    template = es.MessageTemplate("Hi {Name}", "{Nmae} at {Company} {Name}")
+    template.validate({"Name": "Name", "Nmae": "Name", "Company": "Firm"})
+    with pytest.raises(es.TemplateError, match=re.escape("Unknown placeholder(s) {Nmae}, {Company}. Available: {Name}, {Email}")):
+        template.validate({"Name": "Name", "Email": "Email"})
+
+
+def test_missing_cells_render_as_empty_text():
+    template = es.MessageTemplate("Hello {Name}", "Hi {Name}, from {City:>4}.")
+    chunk = pd.DataFrame({"Full Name": ["Ann", None], "Mail": ["ann@example.com", "bob@example.com"], "Town": [float("nan"), "Oslo"]})
+    columns = {"Name": "Full Name", "Email": "Mail", "City": "Town"}
+    messages = [email.message_from_string(message) for _, _, message in es.render_messages(template, "me@example.com", columns, [chunk])]
+    assert [message["Subject"] for message in messages] == ["Hello Ann", "Hello "]
+    assert [message.get_payload()[0].get_payload() for message in messages] == ["Hi Ann, from     .", "Hi , from Oslo."]
+
+
+def test_rate_limiter_waits_for_the_shortest_bucket():
+    limiter = es.RateLimiter(per_second=2, per_minute=3)
+    assert [limiter.try_acquire() for _ in range(2)] == [0, 0]
+    assert 0 < limiter.try_acquire() <= 0.5  # per-second bucket empty
+    es.time.sleep(0.5)
+    assert limiter.try_acquire() == 0
+    assert limiter.try_acquire() > 10  # per-minute bucket empty: 20 s per token
+
+
+def test_rate_limiter_daily_bucket_counts_earlier_sends():
+    assert es.RateLimiter(per_day=10, sent_last_day=9).try_acquire() == 0
+    limiter = es.RateLimiter(per_day=10, sent_last_day=10)
+    assert limiter.try_acquire() == pytest.approx(8640, rel=0.01)
+
+
+def test_rate_limiter_backoff_pauses_and_slows_then_recovers(monkeypatch):
+    monkeypatch.setattr(es, "BACKOFF_SECONDS", 0.2)
+    limiter = es.RateLimiter(per_second=10)
+    limiter.backoff()
+    assert 0.1 < limiter.try_acquire() <= 0.2
+    limiter.backoff()  # a second strike doubles the pause and halves the rate again
+    assert 0.3 < limiter.try_acquire() <= 0.4
+    assert limiter._scale == 0.25
+    for _ in range(5):
+        limiter.success()
+    assert limiter._scale == pytest.approx(0.5)
+
+
+def test_throttled_send_backs_off_and_is_resent(smtp_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(es, "BACKOFF_SECONDS", 0.05)
+    server = smtp_server({2: "421 4.7.0 Try again later", 3: "451 4.7.1 Slow down"})
+    path = tmp_path / "list.csv"
+    write_recipients(path, ["ann@example.com", "bob@example.com", "cy@example.com"])
+
+    counts, events = run(make_campaign(server, path))
+
+    assert counts == {"sent": 3}
+    assert server.received == 5
+    assert sorted(server.rcpts) == ["ann@example.com", "bob@example.com", "cy@example.com"]
+
+
+@pytest.mark.parametrize("engine", ["Threads", "Asyncio"])
+def test_unpersonalized_email_is_sent_to_many_recipients_at_once(smtp_server, tmp_path, engine):
+    if engine == "Asyncio":
+        pytest.importorskip("aiosmtplib")
+    server = smtp_server(refuse={"cy@example.com": "550 5.1.1 No such user"})
+    path = tmp_path / "list.csv"
+    write_recipients(path, [f"{name}@example.com" for name in ("ann", "bob", "cy", "dee", "eve")])
+
+    counts, events = run(make_campaign(server, path, subject="News", body="Hello all", batch_recipients=3, engine=engine))
+
+    # One DATA per batch of three; the refused address fails on its own
+    assert [len(rcpts) for _, _, rcpts in server.messages] == [2, 2]
+    assert sorted(server.rcpts) == ["ann@example.com", "bob@example.com", "dee@example.com", "eve@example.com"]
+    assert counts == {"sent": 4, "failed": 1}
+    assert [fields["email"] for event, fields in events if event == "failed"] == ["cy@example.com"]
+
+
+@pytest.mark.parametrize("engine", ["Threads", "Asyncio"])
+def test_fully_refused_batch_judges_each_recipient_by_its_reply(smtp_server, tmp_path, monkeypatch, engine):
+    if engine == "Asyncio":
+        pytest.importorskip("aiosmtplib")
+    monkeypatch.setattr(es, "RETRY_BASE_SECONDS", 0.01)
+    server = smtp_server(refuse={
+        "ann@example.com": "550 5.1.1 No such user",
+        "bob@example.com": "450 4.2.1 Mailbox busy",
+        "cy@example.com": "550 5.1.1 No such user",
+    })
+    path = tmp_path / "list.csv"
+    write_recipients(path, ["ann@example.com", "bob@example.com", "cy@example.com"])
+
+    counts, events = run(make_campaign(server, path, subject="News", body="Hello all", batch_recipients=3, engine=engine))
+
+    # The 550s fail at once; only the 450 is retried, until it runs out of attempts
+    assert server.refused == {"ann@example.com": 1, "cy@example.com": 1, "bob@example.com": es.MAX_ATTEMPTS}
+    assert counts == {"failed": 3}
+    assert {fields["email"] for event, fields in events if event == "retrying"} == {"bob@example.com"}
+
+
+def test_campaign_store_tracks_sends_failures_and_retries(tmp_path, monkeypatch):
+    monkeypatch.setattr(es, "RETRY_BASE_SECONDS", 0.1)
+    monkeypatch.setattr(es, "STORE_FLUSH_SECONDS", 60)
+    store = es.CampaignStore(str(tmp_path / "list.csv") + es.CAMPAIGN_SUFFIX, "campaign")
+    try:
+        store.add([(f"{name}@example.com", name) for name in ("ann", "bob", "cy", "dee")])
+        assert store.due() == {"ann@example.com", "bob@example.com", "cy@example.com", "dee@example.com"}
+        assert store.settled() == set() and store.next_retry() is None
+
+        store.record_sent("ann@example.com")
+        store.record_failure("bob@example.com", "550 No such user", permanent=True)
+        store.record_failure("cy@example.com", "421 Try again later", permanent=False)
+        assert store.counts() == {"queued": 4}  # buffered until the next flush
+        store.flush()
+        assert store.counts() == {"sent": 1, "failed": 1, "retrying": 1, "queued": 1}
+        assert store.due() == {"dee@example.com"}
+        assert store.settled() == {"ann@example.com", "bob@example.com", "cy@example.com"}
+        assert 0 < store.next_retry() <= 0.1
+
+        es.time.sleep(0.15)
+        assert store.due() == {"cy@example.com", "dee@example.com"}
+        store.record_failure("cy@example.com", "421 Try again later", permanent=False)
+        assert 0.1 < store.next_retry() <= 0.2  # the backoff doubles
+        for _ in range(es.MAX_ATTEMPTS - 2):
+            store.record_failure("cy@example.com", "421 Try again later", permanent=False)
+        store.flush()
+        assert store.counts() == {"sent": 1, "failed": 2, "queued": 1}
+        assert store.next_retry() is None
+
+        # Re-adding keeps states; skipping leaves sent recipients alone
+        store.add([("ann@example.com", "Ann"), ("eve@example.com", "Eve")])
+        store.skip([("ann@example.com", "Ann", "suppressed"), ("dee@example.com", "Dee", "suppressed")])
+        assert store.counts() == {"sent": 1, "failed": 2, "skipped": 1, "queued": 1}
+        assert store.due() == {"eve@example.com"}
+
+        store.reset()
+        assert store.counts() == {} and store.due() == set()
+    finally:
+        store.close()
+
+
+def test_campaign_store_sent_since_seeds_the_daily_limit(smtp_server, tmp_path):
+    server = smtp_server()
+    path = tmp_path / "list.csv"
+    write_recipients(path, ["ann@example.com", "bob@example.com"])
+    run(make_campaign(server, path))
+    store = es.CampaignStore(str(path) + es.CAMPAIGN_SUFFIX, "another campaign")
+    try:
+        assert store.sent_since(es.time.time() - 86400) == 2
+        assert store.sent_since(es.time.time() + 1) == 0
+    finally:
+        store.close()
+
+    # A different campaign on the same list starts with the daily bucket short of those two
+    counts, events = run(make_campaign(server, path, body="Hi again {Name}", limits={"day": 4}))
+    assert counts == {"sent": 2}
+    assert any(fields.get("sent_last_day") == 2 for event, fields in events if event == "info")
+
+
+def write_config(server, tmp_path, **overrides):
+    write_recipients(tmp_path / "list.csv", ["ann@example.com", "bob@example.com"])
+    config = tmp_path / "campaign.json"
+    config.write_text(es.json.dumps({
+        "recipients": "list.csv",
+        "columns": {"Name": "Name", "Email": "Email"},
+        "subject": "Hello {Name}",
+        "body": "Hi {Name}",
+        "sender": "me@example.com",
+        "password": "secret",
+        "smtp_host": "127.0.0.1",
+        "smtp_port": server.port,
+        "tls": False,
+        **overrides,
+    }))
+    return str(config)
+
+
+def test_campaign_file_runs_off_the_main_thread(smtp_server, tmp_path):
+    server = smtp_server()
+    config = write_config(server, tmp_path)
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(code=es.run_campaign_file(config, True, lambda *args, **fields: None)))
+    thread.start()
+    thread.join(10)
+    assert result == {"code": es.EXIT_OK}
+    assert len(server.messages) == 2
+
+
+@pytest.mark.parametrize("overrides", [
+    {"connections": None},
+    {"smtp_port": [587]},
+    {"limits": 10},
+    {"limits": {"day": {"max": 10}}},
+    {"columns": ["Name", "Email"]},
+    {"recipients": 5},
+    {"subject": 5},
+    {"preset": ["Gmail"]},
+])
+def test_campaign_file_with_wrong_types_is_a_config_error(smtp_server, tmp_path, overrides):
+    server = smtp_server()
+    errors = []
+    code = es.run_campaign_file(write_config(server, tmp_path, **overrides), True, lambda event, message, **fields: errors.append(message))
+    assert code == es.EXIT_CONFIG_ERROR
+    assert len(errors) == 1 and server.connections == 0
+
+
+def test_campaign_file_restores_signal_handlers(smtp_server, tmp_path):
+    server = smtp_server()
+    before = es.signal.getsignal(es.signal.SIGINT)
+    assert es.run_campaign_file(write_config(server, tmp_path), True, lambda *args, **fields: None) == es.EXIT_OK
+    assert es.signal.getsignal(es.signal.SIGINT) is before
+
+
+def test_recipient_checker_reasons_and_domain_cache():
+    lookups = []
+
+    def resolver(domain):
+        lookups.append(domain)
+        return domain != "nomx.example"
+
+    checker = es.RecipientChecker({"blocked@example.com", "@spam.example"}, resolver)
+    keys = pd.Series(["ann@example.com", "not-an-address", "blocked@example.com", "x@spam.example", "bo@nomx.example", "cy@example.com", ""])
+    assert checker.check(keys).tolist() == ["", "invalid address", "suppressed", "suppressed", "no mail server for domain", "", "invalid address"]
+    # Suppressed and invalid addresses are never looked up, and each domain only once
+    assert sorted(lookups) == ["example.com", "nomx.example"]
+    assert checker.check(pd.Series(["dee@example.com", "eve@nomx.example"])).tolist() == ["", "no mail server for domain"]
+    assert len(lookups) == 2
+    assert checker.domains == {"example.com": 3}
+
+
+class FakeDNS:
+    """Stand-in for the dnspython modules used by dns_has_mail_server, answering from `records`."""
+
+    class DNSException(Exception):
+        pass
+
+    class NXDOMAIN(DNSException):
+        pass
+
+    class NoAnswer(DNSException):
+        pass
+
+    class Timeout(DNSException):
+        pass
+
+    def __init__(self, records):
+        self.queries = []
+        self.exception = self
+        self.resolver = self
+        fake = self
+
+        class Resolver:
+            lifetime = None
+
+            def resolve(self, domain, record):
+                fake.queries.append((domain, record))
+                answer = records.get(domain, FakeDNS.NXDOMAIN)
+                if isinstance(answer, type):
+                    raise answer()
+                if record not in answer:
+                    raise FakeDNS.NoAnswer()
+                return [answer[record]]
+
+        self.Resolver = Resolver
+
+
+@pytest.mark.parametrize("records, expected", [
+    ({"mx.example": {"MX": "10 mail.mx.example"}}, True),
+    ({"mx.example": {"A": "192.0.2.1"}}, True),  # no MX: mail goes to the A record
+    ({"mx.example": {}}, False),  # neither MX nor A
+    ({}, False),  # NXDOMAIN
+    ({"mx.example": FakeDNS.Timeout}, True),  # lookup errors don't reject anyone
+])
+def test_dns_has_mail_server(monkeypatch, records, expected):
+    fake = FakeDNS(records)
+    monkeypatch.setattr(es, "dns", fake)
+    assert es.dns_has_mail_server("mx.example") is expected
+    assert fake.queries[0] == ("mx.example", "MX")
+
+
+def test_mx_check_needs_dnspython(smtp_server, tmp_path, monkeypatch):
+    server = smtp_server()
+    path = tmp_path / "list.csv"
+    write_recipients(path, ["ann@example.com"])
+    monkeypatch.setattr(es, "dns", None)
+    assert make_campaign(server, path, check_mx=True).check_mx is False
+    monkeypatch.setattr(es, "dns", FakeDNS({}))
+    assert make_campaign(server, path, check_mx=True).check_mx is True
+
+
+def test_campaign_skips_domains_without_mail_server(smtp_server, tmp_path, monkeypatch):
+    server = smtp_server()
+    monkeypatch.setattr(es, "dns", FakeDNS({"example.com": {"MX": "10 mx.example.com"}, "nomx.example": {}}))
+    path = tmp_path / "list.csv"
+    write_recipients(path, ["ann@example.com", "bob@nomx.example", "cy@gone.example"])
+
+    counts, events = run(make_campaign(server, path, check_mx=True))
+
+    assert counts == {"sent": 1, "skipped": 2}
+    assert list(server.rcpts) == ["ann@example.com"]
+    assert {fields["email"]: fields["reason"] for event, fields in events if event == "skipped"} == {
+        "bob@nomx.example": "no mail server for domain",
+        "cy@gone.example": "no mail server for domain",
+    }
@@ -0,0 +1,237 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+for module in ("PyQt6", "pyqtgraph", "psutil", "speedtest"):
+    pytest.importorskip(module)
+
+import net_speed_monitor as nsm
+
+START = datetime(2026, 1, 1, 12)
+
+
+def result(n, **fields):
+    return {"timestamp": START + timedelta(seconds=10 * n), "download": float(n), "upload": 1.0, "ping": 9.0, **fields}
+
+
+def test_metrics_buffer_keeps_the_newest_results_when_it_wraps():
+    buffer = nsm.MetricsBuffer(capacity=8)
+    for n in range(20):
+        buffer.append(result(n, error="boom" if n == 15 else None))
+    assert (buffer.size, buffer.total) == (8, 20)
+    assert buffer.view("download").tolist() == list(map(float, range(12, 20)))
+    assert buffer.view("download", 3).tolist() == [17.0, 18.0, 19.0]
+    assert buffer.index().tolist() == list(range(12, 20))
+    assert buffer.view("timestamp")[-1] == np.datetime64(START + timedelta(seconds=190))
+    assert buffer.view("error").tolist() == [None, None, None, "boom", None, None, None, None]
+    # Views are slices of the backing arrays, not copies
+    assert buffer.view("download").base is not None
+
+
+def test_metrics_buffer_stores_missing_values_as_nan():
+    buffer = nsm.MetricsBuffer(capacity=4)
+    buffer.append({"timestamp": START, "download": None, "error": "timeout"})
+    frame = buffer.frame()
+    assert frame["download"].isna().all() and frame["upload"].isna().all()
+    assert frame["error"].tolist() == ["timeout"]
+    assert list(frame.columns) == list(nsm.RESULT_COLUMNS)
+
+
+def test_metrics_buffer_from_frame_continues_like_appending():
+    appended = nsm.MetricsBuffer(capacity=8)
+    for n in range(11):
+        appended.append(result(n))
+    loaded = nsm.MetricsBuffer.from_frame(pd.DataFrame([result(n) for n in range(11)]), capacity=8)
+    for buffer in (appended, loaded):
+        buffer.append(result(11))
+    assert (loaded.size, loaded.total) == (appended.size, appended.total)
+    for name in ("timestamp", "download", "upload"):
+        assert np.array_equal(loaded.view(name), appended.view(name))
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_log_writer_flush_leaves_a_readable_log(tmp_path, fmt):
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    writer = nsm.ResultLogWriter(tmp_path / "speed.csv", fmt)
+    for n in range(5):
+        writer.put(result(n))
+    writer.flush()
+    # Readable while the writer is still open, as after "Stop & Save" or a later crash
+    speeds, _ = nsm.load_log(writer.paths)
+    assert speeds["download"].tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+    for n in range(5, 8):
+        writer.put(result(n, error="boom" if n == 6 else None))
+    writer.close()
+    assert writer.error is None
+    speeds, _ = nsm.load_log(writer.paths)
+    assert speeds["download"].tolist() == list(map(float, range(8)))
+    assert speeds["error"].iloc[6] == "boom"
+    assert speeds["timestamp"].is_monotonic_increasing
+
+
+def test_log_writer_rotates_by_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(nsm, "LOG_ROTATE_BYTES", 2000)
+    monkeypatch.setattr(nsm, "LOG_BATCH_ROWS", 10)
+    writer = nsm.ResultLogWriter(tmp_path / "speed.csv", "csv")
+    for n in range(200):
+        writer.put(result(n))
+    writer.close()
+    assert len(writer.paths) > 1
+    assert writer.paths[1].name == "speed_002.csv"
+    speeds, _ = nsm.load_log(writer.paths)
+    assert speeds["download"].tolist() == list(map(float, range(200)))
+
+
+def test_epoch_seconds_keeps_wall_clock_time():
+    stamps = np.array([np.datetime64("2026-03-01T12:00:00")], dtype="datetime64[us]")
+    assert nsm.epoch_seconds(stamps)[0] == datetime(2026, 3, 1, 12, tzinfo=timezone.utc).timestamp()
+
+
+def test_visible_slice_selects_by_time_with_one_neighbour_each_side():
+    stamps = np.array([START + timedelta(seconds=n) for n in range(0, 100, 10)], dtype="datetime64[us]")
+    x = nsm.epoch_seconds(stamps)
+    window = nsm.visible_slice(stamps, x[2] + 1, x[5])
+    assert (window.start, window.stop) == (2, 7)
+    assert nsm.visible_slice(stamps, x[0] - 100, x[-1] + 100) == slice(0, 10)
+    empty = nsm.visible_slice(stamps, x[-1] + 50, x[-1] + 60)
+    assert len(stamps[empty]) == 1  # only the last point, so the line runs into the view
+
+
+def test_minmax_decimate_keeps_short_lines_as_they_are():
+    x, y = np.arange(10), np.arange(10.0)
+    out_x, out_y = nsm.minmax_decimate(x, y, max_points=20)
+    assert out_x is x and out_y is y
+
+
+def test_minmax_decimate_keeps_spikes_and_order():
+    rng = np.random.default_rng(1)
+    x = np.arange(100_003, dtype=float)
+    y = rng.normal(50, 1, len(x))
+    y[12_345], y[67_890] = 500.0, -400.0
+    out_x, out_y = nsm.minmax_decimate(x, y, max_points=1000)
+    assert len(out_x) <= 1000 + 3
+    assert np.all(np.diff(out_x) > 0)
+    assert np.array_equal(out_y, y[out_x.astype(int)])
+    assert out_y.max() == 500.0 and out_y.min() == -400.0
+    assert out_x[-1] == x[-1]  # the line still ends at the newest point
+
+
+def test_minmax_decimate_keeps_a_spike_in_the_last_partial_bucket():
+    y = np.zeros(1070)  # 48 buckets of 22 and 14 points left over
+    y[1060] = 9.0
+    out_x, out_y = nsm.minmax_decimate(np.arange(1070), y, max_points=100)
+    assert 9.0 in out_y and out_x[-1] == 1069
+    assert len(out_x) <= 100 + 3
+
+
+class FakeNetwork:
+    """Stand-in for the speedtest.net calls made by Speedtest, answering from `latency`."""
+
+    def __init__(self):
+        self.configs = 0
+        self.server_lists = 0
+        self.pings = []  # server ids pinged by each get_best_server call
+        self.latency = {1: 10.0, 2: 50.0, 3: 60.0}
+        self.unreachable = set()
+        self.fail_download = False
+
+    def install(self, monkeypatch):
+        network = self
+
+        def __init__(self, **kwargs):
+            self.config, self.servers = {}, {}
+            self.get_config()
+
+        def get_config(self):
+            network.configs += 1
+            self.config = {"client": {"lat": "48.85", "lon": "2.35"}}
+            return self.config
+
+        def get_servers(self, servers=None):
+            network.server_lists += 1
+            for n in network.latency:
+                self.servers.setdefault(n * 100.0, []).append({"id": n, "d": n * 100.0, "sponsor": f"ISP {n}", "name": "Paris"})
+
+        def get_best_server(self, servers=None):
+            candidates = servers or [server for group in self.servers.values() for server in group]
+            network.pings.append([server["id"] for server in candidates])
+            reachable = [server for server in candidates if server["id"] not in network.unreachable]
+            if not reachable:
+                raise ConnectionError("no server reachable")
+            best = min(reachable, key=lambda server: network.latency[server["id"]])
+            return {**best, "latency": network.latency[best["id"]]}
+
+        def download(self, *args, **kwargs):
+            if network.fail_download:
+                raise ConnectionError("connection reset")
+            return 50_000_000
+
+        for name, function in [("__init__", __init__), ("get_config", get_config), ("get_servers", get_servers),
+                               ("get_best_server", get_best_server), ("download", download)]:
+            monkeypatch.setattr(nsm.Speedtest, name, function)
+        return self
+
+
+@pytest.fixture
+def network(monkeypatch):
+    return FakeNetwork().install(monkeypatch)
+
+
+def test_server_cache_reuses_config_and_servers_until_they_expire(network, tmp_path):
+    path = tmp_path / "servers.json"
+    nsm.ServerCache(path).speedtest()
+    st = nsm.ServerCache(path).speedtest()  # a later run, from the file
+    assert (network.configs, network.server_lists) == (1, 1)
+    assert st.lat_lon == (48.85, 2.35)
+    assert sorted(st.servers) == [100.0, 200.0, 300.0]
+
+    cache = nsm.ServerCache(path)
+    cache.data["config_at"] -= nsm.CONFIG_TTL_SECONDS + 1
+    assert cache.config() is None
+    cache.speedtest()
+    # A new configuration may mean a new location, so the server list is fetched again too
+    assert (network.configs, network.server_lists) == (2, 2)
+
+
+def test_server_cache_pings_only_the_best_server_until_it_gets_slower(network, tmp_path):
+    cache = nsm.ServerCache(tmp_path / "servers.json")
+    st = cache.speedtest()
+    assert cache.best_server(st)["id"] == 1
+    assert cache.best_server(st)["id"] == 1
+    assert network.pings == [[1, 2, 3], [1]]
+
+    network.latency[1] = 10.0 * nsm.LATENCY_REGRESSION + 1  # still the fastest, but much slower
+    assert cache.best_server(st)["id"] == 1
+    assert network.pings[2:] == [[1], [1, 2, 3]]
+    assert nsm.ServerCache(cache.path).data["ranked_latency"] == network.latency[1]
+
+    network.unreachable.add(1)
+    assert cache.best_server(st)["id"] == 2
+    assert network.pings[4:] == [[1], [1, 2, 3]]
+
+    cache.data["ranked_at"] -= nsm.SERVER_TTL_SECONDS + 1
+    cache.best_server(st)
+    assert network.pings[6:] == [[1, 2, 3]]  # expired: re-ranked without pinging the old best first
+
+
+def test_failed_test_makes_the_next_one_re_rank(network, tmp_path, monkeypatch):
+    path = tmp_path / "servers.json"
+    ServerCache = nsm.ServerCache
+    cache = ServerCache(path)
+    cache.best_server(cache.speedtest())
+    monkeypatch.setattr(nsm, "ServerCache", lambda: ServerCache(path))
+    network.fail_download = True
+    worker = nsm.SpeedTestWorker(interval=0)
+    results = []
+    worker.result_ready.connect(lambda result: (results.append(result), worker.stop()))
+    worker._running = True
+    worker._loop()
+
+    assert results[0]["download"] is None and results[0]["error"] == "connection reset"
+    cache = ServerCache(path)
+    assert "best" not in cache.data
+    cache.best_server(cache.speedtest())
+    assert network.pings[-1] == [1, 2, 3]